@@ -55,6 +55,13 @@ class ProcessJobSourceGroups(LaunchpadCronScript):
                  "it would prevent the cronjob from processing new jobs "
                  "if just one of the child processes is still processing, "
                  "and each process only handles a single job source class.")
+        self.parser.add_option(
+            '--poll-interval', dest='poll_interval', type='float',
+            metavar='SECONDS', default=None,
+            help="Start a long-running process for each job source that "
+                 "uses TwistedJobRunner, polling for ready jobs every "
+                 "SECONDS seconds, rather than one that exits once the "
+                 "currently ready jobs have run.")
 
     def main(self):
         selected_groups = self.args
@@ -82,7 +89,15 @@ class ProcessJobSourceGroups(LaunchpadCronScript):
             child_args.append('-v')
         children = []
         for job_source in selected_job_sources:
-            child = subprocess.Popen(child_args + [job_source])
+            source_args = list(child_args)
+            # Only TwistedJobRunner can poll.
+            runner_class = getattr(
+                config[job_source], 'runner_class', 'JobRunner')
+            if (self.options.poll_interval is not None and
+                    runner_class == 'TwistedJobRunner'):
+                source_args.extend(
+                    ['--poll-interval', str(self.options.poll_interval)])
+            child = subprocess.Popen(source_args + [job_source])
             children.append(child)
         if self.options.do_wait:
             for child in children:
@@ -9,7 +9,6 @@ __metaclass__ = type
 
 import _pythonpath
 
-from collections import defaultdict
 import sys
 
 from twisted.python import log
@@ -66,6 +65,12 @@ class ProcessJobSource(LaunchpadCronScript):
         self.parser.add_option(
             '--log-twisted', action='store_true', default=False,
             help='Enable extra Twisted logging.')
+        self.parser.add_option(
+            '--poll-interval', dest='poll_interval', type='float',
+            metavar='SECONDS', default=None,
+            help='Keep running, polling for ready jobs every SECONDS '
+                 'seconds, rather than exiting once the currently ready '
+                 'jobs have run.')
 
     def handle_options(self):
         if len(self.args) != 1:
@@ -73,13 +78,13 @@ class ProcessJobSource(LaunchpadCronScript):
             sys.exit(1)
         self.job_source_name = self.args[0]
         super(ProcessJobSource, self).handle_options()
-
-    def job_counts(self, jobs):
-        """Return a list of tuples containing the job name and counts."""
-        counts = defaultdict(lambda: 0)
-        for job in jobs:
-            counts[job.__class__.__name__] += 1
-        return sorted(counts.items())
+        # Only the Twisted runner can keep running and reuse its workers
+        # between polls.
+        if (self.options.poll_interval is not None and
+                self.runner_class is not runner.TwistedJobRunner):
+            self.parser.error(
+                '--poll-interval needs a job source that uses '
+                'TwistedJobRunner.')
 
     def main(self):
         if self.options.verbose:
@@ -89,11 +94,18 @@ class ProcessJobSource(LaunchpadCronScript):
         kwargs = {}
         if getattr(self.options, 'log_twisted', False):
             kwargs['_log_twisted'] = True
-        runner = self.runner_class.runFromSource(
+        concurrency = getattr(self.config_section, 'concurrency', None)
+        if concurrency is not None:
+            kwargs['concurrency'] = concurrency
+        if self.options.poll_interval is not None:
+            kwargs['poll_interval'] = self.options.poll_interval
+        job_runner = self.runner_class.runFromSource(
             job_source, self.dbuser, self.logger, **kwargs)
-        for name, count in self.job_counts(runner.completed_jobs):
+        for name, count in runner.job_counts_by_class(
+                job_runner.completed_jobs):
             self.logger.info('Ran %d %s jobs.', count, name)
-        for name, count in self.job_counts(runner.incomplete_jobs):
+        for name, count in runner.job_counts_by_class(
+                job_runner.incomplete_jobs):
             self.logger.info('%d %s jobs did not complete.', count, name)
 
 
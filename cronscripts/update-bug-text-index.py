@@ -0,0 +1,44 @@
+#!/usr/bin/python -S
+#
+# Copyright 2019 Canonical Ltd.  This software is licensed under the
+# GNU Affero General Public License version 3 (see the file LICENSE).
+
+# This script updates the index used by the inverted-index bug text
+# search backend.
+
+import _pythonpath
+
+from lp.bugs.model.bugtaskflat import BugTaskFlat
+from lp.bugs.model.bugtextsearch import (
+    FileBackedInvertedIndex,
+    update_bug_text_index,
+    )
+from lp.services.config import config
+from lp.services.database.interfaces import IStore
+from lp.services.scripts.base import (
+    LaunchpadCronScript,
+    LaunchpadScriptFailure,
+    )
+
+
+class UpdateBugTextIndex(LaunchpadCronScript):
+    """Bring the bug text search index up to date with BugTaskFlat.
+
+    The index is saved to config.malone.bug_text_index_path, from which
+    the app servers load it.
+    """
+
+    def main(self):
+        path = config.malone.bug_text_index_path
+        if not path:
+            raise LaunchpadScriptFailure(
+                "config.malone.bug_text_index_path is not set.")
+        update_bug_text_index(
+            FileBackedInvertedIndex(path), IStore(BugTaskFlat), self.logger)
+
+
+if __name__ == '__main__':
+    script = UpdateBugTextIndex(
+        'update-bug-text-index',
+        dbuser=config.malone.bug_text_index_dbuser)
+    script.lock_and_run()
@@ -20,8 +20,14 @@ class UpdateBugTaskTargetNameCaches(LaunchpadCronScript):
     This ensures that the cache values are up-to-date even after, for
     example, an IDistribution being renamed.
     """
+    def add_my_options(self):
+        self.parser.add_option(
+            "--threads", type="int", dest="threads", default=1,
+            metavar="NUM", help="Update NUM sets of targets in parallel.")
+
     def main(self):
-        updater = BugTaskTargetNameCacheUpdater(self.txn, self.logger)
+        updater = BugTaskTargetNameCacheUpdater(
+            self.txn, self.logger, threads=self.options.threads)
         updater.run()
 
 if __name__ == '__main__':
@@ -0,0 +1,107 @@
+-- Copyright 2019 Canonical Ltd.  This software is licensed under the
+-- GNU Affero General Public License version 3 (see the file LICENSE).
+
+SET client_min_messages=ERROR;
+
+-- Merge each batch of journal deltas into BugSummary with one set-based
+-- statement, rather than an UPSERT per aggregated row, so that busy
+-- targets don't leave the journal growing faster than it's rolled up.
+CREATE OR REPLACE FUNCTION bugsummary_rollup_journal(
+    batchsize integer DEFAULT NULL::integer) RETURNS void
+    LANGUAGE plpgsql SECURITY DEFINER
+    SET search_path TO 'public'
+    AS $$
+DECLARE
+    max_id integer;
+BEGIN
+    -- Lock so we don't content with other invokations of this
+    -- function. We can happily lock the BugSummary table for writes
+    -- as this function is the only thing that updates that table.
+    -- BugSummaryJournal remains unlocked so nothing should be blocked.
+    LOCK TABLE BugSummary IN ROW EXCLUSIVE MODE;
+
+    IF batchsize IS NULL THEN
+        SELECT MAX(id) INTO max_id FROM BugSummaryJournal;
+    ELSE
+        SELECT MAX(id) INTO max_id FROM (
+            SELECT id FROM BugSummaryJournal ORDER BY id LIMIT batchsize
+            ) AS Whatever;
+    END IF;
+
+    -- Each key's deltas are summed once.  Decrements only apply to
+    -- existing rows, as bug_summary_dec did; increments insert any
+    -- missing rows, matching on the expressions of bugsummary__unique.
+    WITH deltas AS (
+        SELECT
+            SUM(count) AS count,
+            product,
+            productseries,
+            distribution,
+            distroseries,
+            sourcepackagename,
+            viewed_by,
+            tag,
+            status,
+            milestone,
+            importance,
+            has_patch,
+            access_policy
+        FROM BugSummaryJournal
+        WHERE id <= max_id
+        GROUP BY
+            product, productseries, distribution, distroseries,
+            sourcepackagename, viewed_by, tag, status, milestone,
+            importance, has_patch, access_policy
+        HAVING sum(count) <> 0
+    ), decremented AS (
+        UPDATE BugSummary SET count = BugSummary.count + deltas.count
+        FROM deltas
+        WHERE
+            deltas.count < 0
+            AND COALESCE(BugSummary.product, -1)
+                = COALESCE(deltas.product, -1)
+            AND COALESCE(BugSummary.productseries, -1)
+                = COALESCE(deltas.productseries, -1)
+            AND COALESCE(BugSummary.distribution, -1)
+                = COALESCE(deltas.distribution, -1)
+            AND COALESCE(BugSummary.distroseries, -1)
+                = COALESCE(deltas.distroseries, -1)
+            AND COALESCE(BugSummary.sourcepackagename, -1)
+                = COALESCE(deltas.sourcepackagename, -1)
+            AND BugSummary.status = deltas.status
+            AND BugSummary.importance = deltas.importance
+            AND BugSummary.has_patch = deltas.has_patch
+            AND COALESCE(BugSummary.tag, '') = COALESCE(deltas.tag, '')
+            AND COALESCE(BugSummary.milestone, -1)
+                = COALESCE(deltas.milestone, -1)
+            AND COALESCE(BugSummary.viewed_by, -1)
+                = COALESCE(deltas.viewed_by, -1)
+            AND COALESCE(BugSummary.access_policy, -1)
+                = COALESCE(deltas.access_policy, -1)
+    )
+    INSERT INTO BugSummary(
+        count, product, productseries, distribution,
+        distroseries, sourcepackagename, viewed_by, tag,
+        status, milestone, importance, has_patch, access_policy)
+    SELECT
+        count, product, productseries, distribution,
+        distroseries, sourcepackagename, viewed_by, tag,
+        status, milestone, importance, has_patch, access_policy
+    FROM deltas
+    WHERE count > 0
+    ON CONFLICT (
+        (COALESCE(product, -1)), (COALESCE(productseries, -1)),
+        (COALESCE(distribution, -1)), (COALESCE(distroseries, -1)),
+        (COALESCE(sourcepackagename, -1)), status, importance, has_patch,
+        (COALESCE(tag, '')), (COALESCE(milestone, -1)),
+        (COALESCE(viewed_by, -1)), (COALESCE(access_policy, -1)))
+    DO UPDATE SET count = BugSummary.count + EXCLUDED.count;
+
+    -- Clean out any counts we reduced to 0.
+    DELETE FROM BugSummary WHERE count=0;
+    -- Clean out the journal entries we have handled.
+    DELETE FROM BugSummaryJournal WHERE id <= max_id;
+END;
+$$;
+
+INSERT INTO LaunchpadDatabaseRevision VALUES (2210, 02, 0);
@@ -0,0 +1,87 @@
+-- Copyright 2019 Canonical Ltd.  This software is licensed under the
+-- GNU Affero General Public License version 3 (see the file LICENSE).
+
+SET client_min_messages=ERROR;
+
+-- Touch StructuralSubscription.date_last_updated whenever any of a
+-- subscription's bug filters change, so that in-memory copies of the
+-- filters can tell when they are stale.  clock_timestamp() is used
+-- rather than the transaction's start time so that each change within a
+-- transaction gives a new value.
+CREATE OR REPLACE FUNCTION bugsubscriptionfilter_touch_subscription()
+    RETURNS trigger
+    LANGUAGE plpgsql SECURITY DEFINER
+    SET search_path TO 'public'
+    AS $$
+BEGIN
+    IF TG_OP IN ('UPDATE', 'DELETE') THEN
+        UPDATE StructuralSubscription
+        SET date_last_updated = clock_timestamp() AT TIME ZONE 'UTC'
+        WHERE id = OLD.structuralsubscription;
+    END IF;
+    IF TG_OP IN ('INSERT', 'UPDATE') THEN
+        UPDATE StructuralSubscription
+        SET date_last_updated = clock_timestamp() AT TIME ZONE 'UTC'
+        WHERE id = NEW.structuralsubscription;
+    END IF;
+    RETURN NULL; -- Ignored - this is an AFTER trigger
+END;
+$$;
+
+COMMENT ON FUNCTION bugsubscriptionfilter_touch_subscription() IS 'Updates StructuralSubscription.date_last_updated when a BugSubscriptionFilter changes.';
+
+CREATE OR REPLACE FUNCTION bugsubscriptionfilter_detail_touch_subscription()
+    RETURNS trigger
+    LANGUAGE plpgsql SECURITY DEFINER
+    SET search_path TO 'public'
+    AS $$
+BEGIN
+    IF TG_OP IN ('UPDATE', 'DELETE') THEN
+        UPDATE StructuralSubscription
+        SET date_last_updated = clock_timestamp() AT TIME ZONE 'UTC'
+        FROM BugSubscriptionFilter
+        WHERE
+            BugSubscriptionFilter.id = OLD.filter
+            AND StructuralSubscription.id =
+                BugSubscriptionFilter.structuralsubscription;
+    END IF;
+    IF TG_OP IN ('INSERT', 'UPDATE') THEN
+        UPDATE StructuralSubscription
+        SET date_last_updated = clock_timestamp() AT TIME ZONE 'UTC'
+        FROM BugSubscriptionFilter
+        WHERE
+            BugSubscriptionFilter.id = NEW.filter
+            AND StructuralSubscription.id =
+                BugSubscriptionFilter.structuralsubscription;
+    END IF;
+    RETURN NULL; -- Ignored - this is an AFTER trigger
+END;
+$$;
+
+COMMENT ON FUNCTION bugsubscriptionfilter_detail_touch_subscription() IS 'Updates StructuralSubscription.date_last_updated when the statuses, importances, information types or tags of a BugSubscriptionFilter change.';
+
+CREATE TRIGGER bugsubscriptionfilter_touch_subscription_t
+    AFTER INSERT OR UPDATE OR DELETE ON BugSubscriptionFilter
+    FOR EACH ROW EXECUTE PROCEDURE bugsubscriptionfilter_touch_subscription();
+
+CREATE TRIGGER bugsubscriptionfilterstatus_touch_subscription_t
+    AFTER INSERT OR UPDATE OR DELETE ON BugSubscriptionFilterStatus
+    FOR EACH ROW EXECUTE PROCEDURE
+        bugsubscriptionfilter_detail_touch_subscription();
+
+CREATE TRIGGER bugsubscriptionfilterimportance_touch_subscription_t
+    AFTER INSERT OR UPDATE OR DELETE ON BugSubscriptionFilterImportance
+    FOR EACH ROW EXECUTE PROCEDURE
+        bugsubscriptionfilter_detail_touch_subscription();
+
+CREATE TRIGGER bugsubscriptionfilterinformationtype_touch_subscription_t
+    AFTER INSERT OR UPDATE OR DELETE ON BugSubscriptionFilterInformationType
+    FOR EACH ROW EXECUTE PROCEDURE
+        bugsubscriptionfilter_detail_touch_subscription();
+
+CREATE TRIGGER bugsubscriptionfiltertag_touch_subscription_t
+    AFTER INSERT OR UPDATE OR DELETE ON BugSubscriptionFilterTag
+    FOR EACH ROW EXECUTE PROCEDURE
+        bugsubscriptionfilter_detail_touch_subscription();
+
+INSERT INTO LaunchpadDatabaseRevision VALUES (2210, 03, 0);
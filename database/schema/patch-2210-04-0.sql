@@ -0,0 +1,49 @@
+-- Copyright 2019 Canonical Ltd.  This software is licensed under the
+-- GNU Affero General Public License version 3 (see the file LICENSE).
+
+SET client_min_messages=ERROR;
+
+-- Calculate the heat of many bugs at once.  The subscribers of each bug
+-- and of its duplicates are counted in one grouped query rather than
+-- once per bug.
+CREATE OR REPLACE FUNCTION calculate_bug_heat(bug_ids integer[])
+    RETURNS TABLE(bug integer, heat integer)
+    LANGUAGE sql STABLE STRICT
+    AS $_$
+    WITH subscriber AS (
+        SELECT BugSubscription.bug AS heat_bug, BugSubscription.person
+        FROM BugSubscription
+        WHERE BugSubscription.bug = ANY($1)
+        UNION
+        SELECT SubBug.duplicateof, BugSubscription.person
+        FROM BugSubscription
+        JOIN Bug AS SubBug ON BugSubscription.bug = SubBug.id
+        WHERE SubBug.duplicateof = ANY($1)),
+    subscriber_count AS (
+        SELECT heat_bug, COUNT(*) AS subscribers
+        FROM subscriber
+        GROUP BY heat_bug)
+    SELECT
+        Bug.id,
+        ((CASE Bug.information_type WHEN 1 THEN 0 WHEN 2 THEN 250
+            WHEN 3 THEN 400 ELSE 150 END)
+         + (Bug.number_of_duplicates * 6)
+         + (Bug.users_affected_count * 4)
+         + COALESCE(subscriber_count.subscribers, 0) * 2)::integer
+    FROM Bug
+    LEFT JOIN subscriber_count ON subscriber_count.heat_bug = Bug.id
+    WHERE Bug.id = ANY($1);
+$_$;
+
+COMMENT ON FUNCTION calculate_bug_heat(integer[]) IS 'Calculate the heat of each of a set of bugs.';
+
+-- Keep a single formula: the heat of one bug is calculated by the
+-- set-based function.
+CREATE OR REPLACE FUNCTION calculate_bug_heat(bug_id integer)
+    RETURNS integer
+    LANGUAGE sql STABLE STRICT
+    AS $_$
+    SELECT heat FROM calculate_bug_heat(ARRAY[$1]);
+$_$;
+
+INSERT INTO LaunchpadDatabaseRevision VALUES (2210, 04, 0);
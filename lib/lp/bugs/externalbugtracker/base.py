@@ -11,6 +11,7 @@ __all__ = [
     'BugTrackerConnectError',
     'BugWatchUpdateError',
     'BugWatchUpdateWarning',
+    'bugtracker_urlfetch',
     'ExternalBugTracker',
     'InvalidBugId',
     'LookupTree',
@@ -26,8 +27,10 @@ __all__ = [
     'UnsupportedBugTrackerVersion',
     ]
 
+import threading
 
 import requests
+from six.moves.http_cookiejar import DefaultCookiePolicy
 from six.moves.urllib_parse import (
     urljoin,
     urlparse,
@@ -45,7 +48,9 @@ from lp.bugs.interfaces.externalbugtracker import (
 from lp.services.config import config
 from lp.services.database.isolation import ensure_no_transaction
 from lp.services.timeout import (
+    make_url_fetcher_session,
     override_timeout,
+    TimeoutError,
     urlfetch,
     )
 
@@ -153,6 +158,67 @@ def repost_on_redirect_hook(response, *args, **kwargs):
     return response
 
 
+# Each thread keeps a session per remote host, so that successive
+# requests to a bug tracker can reuse connections.
+_sessions = threading.local()
+
+# Limits on the number of requests in flight to each remote host, shared
+# by all threads.
+_host_semaphores = {}
+_host_semaphores_lock = threading.Lock()
+
+
+def _get_session(host):
+    """Return this thread's session for requests to `host`.
+
+    Cookies are never stored in the session, so requests only send the
+    cookies that their callers pass explicitly.
+    """
+    sessions = getattr(_sessions, 'by_host', None)
+    if sessions is None:
+        sessions = _sessions.by_host = {}
+    session = sessions.get(host)
+    if session is None:
+        session = sessions[host] = make_url_fetcher_session()
+        session.cookies.set_policy(DefaultCookiePolicy(allowed_domains=[]))
+    return session
+
+
+def _get_host_semaphore(host):
+    with _host_semaphores_lock:
+        semaphore = _host_semaphores.get(host)
+        if semaphore is None:
+            semaphore = _host_semaphores[host] = threading.BoundedSemaphore(
+                config.checkwatches.max_requests_per_host)
+        return semaphore
+
+
+def bugtracker_urlfetch(url, timeout, **request_kwargs):
+    """Fetch a URL from a remote bug tracker.
+
+    Requests to the same host from the same thread reuse connections, and
+    at most config.checkwatches.max_requests_per_host requests to a host
+    are in flight at once.
+
+    :param url: The URL to fetch.
+    :param timeout: The timeout for the request, in seconds.
+    :param request_kwargs: Additional keyword arguments for `urlfetch`.
+    :return: A `requests.Response` object.
+    :raises requests.RequestException: if the request fails.
+    """
+    host = urlparse(url).netloc
+    with _get_host_semaphore(host):
+        try:
+            with override_timeout(timeout):
+                return urlfetch(
+                    url, use_proxy=True, session=_get_session(host),
+                    **request_kwargs)
+        except TimeoutError:
+            # The session has been closed; start a new one next time.
+            _sessions.by_host.pop(host, None)
+            raise
+
+
 @implementer(IExternalBugTracker)
 class ExternalBugTracker:
     """Base class for an external bug tracker."""
@@ -258,8 +324,7 @@ class ExternalBugTracker:
         :return: A `requests.Response` object.
         :raises requests.RequestException: if the request fails.
         """
-        with override_timeout(self.timeout):
-            return urlfetch(url, method=method, use_proxy=True, **kwargs)
+        return bugtracker_urlfetch(url, self.timeout, method=method, **kwargs)
 
     def _getPage(self, page, **kwargs):
         """GET the specified page on the remote HTTP server.
@@ -5,6 +5,9 @@
 
 __metaclass__ = type
 
+import threading
+
+from fixtures import MockPatch
 import responses
 from testtools.matchers import (
     ContainsDict,
@@ -15,6 +18,7 @@ from testtools.matchers import (
 import transaction
 from zope.interface import implementer
 
+from lp.bugs.externalbugtracker import base
 from lp.bugs.externalbugtracker.base import (
     BugTrackerConnectError,
     ExternalBugTracker,
@@ -26,6 +30,7 @@ from lp.bugs.interfaces.externalbugtracker import (
     ISupportsCommentImport,
     ISupportsCommentPushing,
     )
+from lp.services.timeout import TimeoutError
 from lp.testing import TestCase
 from lp.testing.layers import ZopelessDatabaseLayer
 
@@ -190,3 +195,39 @@ class TestExternalBugTracker(TestCase):
                 "User-Agent": Equals(LP_USER_AGENT),
                 "Host": Equals(base_host),
                 })))
+
+    def test_makeRequest_reuses_session(self):
+        # Requests to a host from one thread share a session, which
+        # doesn't store cookies.
+        urlfetch = self.useFixture(
+            MockPatch('lp.bugs.externalbugtracker.base.urlfetch')).mock
+        bugtracker = ExternalBugTracker('http://example.com/')
+        transaction.commit()
+        bugtracker.makeRequest('GET', 'http://example.com/one')
+        bugtracker.makeRequest('GET', 'http://example.com/two')
+        sessions = [
+            call[1]['session'] for call in urlfetch.call_args_list]
+        self.assertIs(sessions[0], sessions[1])
+        self.assertEqual(
+            [], sessions[0].cookies.get_policy().allowed_domains())
+        other_sessions = []
+        thread = threading.Thread(
+            target=lambda: other_sessions.append(
+                base._get_session('example.com')))
+        thread.start()
+        thread.join()
+        self.assertIsNot(sessions[0], other_sessions[0])
+
+    def test_makeRequest_discards_session_on_timeout(self):
+        # A session that timed out is replaced by a new one.
+        urlfetch = self.useFixture(MockPatch(
+            'lp.bugs.externalbugtracker.base.urlfetch',
+            side_effect=TimeoutError('timed out'))).mock
+        bugtracker = ExternalBugTracker('http://example.com/')
+        transaction.commit()
+        self.assertRaises(
+            TimeoutError, bugtracker.makeRequest,
+            'GET', 'http://example.com/')
+        self.assertIsNot(
+            urlfetch.call_args[1]['session'],
+            base._get_session('example.com'))
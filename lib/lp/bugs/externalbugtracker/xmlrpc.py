@@ -23,12 +23,11 @@ import requests
 from requests.cookies import RequestsCookieJar
 import six
 
-from lp.bugs.externalbugtracker.base import repost_on_redirect_hook
-from lp.services.config import config
-from lp.services.timeout import (
-    override_timeout,
-    urlfetch,
+from lp.bugs.externalbugtracker.base import (
+    bugtracker_urlfetch,
+    repost_on_redirect_hook,
     )
+from lp.services.config import config
 from lp.services.utils import traceback_info
 
 
@@ -36,8 +35,8 @@ class RequestsTransport(Transport):
     """An XML-RPC transport which uses requests.
 
     This XML-RPC transport uses the Python requests module to make the
-    request.  (In fact, it uses lp.services.timeout.urlfetch, which wraps
-    requests and deals with timeout handling.)
+    request.  (In fact, it uses bugtracker_urlfetch, which wraps requests
+    and deals with timeout handling and connection reuse.)
 
     Note: this transport isn't fit for general XML-RPC use.  It is just good
     enough for some of our external bug tracker implementations.
@@ -74,12 +73,11 @@ class RequestsTransport(Transport):
         # URL, a non-ASCII body and a proxy. http://bugs.python.org/issue12398
         url = six.ensure_binary(url)
         try:
-            with override_timeout(self.timeout):
-                response = urlfetch(
-                    url, method='POST', headers={'Content-Type': 'text/xml'},
-                    data=request_body, cookies=self.cookie_jar,
-                    hooks={'response': repost_on_redirect_hook},
-                    use_proxy=True)
+            response = bugtracker_urlfetch(
+                url, self.timeout, method='POST',
+                headers={'Content-Type': 'text/xml'}, data=request_body,
+                cookies=self.cookie_jar,
+                hooks={'response': repost_on_redirect_hook})
         except requests.HTTPError as e:
             raise ProtocolError(
                 url.decode('utf-8'), e.response.status_code, e.response.reason,
@@ -84,7 +84,21 @@ class IBugNotificationSet(Interface):
         `BugNotificationRecipient` objects.
         """
 
-    def getRecipientFilterData(bug, recipient_to_sources, notifications):
+    def preloadRecipientFilterData(notifications, filter_data=None):
+        """Load the mute and filter data for many notifications at once.
+
+        The data is plain IDs and descriptions, so it stays valid after
+        the transaction commits.
+
+        :param notifications: The notifications to load data for.
+        :param filter_data: An optional dict returned by an earlier call.
+            Notifications already in it are not loaded again.
+        :return: A dict mapping notification IDs to their data, for
+            getRecipientFilterData.
+        """
+
+    def getRecipientFilterData(bug, recipient_to_sources, notifications,
+                               filter_data=None):
         """Get non-muted recipients mapped to sources & filter descriptions.
 
         :param bug:
@@ -94,6 +108,8 @@ class IBugNotificationSet(Interface):
             (BugNotificationRecipients) that represent the subscriptions that
             caused the notifications to be sent.
         :param notifications: the notifications that are being communicated.
+        :param filter_data: A dict returned by preloadRecipientFilterData.
+            Data for notifications that aren't in it is loaded here.
 
         The dict of recipients may have fewer recipients than were
         provided if those users muted all of the subscription filters
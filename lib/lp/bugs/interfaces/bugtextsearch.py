@@ -0,0 +1,42 @@
+# Copyright 2019 Canonical Ltd.  This software is licensed under the
+# GNU Affero General Public License version 3 (see the file LICENSE).
+
+"""Interfaces for bug full-text search backends."""
+
+__metaclass__ = type
+
+__all__ = [
+    'active_bug_text_search_backend',
+    'IBugTextSearchBackend',
+    ]
+
+from zope.component import getUtility
+from zope.interface import Interface
+
+from lp.services.features import getFeatureFlag
+
+
+def active_bug_text_search_backend():
+    """Return the enabled `IBugTextSearchBackend`, or None.
+
+    None means that bug searches should match and rank text using the
+    database's full-text index directly.
+    """
+    backend = getFeatureFlag('bugs.text_search.backend')
+    if not backend:
+        return None
+    return getUtility(IBugTextSearchBackend, name=backend)
+
+
+class IBugTextSearchBackend(Interface):
+    """A service that finds the bugs that best match some text."""
+
+    def search(text, limit):
+        """Return the IDs of the bugs that best match text.
+
+        :param text: A search phrase, as accepted by ftq().
+        :param limit: The maximum number of bug IDs to return.
+        :return: A list of at most limit bug IDs, best match first, or
+            None if this backend can't answer the query and the database's
+            full-text index should be used instead.
+        """
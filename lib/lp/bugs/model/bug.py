@@ -12,7 +12,9 @@ __all__ = [
     'BugMute',
     'BugSet',
     'BugTag',
+    'calculate_bug_heat',
     'FileBugData',
+    'flush_bug_heat_updates',
     'generate_subscription_with',
     'get_also_notified_subscribers',
     'get_bug_tags_open_count',
@@ -22,9 +24,12 @@ __all__ = [
 from cStringIO import StringIO
 from email.utils import make_msgid
 from functools import wraps
+import hashlib
 from itertools import chain
+import json
 import operator
 import re
+from weakref import WeakKeyDictionary
 
 from lazr.lifecycle.event import ObjectCreatedEvent
 from lazr.lifecycle.snapshot import Snapshot
@@ -64,6 +69,7 @@ from storm.store import (
     EmptyResultSet,
     Store,
     )
+import transaction
 from zope.component import getUtility
 from zope.contenttype import guess_content_type
 from zope.event import notify
@@ -198,10 +204,12 @@ from lp.services.database.decoratedresultset import DecoratedResultSet
 from lp.services.database.enumcol import EnumCol
 from lp.services.database.interfaces import IStore
 from lp.services.database.sqlbase import (
+    convert_storm_clause_to_string,
     SQLBase,
     sqlvalues,
     )
 from lp.services.database.stormbase import StormBase
+from lp.services.features import getFeatureFlag
 from lp.services.fields import DuplicateBug
 from lp.services.helpers import shortlist
 from lp.services.librarian.interfaces import ILibraryFileAliasSet
@@ -209,6 +217,7 @@ from lp.services.librarian.model import (
     LibraryFileAlias,
     LibraryFileContent,
     )
+from lp.services.memcache.interfaces import IMemcacheClient
 from lp.services.messages.interfaces.message import (
     IMessage,
     IndexedMessage,
@@ -261,15 +270,45 @@ def get_bug_tags_open_count(context_condition, user, tag_limit=0,
         used tags to a specific context. Only the BugSummary table may be
         used to choose the context. If False then no query will be performed
         (and {} returned).
+
+    If the bugs.tag_counts.cache_seconds feature flag is set, the counts of
+    public bugs are cached for that many seconds and shared by all users,
+    and only the private bugs that the user can see are counted each time.
     """
     # Circular fail.
     from lp.bugs.model.bugsummary import (
         BugSummary,
         get_bugsummary_filter_for_user,
+        get_bugsummary_private_filter_for_user,
         )
     tags = {}
     if include_tags:
         tags = dict((tag, 0) for tag in include_tags)
+
+    cache_seconds = getFeatureFlag('bugs.tag_counts.cache_seconds')
+    if (cache_seconds and context_condition is not False and
+            (user is None or not IPersonRoles(user).in_admin)):
+        counts = _get_cached_public_bug_tag_counts(
+            context_condition, int(cache_seconds))
+        if user is not None:
+            user_with, private_filter = (
+                get_bugsummary_private_filter_for_user(user))
+            private_counts = _get_open_bug_tag_counts(
+                IStore(BugSummary).with_(user_with),
+                context_condition, private_filter)
+            for tag, count in private_counts.iteritems():
+                counts[tag] = counts.get(tag, 0) + count
+        used = sorted(
+            [(tag, count) for tag, count in counts.iteritems() if count != 0],
+            key=lambda item: (-item[1], item[0]))
+        if tag_limit:
+            used = used[:tag_limit]
+        tags.update(used)
+        if include_tags:
+            tags.update(
+                (tag, counts[tag]) for tag in include_tags if counts.get(tag))
+        return tags
+
     where_conditions = [
         BugSummary.status.is_in(UNRESOLVED_BUGTASK_STATUSES),
         BugSummary.tag != None,
@@ -301,6 +340,48 @@ def get_bug_tags_open_count(context_condition, user, tag_limit=0,
     return tags
 
 
+def _get_open_bug_tag_counts(store, *conditions):
+    """Return a dict mapping tags to their counts of open bugs.
+
+    :param conditions: Storm expressions limiting the BugSummary rows that
+        are counted.
+    """
+    # Circular fail.
+    from lp.bugs.model.bugsummary import BugSummary
+    sum_count = Sum(BugSummary.count)
+    return dict(store.find(
+        (BugSummary.tag, sum_count),
+        BugSummary.status.is_in(UNRESOLVED_BUGTASK_STATUSES),
+        BugSummary.tag != None, *conditions).group_by(BugSummary.tag))
+
+
+def _get_cached_public_bug_tag_counts(context_condition, cache_seconds):
+    """Return the counts of open public bugs with each tag in a context.
+
+    The counts are cached in memcache for `cache_seconds`.
+    """
+    # Circular fail.
+    from lp.bugs.model.bugsummary import (
+        BugSummary,
+        get_bugsummary_filter_for_user,
+        )
+    memcache_client = getUtility(IMemcacheClient)
+    context_sql = convert_storm_clause_to_string(context_condition)
+    memcache_key = "bug-tag-counts:%s" % hashlib.sha1(
+        context_sql.encode("UTF-8")).hexdigest()
+    cached_counts = memcache_client.get(memcache_key)
+    if cached_counts is not None:
+        try:
+            return json.loads(cached_counts)
+        except ValueError:
+            memcache_client.delete(memcache_key)
+    public_with, public_where = get_bugsummary_filter_for_user(None)
+    counts = _get_open_bug_tag_counts(
+        IStore(BugSummary), context_condition, *public_where)
+    memcache_client.set(memcache_key, json.dumps(counts), cache_seconds)
+    return counts
+
+
 @implementer(IBugBecameQuestionEvent)
 class BugBecameQuestionEvent:
     """See `IBugBecameQuestionEvent`."""
@@ -311,17 +392,68 @@ class BugBecameQuestionEvent:
         self.user = user
 
 
+# The IDs of the bugs whose heat must be updated before each transaction
+# commits.
+_pending_heat_updates = WeakKeyDictionary()
+
+
 def update_bug_heat(bug_ids):
-    """Update the heat for the specified bugs."""
-    # We need to flush the store first to ensure that changes are
-    # reflected in the new bug heat total.
+    """Update the heat for the specified bugs.
+
+    The heat of every bug passed in during a transaction is calculated
+    together, once, when the transaction commits or when any bug's heat
+    is read, so that making many changes to a bug is cheap.
+    """
+    if not bug_ids:
+        return
+    current = transaction.get()
+    pending = _pending_heat_updates.get(current)
+    if pending is None:
+        pending = _pending_heat_updates[current] = set()
+        current.addBeforeCommitHook(flush_bug_heat_updates)
+    pending.update(bug_ids)
+
+
+def calculate_bug_heat(bug_ids):
+    """Calculate the heat of the specified bugs.
+
+    The calculate_bug_heat(integer[]) database function gathers the
+    counts for all the bugs in grouped queries.
+
+    :return: A dict mapping bug IDs to their heat.
+    """
     if not bug_ids:
+        return {}
+    return dict(IStore(Bug).execute(
+        "SELECT bug, heat FROM calculate_bug_heat(ARRAY[%s]::integer[])"
+        % ', '.join(str(int(bug_id)) for bug_id in bug_ids)))
+
+
+def flush_bug_heat_updates():
+    """Apply the heat updates pending in this transaction.
+
+    Code that reads Bug.heat or BugTaskFlat.heat with raw SQL must call
+    this first to see changes made in the current transaction.
+    """
+    pending = _pending_heat_updates.pop(transaction.get(), None)
+    if not pending:
         return
+    # Setting the same value for many bugs at once keeps their cached
+    # objects up to date, and there are usually few distinct values.
+    bug_ids_by_heat = {}
+    for bug_id, heat in calculate_bug_heat(pending).iteritems():
+        bug_ids_by_heat.setdefault(heat, []).append(bug_id)
     store = IStore(Bug)
-    store.find(
-        Bug, Bug.id.is_in(bug_ids)).set(
-            heat=SQL('calculate_bug_heat(Bug.id)'),
-            heat_last_updated=UTC_NOW)
+    for heat, bug_ids in bug_ids_by_heat.iteritems():
+        store.find(Bug, Bug.id.is_in(bug_ids)).set(
+            _heat=heat, heat_last_updated=UTC_NOW)
+
+
+def discard_bug_heat_update(bug_id):
+    """Forget any pending heat update for a bug."""
+    pending = _pending_heat_updates.get(transaction.get())
+    if pending is not None:
+        pending.discard(bug_id)
 
 
 @implementer(IBug, IInformationType)
@@ -367,10 +499,22 @@ class Bug(SQLBase, InformationTypeMixin):
     message_count = IntCol(notNull=True, default=0)
     users_affected_count = IntCol(notNull=True, default=0)
     users_unaffected_count = IntCol(notNull=True, default=0)
-    heat = IntCol(notNull=True, default=0)
+    _heat = IntCol(dbName='heat', notNull=True, default=0)
     heat_last_updated = UtcDateTimeCol(default=None)
     latest_patch_uploaded = UtcDateTimeCol(default=None)
 
+    @property
+    def heat(self):
+        """See `IBug`."""
+        flush_bug_heat_updates()
+        return self._heat
+
+    @heat.setter
+    def heat(self, value):
+        # A heat set directly replaces any pending update.
+        discard_bug_heat_update(self.id)
+        self._heat = value
+
     @property
     def linked_branches(self):
         return [link.branch for link in self.linked_bugbranches]
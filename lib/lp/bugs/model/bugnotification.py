@@ -194,22 +194,82 @@ class BugNotificationSet:
 
         return bug_notification
 
+    def preloadRecipientFilterData(self, notifications, filter_data=None):
+        """See `IBugNotificationSet`."""
+        if filter_data is None:
+            filter_data = {}
+        notifications = [
+            notification for notification in notifications
+            if notification.id not in filter_data]
+        if not notifications:
+            return filter_data
+        # Sidestep circular reference.
+        from lp.bugs.model.bug import BugMute
+        store = IStore(BugNotification)
+        muted_person_ids = {}
+        for bug_id, person_id in store.find(
+                (BugMute.bug_id, BugMute.person_id),
+                In(BugMute.bug_id, list(set(
+                    notification.bugID for notification in notifications)))):
+            muted_person_ids.setdefault(bug_id, set()).add(person_id)
+        source = store.using(
+            BugNotificationFilter,
+            Join(BugSubscriptionFilter,
+                 BugSubscriptionFilter.id ==
+                    BugNotificationFilter.bug_subscription_filter_id),
+            Join(StructuralSubscription,
+                 BugSubscriptionFilter.structural_subscription_id ==
+                    StructuralSubscription.id))
+        filters = {}
+        for notification_id, subscriber_id, filter_id, description in (
+                source.find(
+                    (BugNotificationFilter.bug_notification_id,
+                     StructuralSubscription.subscriberID,
+                     BugSubscriptionFilter.id,
+                     BugSubscriptionFilter.description),
+                    In(BugNotificationFilter.bug_notification_id,
+                       [notification.id
+                        for notification in notifications]))):
+            filters.setdefault(notification_id, []).append(
+                (subscriber_id, filter_id, description))
+        filter_ids = set(
+            filter_id for rows in filters.values()
+            for subscriber_id, filter_id, description in rows)
+        filter_mutes = {}
+        if filter_ids:
+            for person_id, filter_id in store.find(
+                    (BugSubscriptionFilterMute.person_id,
+                     BugSubscriptionFilterMute.filter_id),
+                    In(BugSubscriptionFilterMute.filter_id,
+                       list(filter_ids))):
+                filter_mutes.setdefault(filter_id, set()).add(person_id)
+        for notification in notifications:
+            notification_filters = filters.get(notification.id, [])
+            filter_data[notification.id] = (
+                muted_person_ids.get(notification.bugID, set()),
+                notification_filters,
+                dict(
+                    (filter_id, filter_mutes.get(filter_id, set()))
+                    for subscriber_id, filter_id, description
+                    in notification_filters))
+        return filter_data
+
     def getRecipientFilterData(self, bug, recipient_to_sources,
-                               notifications):
+                               notifications, filter_data=None):
         """See `IBugNotificationSet`."""
         if not notifications or not recipient_to_sources:
             # This is a shortcut that will remove some error conditions.
             return {}
+        # The mute and filter information for all the notifications is
+        # fetched at once, unless the caller already did so.
+        filter_data = self.preloadRecipientFilterData(
+            notifications, filter_data)
+        notification_data = [
+            filter_data[notification.id] for notification in notifications]
         # Collect bug mute information.
-        from lp.bugs.model.bug import BugMute
-        store = IStore(BugMute)
-        muted_person_ids = set(list(
-            store.find(BugMute.person_id,
-                       BugMute.bug == bug)))
-        # This makes two calls to the database to get all the
-        # information we need. The first call gets the filter ids and
-        # descriptions for each recipient, and then we divide up the
-        # information per recipient.
+        muted_person_ids = set()
+        for muted, filters, filter_mutes in notification_data:
+            muted_person_ids.update(muted)
         # First we get some intermediate data structures set up.
         source_person_id_map = {}
         recipient_id_map = {}
@@ -236,32 +296,15 @@ class BugNotificationSet:
                     source_person_id_map[person_id] = data
                 data['sources'].add(source)
         # Now we actually look for the filters.
-        store = IStore(BugSubscriptionFilter)
-        source = store.using(
-            BugSubscriptionFilter,
-            Join(BugNotificationFilter,
-                 BugSubscriptionFilter.id ==
-                    BugNotificationFilter.bug_subscription_filter_id),
-            Join(StructuralSubscription,
-                 BugSubscriptionFilter.structural_subscription_id ==
-                    StructuralSubscription.id))
-        if len(source_person_id_map) == 0:
-            filter_data = []
-        else:
-            filter_data = source.find(
-                (StructuralSubscription.subscriberID,
-                 BugSubscriptionFilter.id,
-                 BugSubscriptionFilter.description),
-                In(BugNotificationFilter.bug_notification_id,
-                   [notification.id for notification in notifications]),
-                In(StructuralSubscription.subscriberID,
-                   source_person_id_map.keys()))
         filter_ids = []
         # Record the filters for each source.
-        for source_person_id, filter_id, filter_description in filter_data:
-            source_person_id_map[source_person_id]['filters'][filter_id] = (
-                filter_description)
-            filter_ids.append(filter_id)
+        for muted, filters, filter_mutes in notification_data:
+            for source_person_id, filter_id, filter_description in filters:
+                if source_person_id not in source_person_id_map:
+                    continue
+                source_person_id_map[source_person_id]['filters'][
+                    filter_id] = filter_description
+                filter_ids.append(filter_id)
 
         # This is only necessary while production and sample data have
         # structural subscriptions without filters.  Assign the filters to
@@ -276,12 +319,13 @@ class BugNotificationSet:
         if filter_ids:
             # Now we get the information about subscriptions that might be
             # filtered and take that into account.
-            mute_data = store.find(
-                (BugSubscriptionFilterMute.person_id,
-                 BugSubscriptionFilterMute.filter_id),
-                In(BugSubscriptionFilterMute.person_id,
-                   recipient_id_map.keys()),
-                In(BugSubscriptionFilterMute.filter_id, filter_ids))
+            all_filter_mutes = {}
+            for muted, filters, filter_mutes in notification_data:
+                all_filter_mutes.update(filter_mutes)
+            mute_data = set(
+                (person_id, filter_id) for filter_id in filter_ids
+                for person_id in all_filter_mutes[filter_id]
+                if person_id in recipient_id_map)
             for person_id, filter_id in mute_data:
                 if filter_id in recipient_id_map[person_id]['filters']:
                     del recipient_id_map[person_id]['filters'][filter_id]
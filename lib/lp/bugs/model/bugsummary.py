@@ -8,6 +8,7 @@ __all__ = [
     'BugSummary',
     'CombineBugSummaryConstraint',
     'get_bugsummary_filter_for_user',
+    'get_bugsummary_private_filter_for_user',
     ]
 
 from storm.base import Storm
@@ -48,7 +49,7 @@ from lp.registry.model.person import Person
 from lp.registry.model.product import Product
 from lp.registry.model.productseries import ProductSeries
 from lp.registry.model.sourcepackagename import SourcePackageName
-from lp.registry.model.teammembership import TeamParticipation
+from lp.registry.model.teammembership import get_participated_team_ids
 from lp.services.database.enumcol import EnumCol
 
 
@@ -133,25 +134,33 @@ def get_bugsummary_filter_for_user(user):
     elif IPersonRoles(user).in_admin:
         return [], []
     else:
-        with_clauses = [
-            With(
-                'teams',
-                Select(
-                    TeamParticipation.teamID, tables=[TeamParticipation],
-                    where=(TeamParticipation.personID == user.id))),
-            With(
-                'policies',
-                Select(
-                    AccessPolicyGrant.policy_id,
-                    tables=[AccessPolicyGrant],
-                    where=(
-                        AccessPolicyGrant.grantee_id.is_in(
-                            SQL("SELECT team FROM teams"))))),
-            ]
-        where_clauses = [Or(
-            public_filter,
-            BugSummary.viewed_by_id.is_in(
-                SQL("SELECT team FROM teams")),
-            BugSummary.access_policy_id.is_in(
-                SQL("SELECT policy FROM policies")))]
-        return with_clauses, where_clauses
+        with_clauses, private_filter = (
+            get_bugsummary_private_filter_for_user(user))
+        return with_clauses, [Or(public_filter, private_filter)]
+
+
+def get_bugsummary_private_filter_for_user(user):
+    """Build a Storm expression to filter BugSummary to private rows.
+
+    Public rows, which have neither viewed_by nor access_policy set, are
+    excluded, so adding the counts from these rows to those from the
+    public rows gives the counts that `get_bugsummary_filter_for_user`
+    allows for a user other than an admin.
+
+    :param user: The user for which visible rows should be calculated.
+    :return: (with_clauses, where_clause)
+    """
+    team_ids = get_participated_team_ids(removeSecurityProxy(user))
+    with_clauses = [
+        With(
+            'policies',
+            Select(
+                AccessPolicyGrant.policy_id,
+                tables=[AccessPolicyGrant],
+                where=(AccessPolicyGrant.grantee_id.is_in(team_ids)))),
+        ]
+    where_clause = Or(
+        BugSummary.viewed_by_id.is_in(team_ids),
+        BugSummary.access_policy_id.is_in(
+            SQL("SELECT policy FROM policies")))
+    return with_clauses, where_clause
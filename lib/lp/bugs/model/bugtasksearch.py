@@ -52,10 +52,12 @@ from lp.bugs.interfaces.bugtasksearch import (
     BugBranchSearch,
     BugTaskSearchParams,
     )
+from lp.bugs.interfaces.bugtextsearch import active_bug_text_search_backend
 from lp.bugs.model.bug import (
     Bug,
     BugAffectsPerson,
     BugTag,
+    flush_bug_heat_updates,
     )
 from lp.bugs.model.bugattachment import BugAttachment
 from lp.bugs.model.bugbranch import BugBranch
@@ -80,12 +82,17 @@ from lp.registry.model.product import (
     Product,
     ProductSet,
     )
-from lp.registry.model.teammembership import TeamParticipation
+from lp.registry.model.teammembership import (
+    get_participated_team_ids,
+    TeamParticipation,
+    )
+from lp.services.config import config
 from lp.services.database.bulk import load
 from lp.services.database.decoratedresultset import DecoratedResultSet
 from lp.services.database.interfaces import IStore
 from lp.services.database.sqlbase import sqlvalues
 from lp.services.database.stormexpr import (
+    Array,
     ArrayAgg,
     ArrayIntersects,
     fti_search,
@@ -203,6 +210,8 @@ def search_bugs(pre_iter_hook, alternatives, just_bug_ids=False):
         respected.
     :param just_bug_ids: Return a ResultSet of bug IDs instead of BugTasks.
     """
+    # BugTaskFlat.heat must reflect changes made in this transaction.
+    flush_bug_heat_updates()
     store = IStore(BugTask)
     orderby_expression, orderby_joins = _process_order_by(alternatives[0])
     decorators = []
@@ -440,9 +449,6 @@ def _build_query(params):
                         where=search_value_to_storm_where_condition(
                             BugAttachment.type, params.attachmenttype))))
 
-    if params.searchtext:
-        extra_clauses.append(_build_search_text_clause(params))
-
     if params.fast_searchtext:
         extra_clauses.append(_build_search_text_clause(params, fast=True))
 
@@ -727,6 +733,22 @@ def _build_query(params):
             search_value_to_storm_where_condition(
                 BugTaskFlat.information_type, params.information_type))
 
+    if params.searchtext:
+        # The text is matched last, so that a text search backend's
+        # candidates can be checked against everything else.
+        def filter_bug_ids(bug_ids):
+            store = IStore(BugTaskFlat)
+            if with_clauses:
+                store = store.with_(SQL(', '.join(with_clauses)))
+            origin = _build_origin(join_tables, clauseTables, BugTaskFlat)
+            return set(store.using(*origin).find(
+                BugTaskFlat.bug_id,
+                And(extra_clauses + [BugTaskFlat.bug_id.is_in(bug_ids)])
+                ).config(distinct=True))
+
+        extra_clauses.append(
+            _build_search_text_clause(params, filter_bug_ids=filter_bug_ids))
+
     query = And(extra_clauses)
 
     if not decorators:
@@ -844,8 +866,14 @@ def _require_params(params):
     return params
 
 
-def _build_search_text_clause(params, fast=False):
-    """Build the clause for searchtext."""
+def _build_search_text_clause(params, fast=False, filter_bug_ids=None):
+    """Build the clause for searchtext.
+
+    :param filter_bug_ids: A callable that returns the subset of some bug
+        IDs that match the rest of the search.  If given, and a text search
+        backend is enabled, the backend's best matches are checked against
+        the rest of the search until enough of them survive.
+    """
     if fast:
         assert params.searchtext is None, (
             'Cannot use searchtext at the same time as fast_searchtext.')
@@ -856,6 +884,12 @@ def _build_search_text_clause(params, fast=False):
             'Cannot use fast_searchtext at the same time as searchtext.')
         searchtext = params.searchtext
         ftq_for_fti = True
+        backend = active_bug_text_search_backend()
+        if backend is not None and filter_bug_ids is not None:
+            bug_ids = _search_bug_text_backend(
+                backend, searchtext, filter_bug_ids)
+            if bug_ids is not None:
+                return _build_ranked_bug_ids_clause(params, bug_ids)
 
     if params.orderby is None:
         # Unordered search results aren't useful, so sort by relevance
@@ -865,6 +899,55 @@ def _build_search_text_clause(params, fast=False):
     return fti_search(BugTaskFlat, searchtext, ftq_for_fti)
 
 
+def _search_bug_text_backend(backend, searchtext, filter_bug_ids):
+    """Return the best matches for searchtext that pass filter_bug_ids.
+
+    The backend is asked for twice as many candidates each round, and the
+    new ones are filtered, until config.malone.bug_text_index_candidates
+    of them survive or the backend runs out of matches.  Only that many
+    bugs are returned, best match first, so broad queries are capped to
+    their best matches.
+
+    :return: A list of bug IDs, or None if the backend can't answer the
+        query or too many candidates were filtered out, in which case the
+        database's full-text index should be used instead.
+    """
+    wanted = config.malone.bug_text_index_candidates
+    scan_limit = max(wanted, config.malone.bug_text_index_scan_limit)
+    limit = wanted
+    checked = 0
+    matches = []
+    while True:
+        candidates = backend.search(searchtext, limit)
+        if candidates is None:
+            return None
+        new_candidates = candidates[checked:]
+        if new_candidates:
+            survivors = filter_bug_ids(new_candidates)
+            matches.extend(
+                bug_id for bug_id in new_candidates if bug_id in survivors)
+        checked = len(candidates)
+        if len(matches) >= wanted or checked < limit:
+            return matches[:wanted]
+        if limit >= scan_limit:
+            return None
+        limit = min(limit * 2, scan_limit)
+
+
+def _build_ranked_bug_ids_clause(params, bug_ids):
+    """Build the clause for searchtext matched by a text search backend.
+
+    :param bug_ids: The matching bug IDs, best match first.
+    """
+    if params.orderby is None and bug_ids:
+        # Unordered search results aren't useful, so sort by relevance
+        # instead.
+        params.orderby = [SQL(
+            'array_position(ARRAY[%s], BugTaskFlat.bug)'
+            % ', '.join(str(int(bug_id)) for bug_id in bug_ids))]
+    return BugTaskFlat.bug_id.is_in(bug_ids)
+
+
 def _build_status_clause(col, status):
     """Return the SQL query fragment for search by status.
 
@@ -1433,24 +1516,41 @@ def get_bug_privacy_filter_terms(user, check_admin=True):
     if user is None:
         return [public_bug_filter]
 
-    artifact_grant_query = Coalesce(
-            ArrayIntersects(SQL('BugTaskFlat.access_grants'),
-            Select(
-                ArrayAgg(TeamParticipation.teamID),
-                tables=TeamParticipation,
-                where=(TeamParticipation.person == user)
-            )), False)
-
-    policy_grant_query = Coalesce(
-            ArrayIntersects(SQL('BugTaskFlat.access_policies'),
-            Select(
-                ArrayAgg(AccessPolicyGrant.policy_id),
-                tables=(AccessPolicyGrant,
-                        Join(TeamParticipation,
-                            TeamParticipation.teamID ==
-                            AccessPolicyGrant.grantee_id)),
-                where=(TeamParticipation.person == user)
-            )), False)
+    if zope_isinstance(user, Person):
+        # We know the user, so embed their (cached) teams as a constant
+        # rather than asking the planner to look them up per statement.
+        team_ids = get_participated_team_ids(removeSecurityProxy(user))
+        if team_ids:
+            artifact_grant_query = ArrayIntersects(
+                SQL('BugTaskFlat.access_grants'), Array(*team_ids))
+            policy_grant_query = Coalesce(
+                    ArrayIntersects(SQL('BugTaskFlat.access_policies'),
+                    Select(
+                        ArrayAgg(AccessPolicyGrant.policy_id),
+                        tables=AccessPolicyGrant,
+                        where=AccessPolicyGrant.grantee_id.is_in(team_ids)
+                    )), False)
+        else:
+            artifact_grant_query = policy_grant_query = False
+    else:
+        artifact_grant_query = Coalesce(
+                ArrayIntersects(SQL('BugTaskFlat.access_grants'),
+                Select(
+                    ArrayAgg(TeamParticipation.teamID),
+                    tables=TeamParticipation,
+                    where=(TeamParticipation.person == user)
+                )), False)
+
+        policy_grant_query = Coalesce(
+                ArrayIntersects(SQL('BugTaskFlat.access_policies'),
+                Select(
+                    ArrayAgg(AccessPolicyGrant.policy_id),
+                    tables=(AccessPolicyGrant,
+                            Join(TeamParticipation,
+                                TeamParticipation.teamID ==
+                                AccessPolicyGrant.grantee_id)),
+                    where=(TeamParticipation.person == user)
+                )), False)
 
     filters = [public_bug_filter, artifact_grant_query, policy_grant_query]
 
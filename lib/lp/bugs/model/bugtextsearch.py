@@ -0,0 +1,308 @@
+# Copyright 2019 Canonical Ltd.  This software is licensed under the
+# GNU Affero General Public License version 3 (see the file LICENSE).
+
+"""An inverted index of bug text, for ranked full-text bug search.
+
+The index holds the lexemes of each bug's full-text vector, as kept in
+BugTaskFlat.fti, and ranks the bugs that contain all of a query's terms
+without having to score every match.
+"""
+
+__metaclass__ = type
+__all__ = [
+    'FileBackedInvertedIndex',
+    'InvertedIndex',
+    'InvertedIndexBugTextSearch',
+    'parse_tsvector',
+    'update_bug_text_index',
+    ]
+
+import heapq
+from math import log
+import marshal
+from operator import itemgetter
+import os
+import re
+import threading
+
+from zope.interface import implementer
+
+from lp.bugs.interfaces.bugtextsearch import IBugTextSearchBackend
+from lp.bugs.model.bugtaskflat import BugTaskFlat
+from lp.services.config import config
+from lp.services.database.nl_search import nl_term_conjunction
+from lp.services.database.sqlbase import quote
+
+# A tsvector entry is a quoted lexeme, with any quotes in it doubled,
+# optionally followed by its positions, each of which may carry a weight
+# label: 'lexem':1A,5
+TS_VECTOR_ENTRY_RE = re.compile(r"'((?:[^']|'')+)'(?::([0-9A-D,]+))?")
+
+# The weights ts_rank() gives by default to positions labelled A to D.
+# Unlabelled positions are D.
+TS_WEIGHTS = {'A': 1.0, 'B': 0.4, 'C': 0.2, 'D': 0.1}
+
+# The most BugTaskFlat rows read by each query when the index is brought
+# up to date.
+SYNC_BATCH_SIZE = 10000
+
+# BugTaskFlat.date_last_updated is set when a transaction starts rather than
+# when it commits, so each sync rereads rows this many seconds older than
+# the newest it has seen, to pick up transactions that committed late.
+SYNC_OVERLAP_SECONDS = 300
+
+# The most bug IDs checked by each query for bugs that have been deleted.
+PURGE_BATCH_SIZE = 10000
+
+
+def parse_tsvector(text):
+    """Return a dict mapping each lexeme in a tsvector to its weight.
+
+    A lexeme's weight is the sum of the ts_rank() weights of its
+    positions, or the weight of a single D position if it has none.
+    """
+    weights = {}
+    for lexeme, positions in TS_VECTOR_ENTRY_RE.findall(text):
+        if positions:
+            weight = sum(
+                TS_WEIGHTS.get(position[-1], TS_WEIGHTS['D'])
+                for position in positions.split(','))
+        else:
+            weight = TS_WEIGHTS['D']
+        weights[lexeme.replace("''", "'")] = weight
+    return weights
+
+
+def _saturate(weight):
+    """Damp a term's weight so that repeating it has diminishing returns."""
+    return weight / (weight + 1.0)
+
+
+class InvertedIndex:
+    """An in-memory map from terms to the documents that use them.
+
+    Documents are identified by integers and give a weight to each of
+    their terms.  `watermark` is for the caller to record how far the
+    index has been brought up to date.
+    """
+
+    def __init__(self):
+        # term -> {doc_id: weight}
+        self._postings = {}
+        # doc_id -> {term: weight}
+        self._documents = {}
+        # term -> an upper bound on its weight in any document
+        self._max_weights = {}
+        self.watermark = None
+
+    def __len__(self):
+        return len(self._documents)
+
+    def __contains__(self, doc_id):
+        return doc_id in self._documents
+
+    def __iter__(self):
+        return iter(self._documents)
+
+    def update(self, doc_id, term_weights):
+        """Index a document, replacing any terms it was indexed under."""
+        self.remove(doc_id)
+        self._documents[doc_id] = term_weights
+        for term, weight in term_weights.iteritems():
+            self._postings.setdefault(term, {})[doc_id] = weight
+            if weight > self._max_weights.get(term, 0):
+                self._max_weights[term] = weight
+
+    def remove(self, doc_id):
+        """Remove a document from the index, if it is there."""
+        term_weights = self._documents.pop(doc_id, None)
+        if term_weights is None:
+            return
+        for term in term_weights:
+            postings = self._postings[term]
+            del postings[doc_id]
+            # The maximum weights of terms still in use are left alone;
+            # they remain upper bounds, which is all that search needs.
+            if not postings:
+                del self._postings[term]
+                del self._max_weights[term]
+
+    def save(self):
+        """Persist the index.  In-memory indexes have nothing to save."""
+
+    def _idf(self, term):
+        return log(1.0 + float(len(self._documents)) / len(
+            self._postings[term]))
+
+    def search(self, terms, limit):
+        """Return up to limit documents using all of terms, best first.
+
+        A document scores the sum over the terms of their inverse document
+        frequency times their saturated weight in the document, and ties
+        go to the lowest ID.  Candidates are taken from the rarest term
+        in descending order of weight, and the scan stops as soon as a
+        candidate couldn't beat the current results even if the other
+        terms had their greatest possible weights.
+        """
+        terms = set(terms)
+        if not terms or limit <= 0:
+            return []
+        if any(term not in self._postings for term in terms):
+            return []
+        idfs = dict((term, self._idf(term)) for term in terms)
+        others = sorted(terms, key=lambda term: len(self._postings[term]))
+        rarest = others.pop(0)
+        others_bound = sum(
+            idfs[term] * _saturate(self._max_weights[term])
+            for term in others)
+        candidates = sorted(
+            self._postings[rarest].iteritems(), key=itemgetter(1),
+            reverse=True)
+        # A min-heap of (score, -doc_id) for the best documents so far.
+        best = []
+        for doc_id, weight in candidates:
+            score = idfs[rarest] * _saturate(weight)
+            if len(best) == limit and best[0][0] > score + others_bound:
+                break
+            for term in others:
+                other_weight = self._postings[term].get(doc_id)
+                if other_weight is None:
+                    break
+                score += idfs[term] * _saturate(other_weight)
+            else:
+                if len(best) < limit:
+                    heapq.heappush(best, (score, -doc_id))
+                elif (score, -doc_id) > best[0]:
+                    heapq.heapreplace(best, (score, -doc_id))
+        return [-negated_id for score, negated_id in sorted(
+            best, reverse=True)]
+
+
+class FileBackedInvertedIndex(InvertedIndex):
+    """An `InvertedIndex` that is loaded from and saved to a file."""
+
+    def __init__(self, path):
+        super(FileBackedInvertedIndex, self).__init__()
+        self.path = path
+        if os.path.exists(path):
+            with open(path, 'rb') as index_file:
+                documents, self.watermark = marshal.load(index_file)
+            for doc_id, term_weights in documents.iteritems():
+                self.update(doc_id, term_weights)
+
+    def save(self):
+        """Write the index to its file, replacing the old one atomically."""
+        new_path = self.path + '.new'
+        with open(new_path, 'wb') as index_file:
+            marshal.dump((self._documents, self.watermark), index_file)
+        os.rename(new_path, self.path)
+
+
+def update_bug_text_index(index, store, log=None):
+    """Bring an `InvertedIndex` up to date with BugTaskFlat, and save it.
+
+    The rows changed since the index's watermark are read in pages, each
+    starting strictly after the (date_last_updated, bug) of the last row
+    of the page before, so that any number of rows may share a timestamp.
+    Bugs that no longer have any BugTaskFlat rows are then removed.
+    """
+    if index.watermark is None:
+        start = "CAST('-infinity' AS timestamp)"
+    else:
+        start = "CAST(%s AS timestamp) - CAST('%d seconds' AS interval)" % (
+            quote(index.watermark), SYNC_OVERLAP_SECONDS)
+    after = (start, 0)
+    indexed = 0
+    last_date = None
+    while True:
+        rows = list(store.execute("""
+            SELECT bug, fti::text, date_last_updated
+            FROM BugTaskFlat
+            WHERE (date_last_updated, bug) > (%s, %d)
+            ORDER BY date_last_updated, bug
+            LIMIT %d
+            """ % (after[0], after[1], SYNC_BATCH_SIZE)))
+        for bug_id, fti, date_last_updated in rows:
+            if fti:
+                index.update(bug_id, parse_tsvector(fti))
+            else:
+                index.remove(bug_id)
+        indexed += len(rows)
+        if rows:
+            last_date = rows[-1][2]
+        if len(rows) < SYNC_BATCH_SIZE:
+            break
+        after = ("CAST(%s AS timestamp)" % quote(last_date), rows[-1][0])
+    if last_date is not None:
+        index.watermark = last_date.isoformat()
+
+    doc_ids = sorted(index)
+    purged = 0
+    for offset in range(0, len(doc_ids), PURGE_BATCH_SIZE):
+        chunk = doc_ids[offset:offset + PURGE_BATCH_SIZE]
+        existing = set(store.find(
+            BugTaskFlat.bug_id,
+            BugTaskFlat.bug_id.is_in(chunk)).config(distinct=True))
+        for doc_id in set(chunk) - existing:
+            index.remove(doc_id)
+            purged += 1
+    index.save()
+    if log is not None:
+        log.info(
+            "Indexed %d BugTaskFlat rows and removed %d deleted bugs.",
+            indexed, purged)
+
+
+@implementer(IBugTextSearchBackend)
+class InvertedIndexBugTextSearch:
+    """Bug text search from an `InvertedIndex` of BugTaskFlat.fti.
+
+    The index is built by cronscripts/update-bug-text-index.py, which
+    saves it to config.malone.bug_text_index_path.  Each process holds its
+    own copy of the index in memory.  It is loaded in a background thread,
+    and loaded again whenever the script replaces it; queries carry on
+    with the old index meanwhile, and are left to the database until
+    there is an index to use.
+    """
+
+    def __init__(self, index=None):
+        self.index = index
+        self._mtime = None
+        self._lock = threading.Lock()
+        self._loader = None
+
+    def _load(self, path):
+        try:
+            self.index = FileBackedInvertedIndex(path)
+        finally:
+            self._lock.release()
+
+    def _getIndex(self):
+        path = config.malone.bug_text_index_path
+        if not path:
+            return self.index
+        try:
+            mtime = os.stat(path).st_mtime
+        except OSError:
+            return self.index
+        # Only one thread at a time loads a new index, and never the one
+        # handling the query.  An index that fails to load isn't tried
+        # again until the file changes.
+        if mtime != self._mtime and self._lock.acquire(False):
+            self._mtime = mtime
+            self._loader = threading.Thread(
+                target=self._load, args=(path,),
+                name='BugTextIndexLoader')
+            self._loader.daemon = True
+            self._loader.start()
+        return self.index
+
+    def search(self, text, limit):
+        """See `IBugTextSearchBackend`."""
+        terms = nl_term_conjunction(text)
+        if not terms:
+            return None
+        index = self._getIndex()
+        if index is None:
+            return None
+        return index.search(terms, limit)
@@ -87,9 +87,15 @@ from lp.services.database.stormexpr import (
     ArrayContains,
     ArrayIntersects,
     )
+from lp.services.features import getFeatureFlag
 from lp.services.propertycache import cachedproperty
 
 
+# The most structural subscriptions whose filters are kept in memory by
+# each process.  The cache is emptied when it grows beyond this.
+FILTER_INDEX_MAX_SUBSCRIPTIONS = 50000
+
+
 @implementer(IStructuralSubscription)
 class StructuralSubscription(Storm):
     """A subscription to a Launchpad structure."""
@@ -682,8 +688,6 @@ def _get_structural_subscription_filter_id_query(
     :param direct_subscribers: a collection of Person objects who are
                                directly subscribed to the bug.
     """
-    # Circular. :-(
-    from lp.bugs.model.bugtasksearch import get_bug_bulk_privacy_filter_terms
     # We get the ids because we need to use group by in order to
     # look at the filters' tags in aggregate.  Once we have the ids,
     # we can get the full set of what we need in subsuming or
@@ -708,22 +712,11 @@ def _get_structural_subscription_filter_id_query(
     # given targets, and then work with that.  It also comes in handy
     # when we have to do a union, because we can share the work across
     # the two queries.
-    # We will exclude people who have a direct subscription to the bug.
-    filters = []
-    if direct_subscribers is not None:
-        if direct_subscribers:
-            filters.append(
-                Not(In(StructuralSubscription.subscriberID,
-                       tuple(person.id for person in direct_subscribers))))
-    else:
-        filters.append(
-            Not(In(StructuralSubscription.subscriberID,
-                   Select(BugSubscription.person_id,
-                          BugSubscription.bug == bug))))
-    if bug.private:
-        filters.append(
-            get_bug_bulk_privacy_filter_terms(
-                StructuralSubscription.subscriberID, bug))
+    filters = _get_structural_subscription_conditions(
+        bug, direct_subscribers)
+    if getFeatureFlag('bugs.structural_subscription_filter_index.enabled'):
+        return _match_structural_subscription_filters(
+            bug, query_arguments, level, filters) or None
     candidates = list(_get_structural_subscriptions(
         StructuralSubscription.id, query_arguments, *filters))
     if not candidates:
@@ -753,6 +746,207 @@ def _get_structural_subscription_filter_id_query(
     return _calculate_tag_query(conditions, list(bug.tags))
 
 
+def _get_structural_subscription_conditions(bug, direct_subscribers):
+    """Return conditions excluding subscriptions that can't get bug mail.
+
+    :param bug: a bug.
+    :param direct_subscribers: a collection of Person objects who are
+                               directly subscribed to the bug, or None to
+                               look them up.
+    """
+    # Circular. :-(
+    from lp.bugs.model.bugtasksearch import get_bug_bulk_privacy_filter_terms
+    # We will exclude people who have a direct subscription to the bug.
+    filters = []
+    if direct_subscribers is not None:
+        if direct_subscribers:
+            filters.append(
+                Not(In(StructuralSubscription.subscriberID,
+                       tuple(person.id for person in direct_subscribers))))
+    else:
+        filters.append(
+            Not(In(StructuralSubscription.subscriberID,
+                   Select(BugSubscription.person_id,
+                          BugSubscription.bug == bug))))
+    if bug.private:
+        filters.append(
+            get_bug_bulk_privacy_filter_terms(
+                StructuralSubscription.subscriberID, bug))
+    return filters
+
+
+class CompiledBugSubscriptionFilter:
+    """An in-memory copy of a `BugSubscriptionFilter`, for matching bugs.
+
+    `matches` agrees with the query built by
+    _get_structural_subscription_filter_id_query.
+    """
+
+    def __init__(self, bug_filter, statuses, importances, information_types,
+                 tags):
+        self.id = bug_filter.id
+        self.bug_notification_level = bug_filter.bug_notification_level
+        self.find_all_tags = bug_filter.find_all_tags
+        self.include_any_tags = bug_filter.include_any_tags
+        self.exclude_any_tags = bug_filter.exclude_any_tags
+        self.statuses = frozenset(statuses)
+        self.importances = frozenset(importances)
+        self.information_types = frozenset(information_types)
+        self.include_tags = frozenset(
+            tag for include, tag in tags if include)
+        self.exclude_tags = frozenset(
+            tag for include, tag in tags if not include)
+
+    def matchesTags(self, tags):
+        """Does this filter accept a bug with these tags?"""
+        if not tags:
+            return not self.include_any_tags and not self.include_tags
+        if self.exclude_any_tags:
+            return False
+        if self.include_any_tags:
+            return True
+        if self.find_all_tags:
+            return (
+                self.include_tags.issubset(tags) and
+                self.exclude_tags.isdisjoint(tags))
+        return (
+            not (self.include_tags or self.exclude_tags) or
+            not self.include_tags.isdisjoint(tags) or
+            not self.exclude_tags.issubset(tags))
+
+    def matches(self, bugtasks, level, information_type, tags):
+        """Does this filter accept a change to a bug?
+
+        :param bugtasks: the bugtasks whose targets the filter's
+            subscription matches.
+        :param level: a notification level, or None.
+        :param information_type: the bug's information type.
+        :param tags: a frozenset of the bug's tags.
+        """
+        if (level is not None and
+                self.bug_notification_level.value < level.value):
+            return False
+        if (self.information_types and
+                information_type not in self.information_types):
+            return False
+        if not any(
+                (not self.statuses or bugtask.status in self.statuses) and
+                (not self.importances or
+                 bugtask.importance in self.importances)
+                for bugtask in bugtasks):
+            return False
+        return self.matchesTags(tags)
+
+
+# Compiled filters for each structural subscription, keyed by
+# subscription ID, along with the date_last_updated of the subscription
+# when they were loaded.  Database triggers update date_last_updated
+# whenever a subscription's filters change, so a different date means
+# that an entry is stale.
+_filter_index = {}
+
+
+def _load_compiled_filters(subscription_ids):
+    """Load the `CompiledBugSubscriptionFilter`s for some subscriptions.
+
+    :return: a dict mapping each subscription ID to a list of its filters.
+    """
+    store = IStore(BugSubscriptionFilter)
+    bug_filters = list(store.find(
+        BugSubscriptionFilter,
+        BugSubscriptionFilter.structural_subscription_id.is_in(
+            subscription_ids)))
+    filter_ids = [bug_filter.id for bug_filter in bug_filters]
+    details = {}
+    for cls, columns in (
+            (BugSubscriptionFilterStatus, 'status'),
+            (BugSubscriptionFilterImportance, 'importance'),
+            (BugSubscriptionFilterInformationType, 'information_type'),
+            (BugSubscriptionFilterTag, ('include', 'tag'))):
+        values = defaultdict(list)
+        if isinstance(columns, tuple):
+            find = tuple(getattr(cls, column) for column in columns)
+        else:
+            find = getattr(cls, columns)
+        if filter_ids:
+            for filter_id, value in store.find(
+                    (cls.filter_id, find), cls.filter_id.is_in(filter_ids)):
+                values[filter_id].append(value)
+        details[cls] = values
+    compiled = dict(
+        (subscription_id, []) for subscription_id in subscription_ids)
+    for bug_filter in bug_filters:
+        compiled[bug_filter.structural_subscription_id].append(
+            CompiledBugSubscriptionFilter(
+                bug_filter,
+                details[BugSubscriptionFilterStatus][bug_filter.id],
+                details[BugSubscriptionFilterImportance][bug_filter.id],
+                details[BugSubscriptionFilterInformationType][bug_filter.id],
+                details[BugSubscriptionFilterTag][bug_filter.id]))
+    return compiled
+
+
+def _match_structural_subscription_filters(
+    bug, query_arguments, level, conditions):
+    """Return the IDs of the filters that match a bug, using `_filter_index`.
+
+    One query finds the candidate subscriptions, which targets each of
+    them matches, and whether their filters have changed since they were
+    loaded.  Only the filters of new or changed subscriptions are read
+    from the database; the rest are matched in memory.
+
+    :param bug: a bug.
+    :param query_arguments: an iterable of (bugtask, target) pairs, as
+                            returned by get_structural_subscription_targets.
+    :param level: a notification level.
+    :param conditions: additional conditions on the subscriptions.
+    """
+    targets = list(set(target for bugtask, target in query_arguments))
+    target_joins = [
+        IStructuralSubscriptionTargetHelper(target).join
+        for target in targets]
+    candidates = list(IStore(StructuralSubscription).find(
+        (StructuralSubscription.id, StructuralSubscription.date_last_updated)
+        + tuple(target_joins),
+        Or(*target_joins), *conditions))
+    if not candidates:
+        return []
+    compiled_filters = {}
+    stale = {}
+    for candidate in candidates:
+        subscription_id, date_last_updated = candidate[:2]
+        entry = _filter_index.get(subscription_id)
+        if entry is not None and entry[0] == date_last_updated:
+            compiled_filters[subscription_id] = entry[1]
+        else:
+            stale[subscription_id] = date_last_updated
+    if stale:
+        if len(_filter_index) + len(stale) > FILTER_INDEX_MAX_SUBSCRIPTIONS:
+            _filter_index.clear()
+        for subscription_id, compiled in _load_compiled_filters(
+                list(stale)).iteritems():
+            _filter_index[subscription_id] = (
+                stale[subscription_id], compiled)
+            compiled_filters[subscription_id] = compiled
+    bugtasks_by_target = defaultdict(list)
+    for bugtask, target in query_arguments:
+        bugtasks_by_target[target].append(bugtask)
+    information_type = bug.information_type
+    # Casting bug.tags to a list removes the security proxy on the list.
+    tags = frozenset(list(bug.tags))
+    filter_ids = []
+    for candidate in candidates:
+        bugtasks = [
+            bugtask
+            for target, matched in zip(targets, candidate[2:]) if matched
+            for bugtask in bugtasks_by_target[target]]
+        for compiled_filter in compiled_filters[candidate[0]]:
+            if compiled_filter.matches(
+                    bugtasks, level, information_type, tags):
+                filter_ids.append(compiled_filter.id)
+    return filter_ids
+
+
 def _calculate_bugtask_condition(query_arguments):
     """Return a condition matching importance and status for the bugtasks.
 
@@ -12,6 +12,7 @@ from lazr.lifecycle.event import ObjectCreatedEvent
 from pytz import UTC
 from storm.store import Store
 from testtools.testcase import ExpectedException
+import transaction
 from zope.component import getUtility
 from zope.security.proxy import removeSecurityProxy
 
@@ -26,9 +27,15 @@ from lp.bugs.interfaces.bugnotification import IBugNotificationSet
 from lp.bugs.interfaces.bugtask import BugTaskStatus
 from lp.bugs.mail.bugnotificationrecipients import BugNotificationRecipients
 from lp.bugs.model.bug import (
+    Bug,
     BugNotification,
     BugSubscriptionInfo,
+    calculate_bug_heat,
+    flush_bug_heat_updates,
+    get_bug_tags_open_count,
+    update_bug_heat,
     )
+from lp.bugs.model.bugsummary import BugSummary
 from lp.registry.enums import BugSharingPolicy
 from lp.registry.errors import CannotChangeInformationType
 from lp.registry.interfaces.accesspolicy import (
@@ -38,6 +45,8 @@ from lp.registry.interfaces.accesspolicy import (
     )
 from lp.registry.interfaces.person import PersonVisibility
 from lp.registry.tests.test_accesspolicy import get_policies_for_artifact
+from lp.services.database.interfaces import IStore
+from lp.services.features.testing import FeatureFixture
 from lp.testing import (
     admin_logged_in,
     EventRecorder,
@@ -49,7 +58,10 @@ from lp.testing import (
     StormStatementRecorder,
     TestCaseWithFactory,
     )
-from lp.testing.layers import DatabaseFunctionalLayer
+from lp.testing.layers import (
+    DatabaseFunctionalLayer,
+    LaunchpadFunctionalLayer,
+    )
 from lp.testing.matchers import (
     Equals,
     HasQueryCount,
@@ -1017,6 +1029,122 @@ class TestBugActivityMethods(TestCaseWithFactory):
         self.assertContentEqual(expected_activity, activity)
 
 
+class TestBugHeat(TestCaseWithFactory):
+
+    layer = DatabaseFunctionalLayer
+
+    def getDatabaseHeat(self, bug):
+        return IStore(Bug).execute(
+            "SELECT heat, calculate_bug_heat(id) FROM Bug WHERE id = %s",
+            (bug.id,)).get_one()
+
+    def test_calculate_bug_heat(self):
+        # calculate_bug_heat calculates the heat of many bugs in one
+        # query, counting subscribers to their duplicates too.
+        private_bug = self.factory.makeBug(
+            information_type=InformationType.PRIVATESECURITY)
+        bug = self.factory.makeBug()
+        duplicate = self.factory.makeBug()
+        with person_logged_in(bug.owner):
+            duplicate.markAsDuplicate(bug)
+            bug.subscribe(self.factory.makePerson(), bug.owner)
+            bug.markUserAffected(self.factory.makePerson())
+        with person_logged_in(duplicate.owner):
+            duplicate.subscribe(self.factory.makePerson(), duplicate.owner)
+            duplicate.subscribe(bug.owner, duplicate.owner)
+        bugs = [private_bug, bug, duplicate]
+        flush_bug_heat_updates()
+        with StormStatementRecorder() as recorder:
+            heats = calculate_bug_heat([bug.id for bug in bugs])
+        self.assertThat(recorder, HasQueryCount(Equals(1)))
+        self.assertEqual(
+            dict((bug.id, self.getDatabaseHeat(bug)[1]) for bug in bugs),
+            heats)
+
+    def test_update_bug_heat_deduplicates(self):
+        # Heat updates are applied once per transaction, however many
+        # times a bug's heat is updated.
+        bug = self.factory.makeBug()
+        flush_bug_heat_updates()
+        removeSecurityProxy(bug).heat = 0
+        with StormStatementRecorder() as recorder:
+            for i in range(3):
+                update_bug_heat([bug.id])
+            heat = bug.heat
+            self.assertEqual(heat, bug.heat)
+        updates = [
+            statement for statement in recorder.statements
+            if 'calculate_bug_heat' in statement]
+        self.assertEqual(1, len(updates))
+        self.assertNotEqual(0, heat)
+        self.assertEqual((heat, heat), self.getDatabaseHeat(bug))
+
+    def test_update_bug_heat_on_commit(self):
+        # Pending heat updates are applied when the transaction commits.
+        bug = self.factory.makeBug()
+        flush_bug_heat_updates()
+        removeSecurityProxy(bug).heat = 0
+        update_bug_heat([bug.id])
+        transaction.commit()
+        heat, expected_heat = self.getDatabaseHeat(bug)
+        self.assertNotEqual(0, heat)
+        self.assertEqual(expected_heat, heat)
+
+    def test_setting_heat_discards_pending_update(self):
+        bug = self.factory.makeBug()
+        update_bug_heat([bug.id])
+        removeSecurityProxy(bug).heat = 1000
+        self.assertEqual(1000, bug.heat)
+
+
+class TestGetBugTagsOpenCount(TestCaseWithFactory):
+
+    layer = LaunchpadFunctionalLayer
+
+    def setUp(self):
+        super(TestGetBugTagsOpenCount, self).setUp()
+        self.product = self.factory.makeProduct()
+        self.owner = self.factory.makePerson()
+        for tags in ([u'a', u'b'], [u'a'], [u'c']):
+            self.factory.makeBug(target=self.product, tags=tags)
+        self.factory.makeBug(
+            target=self.product, owner=self.owner, tags=[u'd'],
+            information_type=InformationType.USERDATA)
+        self.condition = BugSummary.product_id == self.product.id
+
+    def getCounts(self, user, **kwargs):
+        return get_bug_tags_open_count(self.condition, user, **kwargs)
+
+    def test_cached_counts_match_uncached(self):
+        queries = [
+            (None, {}),
+            (self.owner, {}),
+            (self.owner, {'tag_limit': 1, 'include_tags': [u'd', u'e']}),
+            (None, {'tag_limit': 2, 'include_tags': [u'c']}),
+            ]
+        expected = [self.getCounts(user, **kwargs) for user, kwargs in queries]
+        self.assertEqual(
+            {u'a': 2, u'b': 1, u'c': 1, u'd': 1}, expected[1])
+        with FeatureFixture({'bugs.tag_counts.cache_seconds': u'60'}):
+            self.assertEqual(
+                expected,
+                [self.getCounts(user, **kwargs) for user, kwargs in queries])
+
+    def test_public_counts_are_cached(self):
+        # Public counts are shared between users until the cache expires,
+        # but each user's private counts are always up to date.
+        self.useFixture(FeatureFixture(
+            {'bugs.tag_counts.cache_seconds': u'60'}))
+        self.assertEqual({u'a': 2, u'b': 1, u'c': 1}, self.getCounts(None))
+        self.factory.makeBug(target=self.product, tags=[u'c'])
+        self.factory.makeBug(
+            target=self.product, owner=self.owner, tags=[u'd'],
+            information_type=InformationType.USERDATA)
+        self.assertEqual({u'a': 2, u'b': 1, u'c': 1}, self.getCounts(None))
+        self.assertEqual(
+            {u'a': 2, u'b': 1, u'c': 1, u'd': 2}, self.getCounts(self.owner))
+
+
 class TestBugAutoConfirmation(TestCaseWithFactory):
     """Tests for auto confirming bugs"""
 
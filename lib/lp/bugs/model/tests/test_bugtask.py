@@ -3218,3 +3218,44 @@ class TestTargetNameCache(TestCase):
         transaction.commit()
         self.assertEqual(upstream_task.bugtargetdisplayname,
             u'Mozilla Thunderbird')
+
+
+class TestBugTaskTargetNameCacheUpdater(TestCaseWithFactory):
+
+    layer = DatabaseFunctionalLayer
+
+    def makeOutdatedTasks(self):
+        distroseries = self.factory.makeDistroSeries()
+        package = self.factory.makeSourcePackage(distroseries=distroseries)
+        targets = [
+            self.factory.makeProduct(),
+            self.factory.makeProductSeries(),
+            distroseries.distribution,
+            distroseries,
+            package.distribution_sourcepackage,
+            package,
+            ]
+        tasks = []
+        for target in targets:
+            task = self.factory.makeBugTask(target=target)
+            removeSecurityProxy(task).targetnamecache = u'Outdated'
+            tasks.append(task)
+        transaction.commit()
+        return tasks
+
+    def assertUpdates(self, threads):
+        tasks = self.makeOutdatedTasks()
+        updater = BugTaskTargetNameCacheUpdater(
+            transaction, DevNullLogger(), threads=threads)
+        updater.run()
+        flush_database_caches()
+        for task in tasks:
+            self.assertEqual(
+                task.target.bugtargetdisplayname,
+                removeSecurityProxy(task).targetnamecache)
+
+    def test_updates_each_kind_of_target(self):
+        self.assertUpdates(threads=1)
+
+    def test_updates_in_parallel(self):
+        self.assertUpdates(threads=2)
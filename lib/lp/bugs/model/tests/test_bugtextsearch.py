@@ -0,0 +1,283 @@
+# Copyright 2019 Canonical Ltd.  This software is licensed under the
+# GNU Affero General Public License version 3 (see the file LICENSE).
+
+"""Tests for the inverted index bug text search backend."""
+
+__metaclass__ = type
+
+import os.path
+
+from zope.component import getUtility
+
+from lp.bugs.interfaces.bugtask import IBugTaskSet
+from lp.bugs.interfaces.bugtasksearch import BugTaskSearchParams
+from lp.bugs.interfaces.bugtextsearch import (
+    active_bug_text_search_backend,
+    IBugTextSearchBackend,
+    )
+from lp.bugs.model import bugtextsearch
+from lp.bugs.model.bugtaskflat import BugTaskFlat
+from lp.bugs.model.bugtextsearch import (
+    FileBackedInvertedIndex,
+    InvertedIndex,
+    InvertedIndexBugTextSearch,
+    parse_tsvector,
+    update_bug_text_index,
+    )
+from lp.services.database.interfaces import IStore
+from lp.services.database.nl_search import nl_term_conjunction
+from lp.services.features.testing import FeatureFixture
+from lp.testing import (
+    person_logged_in,
+    StormStatementRecorder,
+    TestCase,
+    TestCaseWithFactory,
+    )
+from lp.testing.fixture import ZopeUtilityFixture
+from lp.testing.layers import DatabaseFunctionalLayer
+
+
+class TestParseTSVector(TestCase):
+
+    def test_weights(self):
+        # Each position adds its ts_rank() weight, unlabelled ones as D.
+        self.assertEqual(
+            {'crash': 1.5, 'firefox': 0.2, "o'neil": 0.1},
+            parse_tsvector("'crash':1A,4B,9 'firefox':2C 'o''neil':3"))
+
+    def test_no_positions(self):
+        self.assertEqual({'crash': 0.1}, parse_tsvector("'crash'"))
+
+
+class TestInvertedIndex(TestCase):
+
+    def test_update_and_remove(self):
+        index = InvertedIndex()
+        index.update(1, {'crash': 1.0, 'firefox': 0.1})
+        index.update(2, {'crash': 0.1})
+        self.assertEqual(2, len(index))
+        self.assertEqual([1, 2], index.search(['crash'], 10))
+        index.update(1, {'hang': 1.0})
+        self.assertEqual([2], index.search(['crash'], 10))
+        self.assertEqual([], index.search(['firefox'], 10))
+        index.remove(2)
+        self.assertNotIn(2, index)
+        self.assertEqual([], index.search(['crash'], 10))
+
+    def test_search_requires_all_terms(self):
+        index = InvertedIndex()
+        index.update(1, {'crash': 1.0, 'firefox': 1.0})
+        index.update(2, {'crash': 1.0})
+        index.update(3, {'firefox': 1.0})
+        self.assertEqual([1], index.search(['crash', 'firefox'], 10))
+        self.assertEqual([], index.search(['crash', 'unknown'], 10))
+
+    def test_search_ranks_by_weight_then_id(self):
+        index = InvertedIndex()
+        index.update(1, {'crash': 0.1})
+        index.update(2, {'crash': 1.0})
+        index.update(3, {'crash': 0.1})
+        index.update(4, {'hang': 0.1})
+        self.assertEqual([2, 1, 3], index.search(['crash'], 10))
+        self.assertEqual([2, 1], index.search(['crash'], 2))
+
+    def test_search_matches_exhaustive_ranking(self):
+        # Stopping early gives the same results as scoring every match.
+        index = InvertedIndex()
+        for doc_id in range(1, 200):
+            terms = {'common': 0.1 * (doc_id % 7 + 1)}
+            if doc_id % 3 == 0:
+                terms['rare'] = 0.1 * (doc_id % 5 + 1)
+            index.update(doc_id, terms)
+        matches = index.search(['common', 'rare'], 1000)
+        self.assertEqual(66, len(matches))
+        for limit in (1, 5, 20):
+            self.assertEqual(
+                matches[:limit], index.search(['common', 'rare'], limit))
+
+
+class TestFileBackedInvertedIndex(TestCase):
+
+    def test_save_and_load(self):
+        path = os.path.join(self.makeTemporaryDirectory(), 'index')
+        index = FileBackedInvertedIndex(path)
+        self.assertEqual(0, len(index))
+        index.update(1, {'crash': 1.0})
+        index.watermark = '2019-01-01T00:00:00'
+        index.save()
+        index = FileBackedInvertedIndex(path)
+        self.assertEqual([1], index.search(['crash'], 10))
+        self.assertEqual('2019-01-01T00:00:00', index.watermark)
+
+
+class TestInvertedIndexBugTextSearch(TestCaseWithFactory):
+
+    layer = DatabaseFunctionalLayer
+
+    def setUp(self):
+        super(TestInvertedIndexBugTextSearch, self).setUp()
+        self.index = InvertedIndex()
+        self.backend = InvertedIndexBugTextSearch(self.index)
+
+    def updateIndex(self):
+        update_bug_text_index(self.index, IStore(BugTaskFlat))
+
+    def test_nl_term_conjunction(self):
+        self.assertEqual(['hi', 'mom'], nl_term_conjunction('hi mom'))
+        self.assertEqual([], nl_term_conjunction('the'))
+        self.assertIsNone(nl_term_conjunction('hi OR mom'))
+        self.assertIsNone(nl_term_conjunction('hi AND NOT dad'))
+
+    def test_search(self):
+        bug = self.factory.makeBug(title=u'Frobnicator crashes')
+        self.factory.makeBug(title=u'Frobnicator hangs')
+        self.updateIndex()
+        self.assertEqual([bug.id], self.backend.search(
+            u'frobnicator crash', 10))
+        self.assertIsNotNone(self.index.watermark)
+
+    def test_update_picks_up_changes(self):
+        bug = self.factory.makeBug(title=u'Frobnicator crashes')
+        self.updateIndex()
+        self.assertEqual([], self.backend.search(u'wibble', 10))
+        with person_logged_in(bug.owner):
+            bug.title = u'Wibble crashes'
+        self.updateIndex()
+        self.assertEqual([bug.id], self.backend.search(u'wibble', 10))
+
+    def test_update_pages_through_rows_with_the_same_timestamp(self):
+        # Bugs changed in one transaction share a date_last_updated, but
+        # all of them are indexed however small the pages are.
+        self.patch(bugtextsearch, 'SYNC_BATCH_SIZE', 1)
+        bugs = [
+            self.factory.makeBug(title=u'Frobnicator crashes')
+            for i in range(3)]
+        self.updateIndex()
+        self.assertContentEqual(
+            [bug.id for bug in bugs],
+            self.backend.search(u'frobnicator', 10))
+
+    def test_update_purges_deleted_bugs(self):
+        self.index.update(0, {'frobnic': 1.0})
+        self.updateIndex()
+        self.assertNotIn(0, self.index)
+
+    def test_search_defers_to_database(self):
+        # Queries that aren't plain conjunctions are left to the database.
+        self.assertIsNone(self.backend.search(u'crash OR hang', 10))
+
+    def test_search_without_index(self):
+        # Until there is an index, all queries are left to the database.
+        self.pushConfig(
+            'malone', bug_text_index_path=os.path.join(
+                self.makeTemporaryDirectory(), 'index'))
+        self.assertIsNone(
+            InvertedIndexBugTextSearch().search(u'frobnicator', 10))
+
+    def test_search_loads_saved_index(self):
+        # The index saved by update-bug-text-index.py is loaded in the
+        # background, and loaded again when it changes.  Queries use the
+        # old index, or the database, until loading finishes.
+        path = os.path.join(self.makeTemporaryDirectory(), 'index')
+        self.pushConfig('malone', bug_text_index_path=path)
+        bug = self.factory.makeBug(title=u'Frobnicator crashes')
+        update_bug_text_index(
+            FileBackedInvertedIndex(path), IStore(BugTaskFlat))
+        backend = InvertedIndexBugTextSearch()
+        self.assertIsNone(backend.search(u'frobnicator', 10))
+        backend._loader.join()
+        self.assertEqual([bug.id], backend.search(u'frobnicator', 10))
+        with person_logged_in(bug.owner):
+            bug.title = u'Wibble crashes'
+        update_bug_text_index(
+            FileBackedInvertedIndex(path), IStore(BugTaskFlat))
+        mtime = os.stat(path).st_mtime + 1
+        os.utime(path, (mtime, mtime))
+        self.assertEqual([], backend.search(u'wibble', 10))
+        backend._loader.join()
+        self.assertEqual([bug.id], backend.search(u'wibble', 10))
+
+    def test_bugtask_search(self):
+        # With the backend enabled, bug searches match and rank text from
+        # the index.
+        self.useFixture(FeatureFixture(
+            {'bugs.text_search.backend': 'inverted-index'}))
+        self.useFixture(ZopeUtilityFixture(
+            self.backend, IBugTextSearchBackend, 'inverted-index'))
+        self.assertEqual(self.backend, active_bug_text_search_backend())
+        product = self.factory.makeProduct()
+        weak = self.factory.makeBug(
+            target=product, title=u'Frobnicator issue',
+            description=u'It crashes.')
+        strong = self.factory.makeBug(
+            target=product, title=u'Frobnicator crashes')
+        self.factory.makeBug(title=u'Frobnicator crashes')
+        self.updateIndex()
+        params = BugTaskSearchParams(
+            user=None, product=product, searchtext=u'frobnicator crash')
+        self.assertEqual(
+            [strong.default_bugtask, weak.default_bugtask],
+            list(getUtility(IBugTaskSet).search(params)))
+
+    def test_bugtask_search_filters_candidates(self):
+        # If the best matches are filtered out by the rest of the search,
+        # more candidates are fetched from the backend until enough of
+        # them pass, rather than leaving the query to the database.
+        self.useFixture(FeatureFixture(
+            {'bugs.text_search.backend': 'inverted-index'}))
+        self.useFixture(ZopeUtilityFixture(
+            self.backend, IBugTextSearchBackend, 'inverted-index'))
+        self.pushConfig('malone', bug_text_index_candidates=1)
+        product = self.factory.makeProduct()
+        for i in range(3):
+            self.factory.makeBug(title=u'Frobnicator crashes')
+        bug = self.factory.makeBug(target=product, title=u'Frobnicator')
+        self.updateIndex()
+        params = BugTaskSearchParams(
+            user=None, product=product, searchtext=u'frobnicator')
+        with StormStatementRecorder() as recorder:
+            self.assertEqual(
+                [bug.default_bugtask],
+                list(getUtility(IBugTaskSet).search(params)))
+        self.assertNotIn(
+            'ftq(', ' '.join(recorder.statements).lower())
+
+    def test_bugtask_search_caps_results(self):
+        # Broad searches only return the best matching bugs.
+        self.useFixture(FeatureFixture(
+            {'bugs.text_search.backend': 'inverted-index'}))
+        self.useFixture(ZopeUtilityFixture(
+            self.backend, IBugTextSearchBackend, 'inverted-index'))
+        self.pushConfig('malone', bug_text_index_candidates=1)
+        product = self.factory.makeProduct()
+        self.factory.makeBug(target=product, title=u'Frobnicator issue')
+        strong = self.factory.makeBug(
+            target=product, title=u'Frobnicator crashes frobnicator')
+        self.updateIndex()
+        params = BugTaskSearchParams(
+            user=None, product=product, searchtext=u'frobnicator')
+        self.assertEqual(
+            [strong.default_bugtask],
+            list(getUtility(IBugTaskSet).search(params)))
+
+    def test_bugtask_search_scan_limit(self):
+        # If too many candidates are filtered out, the database is used.
+        self.useFixture(FeatureFixture(
+            {'bugs.text_search.backend': 'inverted-index'}))
+        self.useFixture(ZopeUtilityFixture(
+            self.backend, IBugTextSearchBackend, 'inverted-index'))
+        self.pushConfig(
+            'malone', bug_text_index_candidates=1,
+            bug_text_index_scan_limit=2)
+        product = self.factory.makeProduct()
+        for i in range(3):
+            self.factory.makeBug(title=u'Frobnicator crashes')
+        bug = self.factory.makeBug(target=product, title=u'Frobnicator')
+        self.updateIndex()
+        params = BugTaskSearchParams(
+            user=None, product=product, searchtext=u'frobnicator')
+        with StormStatementRecorder() as recorder:
+            self.assertEqual(
+                [bug.default_bugtask],
+                list(getUtility(IBugTaskSet).search(params)))
+        self.assertIn('ftq(', ' '.join(recorder.statements).lower())
@@ -16,11 +16,13 @@ except ImportError:
     import cElementTree as ET
 
 from zope.component import getUtility
+from zope.security.proxy import removeSecurityProxy
 from lp.app.interfaces.launchpad import ILaunchpadCelebrities
+from lp.services.database.bulk import load
 from lp.services.librarian.browser import ProxiedLibraryFileAlias
-from lp.bugs.interfaces.bugtask import IBugTaskSet
 from lp.bugs.interfaces.bugtasksearch import BugTaskSearchParams
 from lp.bugs.browser.bugtask import get_comments_for_bugtask
+from lp.bugs.model.bugtask import BugTask
 
 BUGS_XMLNS = 'https://launchpad.net/xmlns/2006/bugs'
 
@@ -107,16 +109,19 @@ def export_bugtasks(ztm, bugtarget, output, include_private=False):
         user = getUtility(ILaunchpadCelebrities).admin
     else:
         user = None
-    ids = [task.id for task in bugtarget.searchTasks(
-        BugTaskSearchParams(user=user, omit_dupes=False, orderby='id'))]
-    bugtaskset = getUtility(IBugTaskSet)
+    tasks = removeSecurityProxy(bugtarget.searchTasks(
+        BugTaskSearchParams(user=user, omit_dupes=False, orderby='id')))
+    # The plain result set holds just the bugtask IDs, so there's no need
+    # to load the tasks until each chunk is serialised.
+    ids = list(tasks.get_plain_result_set())
     output.write('<launchpad-bugs xmlns="%s">\n' % BUGS_XMLNS)
-    for count, taskid in enumerate(ids):
-        task = bugtaskset.get(taskid)
-        tree = ET.ElementTree(serialise_bugtask(task))
-        tree.write(output)
+    for start in range(0, len(ids), 100):
+        tasks = load(BugTask, ids[start:start + 100])
+        tasks.sort(key=lambda task: task.id)
+        for task in tasks:
+            tree = ET.ElementTree(serialise_bugtask(task))
+            tree.write(output)
         # Periodically abort the transaction so that we don't lock
         # everyone else out.
-        if count % 100:
-            ztm.abort()
+        ztm.abort()
     output.write('</launchpad-bugs>\n')
@@ -76,11 +76,14 @@ def get_activity_key(notification):
         return key
 
 
-def construct_email_notifications(bug_notifications):
+def construct_email_notifications(bug_notifications, filter_data=None):
     """Construct an email from a list of related bug notifications.
 
     The person and bug has to be the same for all notifications, and
     there can be only one comment.
+
+    :param filter_data: An optional dict returned by
+        `IBugNotificationSet.preloadRecipientFilterData`.
     """
     first_notification = bug_notifications[0]
     bug = first_notification.bug
@@ -188,7 +191,7 @@ def construct_email_notifications(bug_notifications):
     from_address = get_bugmail_from_address(actor, bug)
     bug_notification_builder = BugNotificationBuilder(bug, actor)
     recipients = getUtility(IBugNotificationSet).getRecipientFilterData(
-        bug, recipients, filtered_notifications)
+        bug, recipients, filtered_notifications, filter_data)
     sorted_recipients = sorted(
         recipients.items(), key=lambda t: t[0].preferredemail.email)
 
@@ -298,11 +301,17 @@ def get_email_notifications(bug_notifications):
         - Must be related to the same bug.
         - Must contain at most one comment.
     """
+    bug_notifications = list(bug_notifications)
+    # Load the mute and filter data for all the notifications at once.
+    # It is kept here rather than on the notifications, since the caller
+    # may commit between batches.
+    filter_data = getUtility(
+        IBugNotificationSet).preloadRecipientFilterData(bug_notifications)
     for batch in notification_batches(bug_notifications):
         # We don't want bugs preventing all bug notifications from
         # being sent, so catch and log all exceptions.
         try:
-            yield construct_email_notifications(batch)
+            yield construct_email_notifications(batch, filter_data)
         except (KeyboardInterrupt, SystemExit, GeneratorExit):
             raise
         except:
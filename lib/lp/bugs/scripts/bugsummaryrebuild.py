@@ -65,6 +65,26 @@ def get_bugsummary_targets():
          RawBugSummary.sourcepackagename_id)).config(distinct=True))
 
 
+def get_dirty_bugsummary_targets():
+    """Get the set of targets with changes still in BugSummaryJournal."""
+    return set(IStore(BugSummaryJournal).find(
+        (BugSummaryJournal.product_id, BugSummaryJournal.productseries_id,
+         BugSummaryJournal.distribution_id,
+         BugSummaryJournal.distroseries_id,
+         BugSummaryJournal.sourcepackagename_id)).config(distinct=True))
+
+
+def partition_targets(targets, count):
+    """Split target tuples into `count` lists of similar length.
+
+    Targets are sorted first, so each list gets a spread of pillars.
+    """
+    partitions = [[] for i in range(count)]
+    for i, target_key in enumerate(sorted(targets)):
+        partitions[i % count].append(target_key)
+    return [partition for partition in partitions if partition]
+
+
 def get_bugtask_targets():
     """Get the current set of targets represented in BugTask."""
     new_targets = set(IStore(BugTask).find(
@@ -339,11 +359,12 @@ class BugSummaryRebuildTunableLoop(TunableLoop):
 
     maximum_chunk_size = 100
 
-    def __init__(self, log, dry_run, abort_time=None):
+    def __init__(self, log, dry_run, abort_time=None, targets=None):
         super(BugSummaryRebuildTunableLoop, self).__init__(log, abort_time)
         self.dry_run = dry_run
-        self.targets = list(
-            get_bugsummary_targets().union(get_bugtask_targets()))
+        if targets is None:
+            targets = get_bugsummary_targets().union(get_bugtask_targets())
+        self.targets = list(targets)
         self.offset = 0
 
     def isDone(self):
@@ -7,7 +7,13 @@ __metaclass__ = type
 __all__ = ['BugTaskTargetNameCacheUpdater']
 
 from collections import defaultdict
+from functools import partial
 
+from storm.expr import (
+    And,
+    Column,
+    )
+from storm.info import ClassAlias
 from zope.interface import implementer
 
 from lp.bugs.model.bugtask import (
@@ -23,9 +29,14 @@ from lp.services.database.interfaces import (
     IMasterStore,
     ISlaveStore,
     )
+from lp.services.database.stormexpr import (
+    BulkUpdate,
+    Values,
+    )
 from lp.services.looptuner import (
+    DBLoopTuner,
     ITunableLoop,
-    LoopTuner,
+    run_in_threads,
     )
 
 # These two tuples must be in the same order. They specify the ID
@@ -42,19 +53,22 @@ target_classes = (
 class BugTaskTargetNameCachesTunableLoop(object):
     """An `ITunableLoop` for updating BugTask targetname caches."""
 
-    def __init__(self, transaction, logger, offset=0):
+    def __init__(self, transaction, logger, offset=0, candidates=None):
         self.transaction = transaction
         self.logger = logger
         self.offset = offset
         self.total_updated = 0
 
-        self.logger.info("Calculating targets.")
-        self.transaction.begin()
-        self.candidates = self.determineCandidates()
-        self.transaction.abort()
-        self.logger.info("Will check %i targets." % len(self.candidates))
+        if candidates is None:
+            self.logger.info("Calculating targets.")
+            self.transaction.begin()
+            candidates = self.determineCandidates()
+            self.transaction.abort()
+            self.logger.info("Will check %i targets." % len(candidates))
+        self.candidates = candidates
 
-    def determineCandidates(self):
+    @staticmethod
+    def determineCandidates():
         """Find all distinct BugTask targets with their cached names.
 
         Returns a list of (target, set_of_cached_names) pairs, where target is
@@ -97,6 +111,9 @@ class BugTaskTargetNameCachesTunableLoop(object):
             # Get all of the objects that we will need into the cache.
             list(store.find(cls, cls.id.is_in(set(ids_to_cache[index]))))
 
+        # Outdated names to update, keyed by which of the target ID columns
+        # are set.
+        updates = defaultdict(list)
         for target_bits, cached_names in chunk:
             self.offset += 1
             # Resolve the IDs to objects, and get the actual IBugTarget.
@@ -107,43 +124,99 @@ class BugTaskTargetNameCachesTunableLoop(object):
             target = bug_target_from_key(*target_objects)
             new_name = target.bugtargetdisplayname
             cached_names.discard(new_name)
-            # If there are any outdated names cached, update them all in
-            # a single query.
             if len(cached_names) > 0:
                 self.logger.info(
                     "Updating %r to '%s'." % (tuple(cached_names), new_name))
                 self.total_updated += len(cached_names)
-                conditions = (
-                    col == id for col, id in zip(target_columns, target_bits))
-                to_update = store.find(
-                    BugTask,
-                    BugTask.targetnamecache.is_in(cached_names),
-                    *conditions)
-                to_update.set(targetnamecache=new_name)
+                ids = [id for id in target_bits if id is not None]
+                updates[tuple(id is not None for id in target_bits)].extend(
+                    ids + [cached_name, new_name]
+                    for cached_name in cached_names)
+
+        # Update the outdated names for each combination of target ID
+        # columns in a single query, so that the BugTask indexes on those
+        # columns can be used.
+        for columns_set, values in updates.iteritems():
+            self.updateNames(store, columns_set, values)
 
         self.logger.info("Checked %i targets." % len(chunk))
 
         self.transaction.commit()
 
+    def updateNames(self, store, columns_set, values):
+        """Update outdated BugTask target name caches.
+
+        :param columns_set: A tuple of booleans saying which of the target
+            ID columns in target_columns are set for these targets.
+        :param values: A list of rows, each holding the IDs from the set
+            target ID columns, an outdated name, and the name to replace
+            it with.
+        """
+        name_data = ClassAlias(BugTask, "name_data")
+        id_names = [
+            col.name for col, is_set in zip(target_columns, columns_set)
+            if is_set]
+        conditions = [
+            col == (Column(col.name, name_data) if is_set else None)
+            for col, is_set in zip(target_columns, columns_set)]
+        store.execute(BulkUpdate(
+            {BugTask.targetnamecache: Column("new_name", name_data)},
+            table=BugTask,
+            values=Values(
+                "name_data",
+                [(name, "integer") for name in id_names] +
+                [("targetnamecache", "text"), ("new_name", "text")],
+                values),
+            where=And(
+                BugTask.targetnamecache == name_data.targetnamecache,
+                *conditions)))
+
 
 class BugTaskTargetNameCacheUpdater:
     """A runnable class which updates the bugtask target name caches."""
 
-    def __init__(self, transaction, logger):
+    def __init__(self, transaction, logger, threads=1):
         self.transaction = transaction
         self.logger = logger
+        self.threads = max(threads, 1)
 
     def run(self):
-        """Update the bugtask target name caches."""
+        """Update the bugtask target name caches.
+
+        The targets are split between `threads` workers, each of which
+        updates its targets in its own transactions.
+        """
         self.logger.info("Updating targetname cache of bugtasks.")
-        loop = BugTaskTargetNameCachesTunableLoop(
-            self.transaction, self.logger)
+        self.logger.info("Calculating targets.")
+        self.transaction.begin()
+        candidates = BugTaskTargetNameCachesTunableLoop.determineCandidates()
+        self.transaction.abort()
+        self.logger.info("Will check %i targets." % len(candidates))
+
+        loops = [
+            BugTaskTargetNameCachesTunableLoop(
+                self.transaction, self.logger,
+                candidates=candidates[count::self.threads])
+            for count in range(self.threads)]
+        if len(loops) == 1:
+            self.runLoop(loops[0])
+        else:
+            failures = run_in_threads(
+                [('Worker-%d' % (count + 1), partial(self.runLoop, loop))
+                 for count, loop in enumerate(loops)],
+                self.logger)
+            if failures:
+                raise RuntimeError("%d workers failed." % len(failures))
+
+        self.logger.info("Updated %i target names." % sum(
+            loop.total_updated for loop in loops))
+        self.logger.info("Finished updating targetname cache of bugtasks.")
 
-        # We use the LoopTuner class to try and get an ideal number of
-        # bugtasks updated for each iteration of the loop (see the
-        # LoopTuner documentation for more details).
-        loop_tuner = LoopTuner(loop, 2)
+    def runLoop(self, loop):
+        """Run a `BugTaskTargetNameCachesTunableLoop`."""
+        # We use the DBLoopTuner class to try and get an ideal number of
+        # bugtasks updated for each iteration of the loop, while holding
+        # off when replication is lagging (see the LoopTuner documentation
+        # for more details).
+        loop_tuner = DBLoopTuner(loop, 2, log=self.logger)
         loop_tuner.run()
-
-        self.logger.info("Updated %i target names." % loop.total_updated)
-        self.logger.info("Finished updating targetname cache of bugtasks.")
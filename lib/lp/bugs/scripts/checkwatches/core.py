@@ -61,6 +61,7 @@ from lp.registry.interfaces.person import (
     IPersonSet,
     PersonCreationRationale,
     )
+from lp.services.config import config
 from lp.services.database.bulk import reload
 from lp.services.database.sqlbase import flush_database_updates
 from lp.services.scripts.base import LaunchpadCronScript
@@ -112,6 +113,28 @@ def suggest_batch_size(remote_system, num_watches):
             int(SUGGESTED_BATCH_SIZE_PROPORTION * num_watches))
 
 
+def suggest_next_batch_size(checked, elapsed, time_left):
+    """Suggest how many watches to check in a bug tracker's next batch.
+
+    This is the number of watches that could be checked in `time_left`
+    seconds at the rate at which `checked` watches were checked in
+    `elapsed` seconds, but no more than twice `checked` (or
+    SUGGESTED_BATCH_SIZE_MIN, if that is larger), so that one quick batch
+    doesn't lead to an overlong one.
+
+    :return: The suggested batch size, or None if there isn't time for
+        another batch.
+    """
+    if checked <= 0 or time_left <= 0:
+        return None
+    batch_size = max(2 * checked, SUGGESTED_BATCH_SIZE_MIN)
+    if elapsed > 0:
+        batch_size = min(batch_size, int(checked * time_left / elapsed))
+    if batch_size < 1:
+        return None
+    return batch_size
+
+
 @contextmanager
 def record_errors(transaction, bug_watch_ids):
     """Context manager to record errors in BugWatchActivity.
@@ -179,7 +202,7 @@ class CheckwatchesMaster(WorkingBase):
                 thread.setName(bug_tracker_name)
                 try:
                     with self.statement_logging:
-                        return self.updateBugTracker(
+                        return self.updateBugTrackerInBatches(
                             bug_tracker_id, batch_size)
                 finally:
                     thread.setName(thread_name)
@@ -294,6 +317,49 @@ class CheckwatchesMaster(WorkingBase):
         else:
             return True
 
+    @commit_before
+    @with_interaction
+    def updateBugTrackerInBatches(self, bug_tracker_id, batch_size):
+        """Update the given bug tracker's bug watches in batches.
+
+        Batches are checked until no watches need updating, a batch fails,
+        or config.checkwatches.tracker_time_budget seconds have passed.
+        Unless `batch_size` is given, each batch after the first is sized
+        by `suggest_next_batch_size` from the rate at which the previous
+        one was checked, so slow or failing trackers get smaller batches.
+
+        :param bug_tracker_id: The ID of an IBugTracker.
+        :return: A boolean indicating if every batch was successful.
+        """
+        bug_tracker_set = getUtility(IBugTrackerSet)
+        deadline = time.time() + config.checkwatches.tracker_time_budget
+        with self.transaction:
+            watches_left = bug_tracker_set.get(
+                bug_tracker_id).watches_needing_update.count()
+        next_batch_size = batch_size
+        while True:
+            batch_start = time.time()
+            if not self.updateBugTracker(bug_tracker_id, next_batch_size):
+                return False
+            batch_end = time.time()
+            with self.transaction:
+                checked = watches_left
+                watches_left = bug_tracker_set.get(
+                    bug_tracker_id).watches_needing_update.count()
+                checked -= watches_left
+            if watches_left == 0 or batch_end >= deadline:
+                return True
+            if batch_size is None:
+                next_batch_size = suggest_next_batch_size(
+                    checked, batch_end - batch_start, deadline - batch_end)
+                if next_batch_size is None:
+                    return True
+            elif checked <= 0:
+                return True
+            self.logger.debug(
+                "%s watches left to check on bug tracker %s; checking "
+                "another batch" % (watches_left, bug_tracker_id))
+
     @commit_before
     @with_interaction
     def forceUpdateAll(self, bug_tracker_name, batch_size):
@@ -4,11 +4,15 @@
 
 __metaclass__ = type
 
-from datetime import datetime
+from datetime import (
+    datetime,
+    timedelta,
+    )
 import threading
 import unittest
 from xmlrpclib import ProtocolError
 
+import pytz
 import transaction
 from zope.component import getUtility
 
@@ -30,6 +34,7 @@ from lp.bugs.scripts.checkwatches.base import WorkingBase
 from lp.bugs.scripts.checkwatches.core import (
     CheckwatchesMaster,
     LOGIN,
+    suggest_next_batch_size,
     TwistedThreadScheduler,
     )
 from lp.bugs.scripts.checkwatches.remotebugupdater import RemoteBugUpdater
@@ -172,6 +177,29 @@ class BrokenCheckwatchesMaster(CheckwatchesMaster):
             "http://example.com/", self.error_code, "Borked", "")
 
 
+class BatchRecordingCheckwatchesMaster(CheckwatchesMaster):
+    """Records the batch sizes it is asked to check.
+
+    Each batch stops the given number of watches from needing an update,
+    or two watches if no batch size is given.
+    """
+
+    def __init__(self, succeed=True):
+        super(BatchRecordingCheckwatchesMaster, self).__init__(
+            transaction.manager, logger=BufferLogger())
+        self.succeed = succeed
+        self.batch_sizes = []
+
+    def updateBugTracker(self, bug_tracker_id, batch_size):
+        self.batch_sizes.append(batch_size)
+        with self.transaction:
+            bug_tracker = getUtility(IBugTrackerSet).get(bug_tracker_id)
+            watches = list(bug_tracker.watches_ready_to_check)
+            for bug_watch in watches[:batch_size or 2]:
+                bug_watch.next_check = None
+        return self.succeed
+
+
 class TestCheckwatchesMaster(TestCaseWithFactory):
 
     layer = LaunchpadZopelessLayer
@@ -232,6 +260,60 @@ class TestCheckwatchesMaster(TestCaseWithFactory):
         checkwatches.core.suggest_batch_size(remote_system, 99999)
         self.assertEqual(247, remote_system.batch_size)
 
+    def test_suggest_next_batch_size(self):
+        # The next batch is as large as the time left allows at the rate
+        # of the last batch, but at most twice its size.
+        self.assertEqual(50, suggest_next_batch_size(100, 10, 5))
+        self.assertEqual(200, suggest_next_batch_size(100, 10, 3600))
+        # Small batches may grow to SUGGESTED_BATCH_SIZE_MIN.
+        self.assertEqual(100, suggest_next_batch_size(2, 0, 3600))
+        # There's no next batch if the last one checked nothing or there's
+        # no time to check a single watch.
+        self.assertIsNone(suggest_next_batch_size(0, 10, 3600))
+        self.assertIsNone(suggest_next_batch_size(100, 10, 0))
+        self.assertIsNone(suggest_next_batch_size(1, 10, 5))
+
+    def makeBugTrackerWithReadyWatches(self, count):
+        bug_tracker, bug_watches = self.factory.makeBugTrackerWithWatches(
+            count=count)
+        bug_tracker.resetWatches(
+            new_next_check=datetime.now(pytz.UTC) - timedelta(hours=1))
+        transaction.commit()
+        return bug_tracker
+
+    def test_updateBugTrackerInBatches_without_budget(self):
+        # Without a time budget, a single batch is checked.
+        bug_tracker = self.makeBugTrackerWithReadyWatches(5)
+        master = BatchRecordingCheckwatchesMaster()
+        self.assertTrue(master.updateBugTrackerInBatches(bug_tracker.id, 2))
+        self.assertEqual([2], master.batch_sizes)
+
+    def test_updateBugTrackerInBatches_with_batch_size(self):
+        # Within the time budget, batches of the given size are checked
+        # until there are no watches left to check.
+        self.pushConfig('checkwatches', tracker_time_budget=3600)
+        bug_tracker = self.makeBugTrackerWithReadyWatches(5)
+        master = BatchRecordingCheckwatchesMaster()
+        self.assertTrue(master.updateBugTrackerInBatches(bug_tracker.id, 2))
+        self.assertEqual([2, 2, 2], master.batch_sizes)
+
+    def test_updateBugTrackerInBatches_suggests_batch_sizes(self):
+        # Without a batch size, later batches are sized from the rate at
+        # which the earlier ones were checked.
+        self.pushConfig('checkwatches', tracker_time_budget=3600)
+        bug_tracker = self.makeBugTrackerWithReadyWatches(5)
+        master = BatchRecordingCheckwatchesMaster()
+        self.assertTrue(
+            master.updateBugTrackerInBatches(bug_tracker.id, None))
+        self.assertEqual([None, 100], master.batch_sizes)
+
+    def test_updateBugTrackerInBatches_stops_on_failure(self):
+        self.pushConfig('checkwatches', tracker_time_budget=3600)
+        bug_tracker = self.makeBugTrackerWithReadyWatches(5)
+        master = BatchRecordingCheckwatchesMaster(succeed=False)
+        self.assertFalse(master.updateBugTrackerInBatches(bug_tracker.id, 2))
+        self.assertEqual([2], master.batch_sizes)
+
     def test_xmlrpc_connection_errors_set_activity_properly(self):
         # HTTP status codes of 502, 503 and 504 indicate connection
         # errors. An XML-RPC request that fails with one of those is
@@ -199,8 +199,11 @@ class FakeNotification:
 class FakeBugNotificationSetUtility:
     """A notification utility used for testing."""
 
+    def preloadRecipientFilterData(self, notifications, filter_data=None):
+        return {}
+
     def getRecipientFilterData(self, bug, recipient_to_sources,
-                               notifications):
+                               notifications, filter_data=None):
         return dict(
             (recipient, {'sources': sources, 'filter descriptions': []})
             for recipient, sources in recipient_to_sources.items())
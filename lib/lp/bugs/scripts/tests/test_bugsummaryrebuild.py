@@ -23,6 +23,8 @@ from lp.bugs.scripts.bugsummaryrebuild import (
     get_bugsummary_targets,
     get_bugsummaryjournal_rows,
     get_bugtask_targets,
+    get_dirty_bugsummary_targets,
+    partition_targets,
     RawBugSummary,
     rebuild_bugsummary_for_target,
     )
@@ -85,6 +87,27 @@ class TestBugSummaryRebuild(TestCaseWithFactory):
         new_targets = get_bugtask_targets()
         self.assertContentEqual(expected_targets, new_targets - orig_targets)
 
+    def test_get_dirty_bugsummary_targets(self):
+        # get_dirty_bugsummary_targets returns the set of target tuples
+        # with changes still in BugSummaryJournal.
+        rollup_journal()
+        self.assertContentEqual([], get_dirty_bugsummary_targets())
+        expected_targets = create_tasks(self.factory)
+        self.assertContentEqual(
+            expected_targets, get_dirty_bugsummary_targets())
+        rollup_journal()
+        self.assertContentEqual([], get_dirty_bugsummary_targets())
+
+    def test_partition_targets(self):
+        # partition_targets deals sorted targets out into similarly sized
+        # lists, omitting any that would be empty.
+        targets = [(3, None), (1, None), (None, 2), (2, None)]
+        self.assertEqual(
+            [[(None, 2), (2, None)], [(1, None), (3, None)]],
+            partition_targets(targets, 2))
+        self.assertEqual(
+            [[(None, 2)], [(2, None)]], partition_targets(targets[2:], 3))
+
     def test_calculate_bugsummary_changes(self):
         # calculate_bugsummary_changes returns the changes required
         # to make the old dict match the new, as a tuple of
@@ -160,6 +183,27 @@ class TestBugSummaryRebuild(TestCaseWithFactory):
         self.assertEqual(1, get_bugsummary_rows(product).count())
         self.assertEqual(0, get_bugsummaryjournal_rows(product).count())
 
+    def test_script_dirty_only(self):
+        # --dirty-only rebuilds just the targets with journal rows, split
+        # between --threads workers.
+        products = [self.factory.makeProduct() for i in range(2)]
+        for product in products:
+            self.factory.makeBug(target=product)
+        transaction.commit()
+
+        exit_code, out, err = run_script(
+            'scripts/bugsummary-rebuild.py',
+            args=['--dirty-only', '--threads', '2'])
+        self.addDetail("stdout", text_content(out))
+        self.addDetail("stderr", text_content(err))
+        self.assertEqual(0, exit_code)
+
+        transaction.commit()
+        for product in products:
+            self.assertEqual(1, get_bugsummary_rows(product).count())
+            self.assertEqual(0, get_bugsummaryjournal_rows(product).count())
+        self.assertContentEqual([], get_dirty_bugsummary_targets())
+
 
 class TestGetBugSummaryRows(TestCaseWithFactory):
 
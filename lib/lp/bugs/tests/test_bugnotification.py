@@ -9,6 +9,7 @@ from datetime import datetime
 
 import pytz
 from storm.store import Store
+from testtools.matchers import Equals
 import transaction
 from zope.component import getUtility
 
@@ -22,12 +23,14 @@ from lp.bugs.model.bugnotification import (
     BugNotificationSet,
     )
 from lp.bugs.model.bugsubscriptionfilter import BugSubscriptionFilterMute
+from lp.bugs.scripts.bugnotification import get_email_notifications
 from lp.services.config import config
 from lp.services.messages.interfaces.message import IMessageSet
 from lp.services.messages.model.message import MessageSet
 from lp.services.webapp.snapshot import notify_modified
 from lp.testing import (
     person_logged_in,
+    StormStatementRecorder,
     TestCaseWithFactory,
     )
 from lp.testing.dbuser import switch_dbuser
@@ -35,6 +38,7 @@ from lp.testing.layers import (
     DatabaseFunctionalLayer,
     LaunchpadZopelessLayer,
     )
+from lp.testing.matchers import HasQueryCount
 
 
 class TestNotificationsSentForBugExpiration(TestCaseWithFactory):
@@ -326,6 +330,85 @@ class TestNotificationsLinkToFilters(TestCaseWithFactory):
             BugNotificationSet().getRecipientFilterData(
                 self.bug, {self.subscriber: sources}, [self.notification]))
 
+    def makeSecondNotification(self):
+        # Make a notification of a change to another bug, whose subscriber
+        # has muted it.
+        bug2 = self.factory.makeBug()
+        subscriber2 = self.factory.makePerson()
+        subscription2 = bug2.default_bugtask.target.addSubscription(
+            subscriber2, subscriber2)
+        notification2 = self.addNotification(subscriber2, bug=bug2)
+        self.includeFilterInNotification(
+            subscription=subscription2, description=u'Another Filter!',
+            notification=notification2)
+        bug2.mute(subscriber2, subscriber2)
+        return notification2
+
+    def assertRecipientFilterData(self, notification_set, filter_data,
+                                  notification2):
+        sources = list(self.notification.recipients)
+        sources2 = list(notification2.recipients)
+        subscriber2 = sources2[0].person
+        with StormStatementRecorder() as recorder:
+            self.assertEqual(
+                {self.subscriber: {'sources': sources,
+                 'filter descriptions': [u'Special Filter!']}},
+                notification_set.getRecipientFilterData(
+                    self.bug, {self.subscriber: sources},
+                    [self.notification], filter_data))
+            self.assertEqual(
+                {},
+                notification_set.getRecipientFilterData(
+                    notification2.bug, {subscriber2: sources2},
+                    [notification2], filter_data))
+        return recorder
+
+    def test_preloadRecipientFilterData(self):
+        # Once the filter data for many notifications has been loaded,
+        # getRecipientFilterData doesn't need to query the database.
+        self.includeFilterInNotification(description=u'Special Filter!')
+        notification2 = self.makeSecondNotification()
+        notification_set = BugNotificationSet()
+        filter_data = notification_set.preloadRecipientFilterData(
+            [self.notification, notification2])
+        recorder = self.assertRecipientFilterData(
+            notification_set, filter_data, notification2)
+        self.assertThat(recorder, HasQueryCount(Equals(0)))
+
+    def test_preloadRecipientFilterData_survives_commit(self):
+        # The preloaded filter data is kept apart from the notifications,
+        # so it is still used after the transaction commits.
+        self.includeFilterInNotification(description=u'Special Filter!')
+        notification2 = self.makeSecondNotification()
+        notification_set = BugNotificationSet()
+        filter_data = notification_set.preloadRecipientFilterData(
+            [self.notification, notification2])
+        transaction.commit()
+        recorder = self.assertRecipientFilterData(
+            notification_set, filter_data, notification2)
+        self.assertEqual([], [
+            statement for statement in recorder.statements
+            if 'bugnotificationfilter' in statement.lower()
+            or 'bugmute' in statement.lower()])
+
+    def test_get_email_notifications_commits_between_batches(self):
+        # get_email_notifications loads the filter data for all the
+        # batches up front, and uses it even if the caller commits after
+        # each batch.
+        self.includeFilterInNotification(description=u'Special Filter!')
+        notification2 = self.makeSecondNotification()
+        email_notifications = get_email_notifications(
+            [self.notification, notification2])
+        batches = [next(email_notifications)]
+        transaction.commit()
+        with StormStatementRecorder() as recorder:
+            batches.extend(email_notifications)
+        self.assertEqual(2, len(batches))
+        self.assertEqual([], [
+            statement for statement in recorder.statements
+            if 'bugnotificationfilter' in statement.lower()
+            or 'bugmute' in statement.lower()])
+
 
 class TestNotificationProcessingWithoutRecipients(TestCaseWithFactory):
     """Adding notificatons without any recipients does not cause any harm.
@@ -12,7 +12,10 @@ from zope.security.proxy import removeSecurityProxy
 
 from lp.app.enums import InformationType
 from lp.bugs.interfaces.bugtask import BugTaskStatus
-from lp.bugs.model.bug import Bug
+from lp.bugs.model.bug import (
+    Bug,
+    flush_bug_heat_updates,
+    )
 from lp.registry.interfaces.accesspolicy import (
     IAccessArtifactGrantSource,
     IAccessArtifactSource,
@@ -84,6 +87,8 @@ class BugTaskFlatTestMixin(TestCaseWithFactory):
         if hasattr(bugtask, 'id'):
             bugtask = bugtask.id
         assert bugtask is not None
+        # Bug heat updates are deferred until they're needed.
+        flush_bug_heat_updates()
         result = IStore(Bug).execute(
             "SELECT %s FROM bugtaskflat WHERE bugtask = ?"
             % ', '.join(BUGTASKFLAT_COLUMNS), (bugtask,)).get_one()
@@ -20,6 +20,7 @@ from lp.bugs.interfaces.bugtask import (
     BugTaskStatus,
     )
 from lp.bugs.mail.bugnotificationrecipients import BugNotificationRecipients
+from lp.bugs.model import structuralsubscription
 from lp.bugs.model.bugsubscriptionfilter import (
     BugSubscriptionFilter,
     BugSubscriptionFilterMute,
@@ -32,10 +33,12 @@ from lp.bugs.model.structuralsubscription import (
     get_structural_subscriptions_for_bug,
     )
 from lp.services.database.decoratedresultset import DecoratedResultSet
+from lp.services.features.testing import FeatureFixture
 from lp.testing import (
     anonymous_logged_in,
     login_person,
     person_logged_in,
+    StormStatementRecorder,
     TestCaseWithFactory,
     )
 from lp.testing.factory import is_security_proxied_or_harmless
@@ -474,6 +477,64 @@ class TestStructuralSubscriptionFiltersForProductSeries(
         return self.factory.makeProductSeries()
 
 
+class FilterIndexTestMixin:
+    """Run the filtered structural subscription tests using the index."""
+
+    def setUp(self):
+        super(FilterIndexTestMixin, self).setUp()
+        self.useFixture(FeatureFixture(
+            {'bugs.structural_subscription_filter_index.enabled': 'on'}))
+        self.addCleanup(structuralsubscription._filter_index.clear)
+
+    def test_index_is_reused(self):
+        # Filters are only loaded again once they have changed.
+        self.initial_filter.statuses = [self.bugtask.status]
+        self.assertSubscribers([self.ordinary_subscriber])
+        with StormStatementRecorder() as recorder:
+            self.assertSubscribers([self.ordinary_subscriber])
+        self.assertEqual([], [
+            statement for statement in recorder.statements
+            if 'bugsubscriptionfilterstatus' in statement.lower()])
+        self.initial_filter.statuses = [BugTaskStatus.CONFIRMED]
+        self.assertSubscribers([])
+
+
+class TestIndexedStructuralSubscriptionFiltersForDistro(
+    FilterIndexTestMixin, TestStructuralSubscriptionFiltersForDistro):
+    pass
+
+
+class TestIndexedStructuralSubscriptionFiltersForProduct(
+    FilterIndexTestMixin, TestStructuralSubscriptionFiltersForProduct):
+    pass
+
+
+class TestIndexedStructuralSubscriptionFiltersForDistroSourcePackage(
+    FilterIndexTestMixin,
+    TestStructuralSubscriptionFiltersForDistroSourcePackage):
+    pass
+
+
+class TestIndexedStructuralSubscriptionFiltersForMilestone(
+    FilterIndexTestMixin, TestStructuralSubscriptionFiltersForMilestone):
+    pass
+
+
+class TestIndexedStructuralSubscriptionFiltersForDistroSeries(
+    FilterIndexTestMixin, TestStructuralSubscriptionFiltersForDistroSeries):
+    pass
+
+
+class TestIndexedStructuralSubscriptionFiltersForProjectGroup(
+    FilterIndexTestMixin, TestStructuralSubscriptionFiltersForProjectGroup):
+    pass
+
+
+class TestIndexedStructuralSubscriptionFiltersForProductSeries(
+    FilterIndexTestMixin, TestStructuralSubscriptionFiltersForProductSeries):
+    pass
+
+
 class TestGetStructuralSubscriptionTargets(TestCaseWithFactory):
 
     layer = DatabaseFunctionalLayer
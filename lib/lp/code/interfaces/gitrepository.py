@@ -316,6 +316,30 @@ class IGitRepositoryView(IHasRecipes):
             paths to remove.
         """
 
+    def planRefChangesInChunks(hosting_path, chunk_size, start_after=None,
+                               logger=None):
+        """Plan ref changes in bounded chunks.
+
+        This is like `planRefChanges`, but compares refs from the hosting
+        service against the database a chunk at a time, in sorted order of
+        ref path, so that the changes for repositories with very many refs
+        can be fetched and applied in several smaller steps.  Refs to
+        create or update are yielded first, followed by refs to remove.
+
+        :param hosting_path: A path on the hosting service.
+        :param chunk_size: The maximum number of ref paths to consider in
+            each chunk.
+        :param start_after: If not None, skip ref paths up to and including
+            this one; this allows resuming after the last completed chunk.
+        :param logger: An optional logger.
+
+        :return: An iterator of tuples of (refs_to_upsert, refs_to_remove,
+            last_path), where refs_to_upsert and refs_to_remove are as
+            returned by `planRefChanges`, and last_path is the last ref
+            path considered for creation or update in that chunk, or None
+            for chunks of refs to remove.
+        """
+
     def fetchRefCommits(hosting_path, refs, logger=None):
         """Fetch commit information from the hosting service for a set of refs.
 
@@ -11,6 +11,7 @@ __all__ = [
 import base64
 import json
 import sys
+import threading
 from urllib import quote
 from urlparse import urljoin
 
@@ -30,6 +31,7 @@ from lp.services.config import config
 from lp.services.timeline.requesttimeline import get_request_timeline
 from lp.services.timeout import (
     get_default_timeout_function,
+    make_url_fetcher_session,
     TimeoutError,
     urlfetch,
     )
@@ -45,6 +47,15 @@ class GitHostingClient:
 
     def __init__(self):
         self.endpoint = config.codehosting.internal_git_api_endpoint
+        # Each thread keeps its own session, so that successive requests
+        # from that thread can reuse connections to the hosting service.
+        self._local = threading.local()
+
+    def _getSession(self):
+        session = getattr(self._local, "session", None)
+        if session is None:
+            session = self._local.session = make_url_fetcher_session()
+        return session
 
     def _request(self, method, path, **kwargs):
         """Make a request to the Git hosting API."""
@@ -57,8 +68,11 @@ class GitHostingClient:
             "git-hosting-%s" % method, "%s %s" % (path, json.dumps(kwargs)))
         try:
             response = urlfetch(
-                urljoin(self.endpoint, path), method=method, **kwargs)
+                urljoin(self.endpoint, path), method=method,
+                session=self._getSession(), **kwargs)
         except TimeoutError:
+            # The session has been closed; start a new one next time.
+            self._local.session = None
             # Re-raise this directly so that it can be handled specially by
             # callers.
             raise
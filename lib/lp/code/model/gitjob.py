@@ -25,6 +25,7 @@ from storm.locals import (
     SQL,
     Store,
     )
+import transaction
 from zope.component import getUtility
 from zope.interface import (
     implementer,
@@ -49,6 +50,7 @@ from lp.code.interfaces.gitjob import (
     )
 from lp.code.interfaces.gitrule import describe_git_permissions
 from lp.code.mail.branch import BranchMailer
+from lp.code.model.gitref import GitRef
 from lp.registry.interfaces.person import IPersonSet
 from lp.services.config import config
 from lp.services.database.enumcol import EnumCol
@@ -209,6 +211,9 @@ class GitRefScanJob(GitJobDerived):
 
     retry_error_types = (AdvisoryLockHeld,)
 
+    # The most ref changes that a chunked scan delivers to webhooks.
+    max_webhook_ref_changes = 1000
+
     config = config.IGitRefScanJobSource
 
     @classmethod
@@ -221,9 +226,14 @@ class GitRefScanJob(GitJobDerived):
 
     @staticmethod
     def composeWebhookPayload(repository, refs_to_upsert, refs_to_remove):
-        old_refs = {ref.path: ref for ref in repository.refs}
+        changed_paths = list(refs_to_upsert) + list(refs_to_remove)
+        old_refs = {
+            ref.path: ref for ref in Store.of(repository).find(
+                GitRef,
+                GitRef.repository == repository,
+                GitRef.path.is_in(changed_paths))}
         ref_changes = {}
-        for ref in refs_to_upsert.keys() + list(refs_to_remove):
+        for ref in changed_paths:
             old = (
                 {"commit_sha1": old_refs[ref].commit_sha1}
                 if ref in old_refs else None)
@@ -240,6 +250,74 @@ class GitRefScanJob(GitJobDerived):
             "ref_changes": ref_changes,
             }
 
+    @staticmethod
+    def _getChunkSize():
+        """The number of refs to scan at a time, or 0 for all at once."""
+        try:
+            return int(getFeatureFlag('code.git.ref_scan.chunk_size') or 0)
+        except ValueError:
+            return 0
+
+    def _applyRefChanges(self, hosting_path, refs_to_upsert, refs_to_remove):
+        """Apply ref changes to the database.
+
+        :return: The webhook payload describing the changes, or None if
+            webhooks are disabled.
+        """
+        self.repository.fetchRefCommits(
+            hosting_path, refs_to_upsert, logger=log)
+        # The webhook delivery includes old ref information, so prepare it
+        # before we actually execute the changes.
+        payload = None
+        if getFeatureFlag('code.git.webhooks.enabled'):
+            payload = self.composeWebhookPayload(
+                self.repository, refs_to_upsert, refs_to_remove)
+        self.repository.synchroniseRefs(
+            refs_to_upsert, refs_to_remove, logger=log)
+        return payload
+
+    def _scanInChunks(self, hosting_path, chunk_size):
+        """Scan refs a chunk at a time, committing after each chunk.
+
+        The ref changes from all the chunks are delivered to webhooks
+        together once the last chunk is done, up to
+        `max_webhook_ref_changes` of them.  Only the last ref path that
+        was completed is recorded in the job's metadata; if the job is
+        retried, it resumes after that path, and its webhook delivery
+        only has the ref changes found after resuming.
+        """
+        chunks = self.repository.planRefChangesInChunks(
+            hosting_path, chunk_size,
+            start_after=self.metadata.get("last_ref_path"), logger=log)
+        payload = None
+        ref_changes = {}
+        truncated = False
+        for refs_to_upsert, refs_to_remove, last_path in chunks:
+            payload = self._applyRefChanges(
+                hosting_path, refs_to_upsert, refs_to_remove)
+            if payload is not None:
+                for path, change in sorted(payload["ref_changes"].items()):
+                    if len(ref_changes) < self.max_webhook_ref_changes:
+                        ref_changes[path] = change
+                    else:
+                        truncated = True
+            if last_path is not None:
+                self.context.metadata = dict(
+                    self.metadata, last_ref_path=last_path)
+            transaction.commit()
+        if truncated:
+            log.info(
+                "Only delivering the first %d ref changes to webhooks for "
+                "%s." % (
+                    self.max_webhook_ref_changes,
+                    self._cached_repository_name))
+        if getFeatureFlag('code.git.webhooks.enabled'):
+            if payload is None:
+                payload = self.composeWebhookPayload(self.repository, {}, {})
+            payload["ref_changes"] = ref_changes
+            getUtility(IWebhookSet).trigger(
+                self.repository, 'git:push:0.1', payload)
+
     def run(self):
         """See `IGitRefScanJob`."""
         try:
@@ -247,19 +325,18 @@ class GitRefScanJob(GitJobDerived):
                     LockType.GIT_REF_SCAN, self.repository.id,
                     Store.of(self.repository)):
                 hosting_path = self.repository.getInternalPath()
-                refs_to_upsert, refs_to_remove = (
-                    self.repository.planRefChanges(hosting_path, logger=log))
-                self.repository.fetchRefCommits(
-                    hosting_path, refs_to_upsert, logger=log)
-                # The webhook delivery includes old ref information, so
-                # prepare it before we actually execute the changes.
-                if getFeatureFlag('code.git.webhooks.enabled'):
-                    payload = self.composeWebhookPayload(
-                        self.repository, refs_to_upsert, refs_to_remove)
-                    getUtility(IWebhookSet).trigger(
-                        self.repository, 'git:push:0.1', payload)
-                self.repository.synchroniseRefs(
-                    refs_to_upsert, refs_to_remove, logger=log)
+                chunk_size = self._getChunkSize()
+                if chunk_size > 0:
+                    self._scanInChunks(hosting_path, chunk_size)
+                else:
+                    refs_to_upsert, refs_to_remove = (
+                        self.repository.planRefChanges(
+                            hosting_path, logger=log))
+                    payload = self._applyRefChanges(
+                        hosting_path, refs_to_upsert, refs_to_remove)
+                    if payload is not None:
+                        getUtility(IWebhookSet).trigger(
+                            self.repository, 'git:push:0.1', payload)
                 props = getUtility(IGitHostingClient).getProperties(
                     hosting_path)
                 # We don't want ref canonicalisation, nor do we want to send
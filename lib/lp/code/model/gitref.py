@@ -3,6 +3,8 @@
 
 __metaclass__ = type
 __all__ = [
+    'git_log_cache',
+    'GitLogCache',
     'GitRef',
     'GitRefDefault',
     'GitRefFrozen',
@@ -12,12 +14,14 @@ __all__ = [
 from functools import partial
 import json
 import re
+import threading
 from urllib import (
     quote,
     quote_plus,
     )
 from urlparse import urlsplit
 
+from bzrlib.lru_cache import LRUCache
 from lazr.lifecycle.event import ObjectCreatedEvent
 import pytz
 import requests
@@ -84,6 +88,7 @@ from lp.services.database.stormbase import StormBase
 from lp.services.features import getFeatureFlag
 from lp.services.memcache.interfaces import IMemcacheClient
 from lp.services.timeout import (
+    get_default_timeout_function,
     reduced_timeout,
     TimeoutError,
     urlfetch,
@@ -92,6 +97,93 @@ from lp.services.utils import seconds_since_epoch
 from lp.services.webapp.interfaces import ILaunchBag
 
 
+class GitLogCache:
+    """An in-process cache of commit logs, shared between threads.
+
+    This sits in front of memcache.  Logs are keyed by everything that
+    identifies a log request except its limit; a cached log can answer any
+    request for the same or a smaller limit, and a log that was shorter
+    than its limit (so is already complete) can answer any request at all.
+
+    Concurrent requests for the same log are coalesced: only the first
+    thread fetches it, and the others wait for its result.
+    """
+
+    def __init__(self, max_entries=1000):
+        self._lock = threading.Lock()
+        self._logs = LRUCache(max_entries)
+        self._in_flight = {}
+
+    def _lookup(self, key, limit):
+        """Look up a cached log; the caller must hold the lock."""
+        cached = self._logs.get(key)
+        if cached is None:
+            return None
+        cached_limit, log = cached
+        complete = cached_limit is None or len(log) < cached_limit
+        if limit is None:
+            return log if complete else None
+        elif complete or limit <= cached_limit:
+            return log[:limit]
+        else:
+            return None
+
+    def _store(self, key, limit, log):
+        """Cache a log, unless we already have a more useful one."""
+        with self._lock:
+            if self._lookup(key, limit) is None:
+                self._logs[key] = (limit, log)
+
+    def get(self, key, limit, fetch, timeout=None):
+        """Get a log, fetching it if necessary.
+
+        :param key: A hashable key identifying the log apart from its limit.
+        :param limit: The maximum number of commits to return, or None.
+        :param fetch: A callable that fetches the log and returns it, or
+            returns None if it is not available.
+        :param timeout: The maximum number of seconds to wait for another
+            thread that is already fetching the same log.
+        :return: The log, or None.
+        """
+        flight_key = (key, limit)
+        with self._lock:
+            log = self._lookup(key, limit)
+            if log is not None:
+                return log
+            event = self._in_flight.get(flight_key)
+            leader = event is None
+            if leader:
+                event = self._in_flight[flight_key] = threading.Event()
+        if not leader:
+            event.wait(timeout)
+            with self._lock:
+                log = self._lookup(key, limit)
+            if log is not None:
+                return log
+            # The other thread failed or took too long; try for ourselves.
+            log = fetch()
+            if log is not None:
+                self._store(key, limit, log)
+            return log
+        try:
+            log = fetch()
+            if log is not None:
+                self._store(key, limit, log)
+            return log
+        finally:
+            with self._lock:
+                del self._in_flight[flight_key]
+            event.set()
+
+    def clear(self):
+        """Forget all cached logs."""
+        with self._lock:
+            self._logs.clear()
+
+
+git_log_cache = GitLogCache()
+
+
 class GitRefMixin:
     """Methods and properties common to GitRef and GitRefFrozen.
 
@@ -335,23 +427,37 @@ class GitRefMixin:
             if stop is not None:
                 memcache_key += ":stop=%s" % stop
             memcache_key = six.ensure_binary(memcache_key)
-            cached_log = memcache_client.get(memcache_key)
-            if cached_log is not None:
-                try:
-                    log = json.loads(cached_log)
-                except Exception:
-                    if logger is not None:
-                        logger.exception(
-                            "Cannot load cached log information for %s:%s; "
-                            "deleting" % (path, start))
-                    memcache_client.delete(memcache_key)
+            hosting_client = getUtility(IGitHostingClient)
+
+            def fetch_log():
+                cached_log = memcache_client.get(memcache_key)
+                if cached_log is not None:
+                    try:
+                        return json.loads(cached_log)
+                    except Exception:
+                        if logger is not None:
+                            logger.exception(
+                                "Cannot load cached log information for "
+                                "%s:%s; deleting" % (path, start))
+                        memcache_client.delete(memcache_key)
+                if enable_hosting:
+                    log = removeSecurityProxy(hosting_client.getLog(
+                        path, start, limit=limit, stop=stop, logger=logger))
+                    memcache_client.set(memcache_key, json.dumps(log))
+                    return log
+                return None
+
+            timeout_function = get_default_timeout_function()
+            log = git_log_cache.get(
+                (instance_name, path, start, stop), limit, fetch_log,
+                timeout=(
+                    timeout_function() if timeout_function is not None
+                    else None))
         if log is None:
-            if enable_hosting:
+            if enable_hosting and not enable_memcache:
                 hosting_client = getUtility(IGitHostingClient)
                 log = removeSecurityProxy(hosting_client.getLog(
                     path, start, limit=limit, stop=stop, logger=logger))
-                if enable_memcache:
-                    memcache_client.set(memcache_key, json.dumps(log))
             else:
                 # Fall back to synthesising something reasonable based on
                 # information in our own database.
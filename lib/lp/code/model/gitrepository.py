@@ -9,6 +9,7 @@ __all__ = [
     'parse_git_commits',
     ]
 
+from bisect import bisect_right
 from collections import (
     defaultdict,
     OrderedDict,
@@ -18,7 +19,6 @@ from datetime import (
     timedelta,
     )
 import email
-from fnmatch import fnmatch
 from functools import partial
 from itertools import (
     chain,
@@ -139,6 +139,7 @@ from lp.code.model.gitref import (
     GitRefDefault,
     )
 from lp.code.model.gitrule import (
+    get_ref_pattern_matcher,
     GitRule,
     GitRuleGrant,
     )
@@ -678,8 +679,12 @@ class GitRepository(StormBase, WebhookTargetMixin, GitIdentityMixin):
             GitRef.repository == self, GitRef.path.is_in(paths)).remove()
         self.date_last_modified = UTC_NOW
 
-    def planRefChanges(self, hosting_path, logger=None):
-        """See `IGitRepository`."""
+    def _getHostingRefs(self, hosting_path, logger=None):
+        """Fetch and convert the refs in a repository on the hosting service.
+
+        :return: A dict mapping ref paths to dicts of {"sha1": sha1,
+            "type": `GitObjectType`}.
+        """
         hosting_client = getUtility(IGitHostingClient)
         new_refs = {}
         exclude_prefixes = config.codehosting.git_exclude_ref_prefixes.split()
@@ -691,9 +696,21 @@ class GitRepository(StormBase, WebhookTargetMixin, GitIdentityMixin):
                 if logger is not None:
                     logger.warning(
                         "Unconvertible ref %s %s: %s" % (path, info, e))
+        return new_refs
+
+    def _getCurrentRefs(self, paths=None):
+        """Summarise the refs currently in the database.
+
+        :param paths: If not None, only consider refs with these paths.
+        :return: A dict mapping ref paths to tuples of (commit_sha1,
+            object_type, has_commit_details).
+        """
+        clauses = [GitRef.repository_id == self.id]
+        if paths is not None:
+            clauses.append(GitRef.path.is_in(paths))
         # GitRef rows can be large (especially commit_message), and we don't
         # need the whole thing.
-        current_refs = {
+        return {
             ref[0]: ref[1:]
             for ref in Store.of(self).find(
                 (GitRef.path, GitRef.commit_sha1, GitRef.object_type,
@@ -703,7 +720,11 @@ class GitRepository(StormBase, WebhookTargetMixin, GitIdentityMixin):
                      GitRef.committer_id != None,
                      GitRef.committer_date != None,
                      GitRef.commit_message != None)),
-                GitRef.repository_id == self.id)}
+                *clauses)}
+
+    @staticmethod
+    def _planRefUpserts(new_refs, current_refs):
+        """Work out which of `new_refs` need to be created or updated."""
         refs_to_upsert = {}
         for path, info in new_refs.items():
             current_ref = current_refs.get(path)
@@ -715,9 +736,37 @@ class GitRepository(StormBase, WebhookTargetMixin, GitIdentityMixin):
                 # Only request detailed commit metadata for refs that point
                 # to commits.
                 refs_to_upsert[path] = info
+        return refs_to_upsert
+
+    def planRefChanges(self, hosting_path, logger=None):
+        """See `IGitRepository`."""
+        new_refs = self._getHostingRefs(hosting_path, logger=logger)
+        current_refs = self._getCurrentRefs()
+        refs_to_upsert = self._planRefUpserts(new_refs, current_refs)
         refs_to_remove = set(current_refs) - set(new_refs)
         return refs_to_upsert, refs_to_remove
 
+    def planRefChangesInChunks(self, hosting_path, chunk_size,
+                               start_after=None, logger=None):
+        """See `IGitRepository`."""
+        new_refs = self._getHostingRefs(hosting_path, logger=logger)
+        paths = sorted(new_refs)
+        if start_after is not None:
+            paths = paths[bisect_right(paths, start_after):]
+        for i in range(0, len(paths), chunk_size):
+            chunk_paths = paths[i:i + chunk_size]
+            chunk_refs = {path: new_refs[path] for path in chunk_paths}
+            refs_to_upsert = self._planRefUpserts(
+                chunk_refs, self._getCurrentRefs(paths=chunk_paths))
+            yield refs_to_upsert, set(), chunk_paths[-1]
+        # Only fetch paths here; the rows to be removed may be numerous.
+        paths_to_remove = sorted(
+            path for path in Store.of(self).find(
+                GitRef.path, GitRef.repository_id == self.id)
+            if path not in new_refs)
+        for i in range(0, len(paths_to_remove), chunk_size):
+            yield {}, set(paths_to_remove[i:i + chunk_size]), None
+
     @staticmethod
     def fetchRefCommits(hosting_path, refs, logger=None):
         """See `IGitRepository`."""
@@ -1360,11 +1409,10 @@ class GitRepository(StormBase, WebhookTargetMixin, GitIdentityMixin):
         for grant in grants:
             grants_for_user[grant.rule].append(grant)
 
+        matcher = get_ref_pattern_matcher(
+            rule.ref_pattern for rule in rules)
         for ref_path in ref_paths:
-            matching_rules = [
-                rule for rule in rules if fnmatch(
-                    six.ensure_binary(ref_path),
-                    rule.ref_pattern.encode("UTF-8"))]
+            matching_rules = [rules[i] for i in matcher.match(ref_path)]
             if is_owner and not matching_rules:
                 # If there are no matching rules, then the repository owner
                 # can do anything.
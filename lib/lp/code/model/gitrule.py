@@ -7,15 +7,22 @@ from __future__ import absolute_import, print_function, unicode_literals
 
 __metaclass__ = type
 __all__ = [
+    'get_ref_pattern_matcher',
+    'GitRefPatternMatcher',
     'GitRule',
     'GitRuleGrant',
     ]
 
+from bisect import insort
 from collections import (
     defaultdict,
     OrderedDict,
     )
+from fnmatch import translate
+import re
+from threading import local
 
+from bzrlib.lru_cache import LRUCache
 from lazr.enum import DBItem
 from lazr.restful.interfaces import (
     IFieldMarshaller,
@@ -23,6 +30,7 @@ from lazr.restful.interfaces import (
     )
 from lazr.restful.utils import get_current_browser_request
 import pytz
+import six
 from storm.locals import (
     Bool,
     DateTime,
@@ -88,6 +96,77 @@ def git_rule_modified(rule, event):
         removeSecurityProxy(rule).date_last_modified = UTC_NOW
 
 
+class GitRefPatternMatcher:
+    """Match ref paths against an ordered sequence of ref patterns.
+
+    Patterns use `fnmatch` syntax.  Patterns without any wildcards are
+    matched with a dictionary lookup, and the others are grouped by the
+    literal prefix before their first wildcard, so matching a ref path only
+    tries the regular expressions for patterns that could possibly match
+    it.  This keeps permission checks fast for repositories with many rules
+    and pushes with many refs.
+    """
+
+    def __init__(self, ref_patterns):
+        """Construct a `GitRefPatternMatcher`.
+
+        :param ref_patterns: A sequence of ref patterns, in rule order.
+        """
+        self._exact = defaultdict(list)
+        self._wildcards = defaultdict(list)
+        self._prefix_lengths = []
+        for index, ref_pattern in enumerate(ref_patterns):
+            ref_pattern = ref_pattern.encode("UTF-8")
+            wildcard = re.search(b"[*?[]", ref_pattern)
+            if wildcard is None:
+                self._exact[ref_pattern].append(index)
+                continue
+            prefix = ref_pattern[:wildcard.start()]
+            if len(prefix) not in self._prefix_lengths:
+                insort(self._prefix_lengths, len(prefix))
+            self._wildcards[prefix].append(
+                (index, re.compile(translate(ref_pattern))))
+
+    def match(self, ref_path):
+        """Return the indices of the patterns that match a ref path.
+
+        :param ref_path: A ref path, as text or UTF-8-encoded bytes.
+        :return: A sorted list of indices into the original sequence of
+            ref patterns.
+        """
+        ref_path = six.ensure_binary(ref_path)
+        indices = list(self._exact.get(ref_path, []))
+        for length in self._prefix_lengths:
+            if length > len(ref_path):
+                break
+            for index, regex in self._wildcards.get(ref_path[:length], []):
+                if regex.match(ref_path) is not None:
+                    indices.append(index)
+        return sorted(indices)
+
+
+class _ThreadLocalLRUCache(LRUCache, local):
+    """A per-thread LRU cache."""
+
+
+# Compiled matchers are keyed by the ordered ref patterns themselves, so
+# any change to a repository's rules naturally results in a new matcher.
+_ref_pattern_matcher_cache = _ThreadLocalLRUCache(1000, 700)
+
+
+def get_ref_pattern_matcher(ref_patterns):
+    """Get a (possibly cached) `GitRefPatternMatcher` for some ref patterns.
+
+    :param ref_patterns: A sequence of ref patterns, in rule order.
+    """
+    ref_patterns = tuple(ref_patterns)
+    matcher = _ref_pattern_matcher_cache.get(ref_patterns)
+    if matcher is None:
+        matcher = GitRefPatternMatcher(ref_patterns)
+        _ref_pattern_matcher_cache[ref_patterns] = matcher
+    return matcher
+
+
 @implementer(IGitRule, IJSONPublishable)
 class GitRule(StormBase):
     """See `IGitRule`."""
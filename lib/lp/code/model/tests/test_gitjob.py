@@ -164,6 +164,45 @@ class TestGitRefScanJob(TestCaseWithFactory):
         self.assertRefsMatch(repository.refs, repository, paths)
         self.assertEqual("refs/heads/master", repository.default_branch)
 
+    def test_run_in_chunks(self):
+        # If configured to do so, the job scans refs a chunk at a time,
+        # fetching commit details separately for each chunk.
+        self.useFixture(
+            FeatureFixture({'code.git.ref_scan.chunk_size': '2'}))
+        repository = self.factory.makeGitRepository()
+        self.factory.makeGitRefs(repository, paths=['refs/heads/old'])
+        job = GitRefScanJob.create(repository)
+        paths = ("refs/heads/master", "refs/tags/1.0", "refs/tags/2.0")
+        author = repository.owner
+        author_date_start = datetime(2015, 1, 1, tzinfo=pytz.UTC)
+        author_date_gen = time_counter(author_date_start, timedelta(days=1))
+        hosting_fixture = self.useFixture(GitHostingFixture(
+            refs=self.makeFakeRefs(paths),
+            commits=self.makeFakeCommits(author, author_date_gen, paths)))
+        with dbuser("branchscanner"):
+            JobRunner([job]).runAll()
+        self.assertRefsMatch(repository.refs, repository, paths)
+        self.assertEqual(
+            [sorted(hashlib.sha1(path).hexdigest() for path in chunk_paths)
+             for chunk_paths in (paths[:2], paths[2:])],
+            [sorted(args[1])
+             for args in hosting_fixture.getCommits.extract_args()])
+        self.assertEqual("refs/tags/2.0", job.metadata["last_ref_path"])
+
+    def test_run_in_chunks_resumes(self):
+        # A chunked scan resumes after the last ref path it completed.
+        self.useFixture(
+            FeatureFixture({'code.git.ref_scan.chunk_size': '1'}))
+        repository = self.factory.makeGitRepository()
+        job = GitRefScanJob.create(repository)
+        removeSecurityProxy(job.context).metadata = dict(
+            job.metadata, last_ref_path="refs/heads/master")
+        paths = ("refs/heads/master", "refs/tags/1.0")
+        self.useFixture(GitHostingFixture(refs=self.makeFakeRefs(paths)))
+        with dbuser("branchscanner"):
+            JobRunner([job]).runAll()
+        self.assertRefsMatch(repository.refs, repository, ["refs/tags/1.0"])
+
     def test_logs_bad_ref_info(self):
         repository = self.factory.makeGitRepository()
         job = GitRefScanJob.create(repository)
@@ -212,6 +251,57 @@ class TestGitRefScanJob(TestCaseWithFactory):
                     hook.id, hook.target),
                 repr(delivery))
 
+    def test_run_in_chunks_triggers_one_webhook(self):
+        # A chunked scan delivers the ref changes from all its chunks
+        # together.
+        self.useFixture(FeatureFixture({
+            'code.git.ref_scan.chunk_size': '1',
+            'code.git.webhooks.enabled': 'on',
+            }))
+        repository = self.factory.makeGitRepository()
+        self.factory.makeGitRefs(
+            repository, paths=['refs/heads/master', 'refs/tags/1.0'])
+        hook = self.factory.makeWebhook(
+            target=repository, event_types=['git:push:0.1'])
+        job = GitRefScanJob.create(repository)
+        paths = ('refs/heads/master', 'refs/tags/2.0')
+        self.useFixture(GitHostingFixture(refs=self.makeFakeRefs(paths)))
+        with dbuser('branchscanner'):
+            JobRunner([job]).runAll()
+        delivery = hook.deliveries.one()
+        sha1 = lambda s: hashlib.sha1(s).hexdigest()
+        self.assertEqual(
+            {'refs/tags/1.0': {
+                'old': {'commit_sha1': sha1('refs/tags/1.0')}, 'new': None},
+             'refs/tags/2.0': {
+                'old': None, 'new': {'commit_sha1': sha1('refs/tags/2.0')}},
+             },
+            delivery.payload['ref_changes'])
+
+    def test_run_in_chunks_caps_webhook_ref_changes(self):
+        # A chunked scan only keeps the last ref path it completed in its
+        # metadata, and delivers at most max_webhook_ref_changes ref
+        # changes.
+        self.useFixture(FeatureFixture({
+            'code.git.ref_scan.chunk_size': '1',
+            'code.git.webhooks.enabled': 'on',
+            }))
+        self.patch(GitRefScanJob, 'max_webhook_ref_changes', 2)
+        repository = self.factory.makeGitRepository()
+        hook = self.factory.makeWebhook(
+            target=repository, event_types=['git:push:0.1'])
+        job = GitRefScanJob.create(repository)
+        paths = ('refs/heads/master', 'refs/tags/1.0', 'refs/tags/2.0')
+        self.useFixture(GitHostingFixture(refs=self.makeFakeRefs(paths)))
+        with dbuser('branchscanner'):
+            JobRunner([job]).runAll()
+        self.assertRefsMatch(repository.refs, repository, paths)
+        self.assertEqual(
+            {'last_ref_path': 'refs/tags/2.0'}, dict(job.metadata))
+        self.assertEqual(
+            ['refs/heads/master', 'refs/tags/1.0'],
+            sorted(hook.deliveries.one().payload['ref_changes']))
+
     def test_merge_detection_triggers_webhooks(self):
         self.useFixture(FeatureFixture(
             {BRANCH_MERGE_PROPOSAL_WEBHOOKS_FEATURE_FLAG: 'on'}))
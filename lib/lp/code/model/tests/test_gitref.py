@@ -13,6 +13,7 @@ from datetime import (
     )
 import hashlib
 import json
+import threading
 
 from bzrlib import urlutils
 import pytz
@@ -44,6 +45,7 @@ from lp.code.errors import (
     )
 from lp.code.interfaces.gitrepository import IGitRepositorySet
 from lp.code.interfaces.gitrule import IGitNascentRuleGrant
+from lp.code.model.gitref import GitLogCache
 from lp.code.tests.helpers import GitHostingFixture
 from lp.services.config import config
 from lp.services.database.sqlbase import get_transaction_timestamp
@@ -57,9 +59,11 @@ from lp.testing import (
     api_url,
     person_logged_in,
     record_two_runs,
+    TestCase,
     TestCaseWithFactory,
     verifyObject,
     )
+from lp.testing.fakemethod import FakeMethod
 from lp.testing.layers import (
     DatabaseFunctionalLayer,
     LaunchpadFunctionalLayer,
@@ -130,6 +134,74 @@ class TestGitRef(TestCaseWithFactory):
         self.assertEqual(InformationType.USERDATA, ref.information_type)
 
 
+class TestGitLogCache(TestCase):
+    """Tests for the in-process `GitLogCache`."""
+
+    def test_fetches_and_caches(self):
+        cache = GitLogCache()
+        fetch = FakeMethod(result=["a", "b"])
+        self.assertEqual(["a", "b"], cache.get("key", None, fetch))
+        self.assertEqual(["a", "b"], cache.get("key", None, fetch))
+        self.assertEqual(1, fetch.call_count)
+
+    def test_does_not_cache_missing_logs(self):
+        cache = GitLogCache()
+        fetch = FakeMethod(result=None)
+        self.assertIsNone(cache.get("key", None, fetch))
+        self.assertIsNone(cache.get("key", None, fetch))
+        self.assertEqual(2, fetch.call_count)
+
+    def test_longer_log_answers_shorter_request(self):
+        cache = GitLogCache()
+        cache.get("key", 3, FakeMethod(result=["a", "b", "c"]))
+        fetch = FakeMethod(result=["x"])
+        self.assertEqual(["a", "b"], cache.get("key", 2, fetch))
+        self.assertEqual(0, fetch.call_count)
+
+    def test_shorter_log_does_not_answer_longer_request(self):
+        cache = GitLogCache()
+        cache.get("key", 2, FakeMethod(result=["a", "b"]))
+        fetch = FakeMethod(result=["a", "b", "c"])
+        self.assertEqual(["a", "b", "c"], cache.get("key", 3, fetch))
+        self.assertEqual(["a", "b", "c"], cache.get("key", None, fetch))
+        self.assertEqual(2, fetch.call_count)
+
+    def test_complete_log_answers_any_request(self):
+        # A log that is shorter than its limit is the whole history.
+        cache = GitLogCache()
+        cache.get("key", 10, FakeMethod(result=["a", "b"]))
+        fetch = FakeMethod(result=["x"])
+        self.assertEqual(["a", "b"], cache.get("key", 20, fetch))
+        self.assertEqual(["a", "b"], cache.get("key", None, fetch))
+        self.assertEqual(0, fetch.call_count)
+
+    def test_coalesces_concurrent_fetches(self):
+        cache = GitLogCache()
+        fetching = threading.Event()
+        finish = threading.Event()
+        calls = []
+
+        def slow_fetch():
+            calls.append(None)
+            fetching.set()
+            finish.wait()
+            return ["a"]
+
+        results = []
+        leader = threading.Thread(
+            target=lambda: results.append(cache.get("key", None, slow_fetch)))
+        leader.start()
+        fetching.wait()
+        follower = threading.Thread(
+            target=lambda: results.append(cache.get("key", None, slow_fetch)))
+        follower.start()
+        finish.set()
+        leader.join()
+        follower.join()
+        self.assertEqual([["a"], ["a"]], results)
+        self.assertEqual(1, len(calls))
+
+
 class TestGitRefGetCommits(TestCaseWithFactory):
     """Tests for retrieving commit information from a Git reference."""
 
@@ -254,6 +326,14 @@ class TestGitRefGetCommits(TestCaseWithFactory):
             json.dumps(self.log),
             getUtility(IMemcacheClient).get(key.encode("UTF-8")))
 
+    def test_local_cache_reuses_longer_log(self):
+        # A previously-fetched longer log is used to answer a request with a
+        # smaller limit, without consulting memcache or the hosting service.
+        self.ref.getCommits(self.sha1_tip, limit=10)
+        commits = self.ref.getCommits(self.sha1_tip, limit=1)
+        self.assertEqual(1, len(self.hosting_fixture.getLog.calls))
+        self.assertEqual([self.sha1_tip], [c["sha1"] for c in commits])
+
     def test_union_repository(self):
         other_repository = self.factory.makeGitRepository()
         self.ref.getCommits(
@@ -1634,6 +1634,45 @@ class TestGitRepositoryRefs(TestCaseWithFactory):
             [{"exclude_prefixes": ["refs/changes/", "refs/pull/"]}],
             hosting_fixture.getRefs.extract_kwargs())
 
+    def test_planRefChangesInChunks(self):
+        # planRefChangesInChunks yields bounded chunks of refs to create or
+        # update in path order, followed by chunks of refs to remove.
+        repository = self.factory.makeGitRepository()
+        paths = ("refs/heads/a", "refs/heads/b", "refs/heads/gone")
+        self.factory.makeGitRefs(repository=repository, paths=paths)
+        b_sha1 = repository.getRefByPath("refs/heads/b").commit_sha1
+        new_sha1 = "1111111111111111111111111111111111111111"
+        self.useFixture(GitHostingFixture(refs={
+            path: {"object": {"sha1": sha1, "type": "commit"}}
+            for path, sha1 in (
+                ("refs/heads/a", new_sha1),
+                ("refs/heads/b", b_sha1),
+                ("refs/heads/c", new_sha1),
+                )}))
+        chunks = list(repository.planRefChangesInChunks("dummy", 2))
+        commit = lambda sha1: {
+            "sha1": unicode(sha1), "type": GitObjectType.COMMIT}
+        self.assertEqual([
+            ({"refs/heads/a": commit(new_sha1),
+              "refs/heads/b": commit(b_sha1)},
+             set(), "refs/heads/b"),
+            ({"refs/heads/c": commit(new_sha1)}, set(), "refs/heads/c"),
+            ({}, {"refs/heads/gone"}, None),
+            ], chunks)
+
+    def test_planRefChangesInChunks_start_after(self):
+        # planRefChangesInChunks can resume after a given ref path.
+        repository = self.factory.makeGitRepository()
+        sha1 = "1111111111111111111111111111111111111111"
+        self.useFixture(GitHostingFixture(refs={
+            path: {"object": {"sha1": sha1, "type": "commit"}}
+            for path in ("refs/heads/a", "refs/heads/b", "refs/heads/c")}))
+        chunks = list(repository.planRefChangesInChunks(
+            "dummy", 2, start_after="refs/heads/a"))
+        self.assertEqual(
+            [sorted(["refs/heads/b", "refs/heads/c"])],
+            [sorted(refs_to_upsert) for refs_to_upsert, _, _ in chunks])
+
     def test_fetchRefCommits(self):
         # fetchRefCommits fetches detailed tip commit metadata for the
         # requested refs.
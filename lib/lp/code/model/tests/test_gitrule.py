@@ -30,16 +30,64 @@ from lp.code.interfaces.gitrule import (
     IGitRuleGrant,
     is_rule_exact,
     )
+from lp.code.model.gitrule import (
+    get_ref_pattern_matcher,
+    GitRefPatternMatcher,
+    )
 from lp.services.database.sqlbase import get_transaction_timestamp
 from lp.services.webapp.snapshot import notify_modified
 from lp.testing import (
     person_logged_in,
+    TestCase,
     TestCaseWithFactory,
     verifyObject,
     )
 from lp.testing.layers import DatabaseFunctionalLayer
 
 
+class TestGitRefPatternMatcher(TestCase):
+
+    def test_exact(self):
+        matcher = GitRefPatternMatcher(
+            ["refs/heads/master", "refs/heads/stable"])
+        self.assertEqual([0], matcher.match("refs/heads/master"))
+        self.assertEqual([1], matcher.match("refs/heads/stable"))
+        self.assertEqual([], matcher.match("refs/heads/master2"))
+
+    def test_wildcards(self):
+        matcher = GitRefPatternMatcher([
+            "refs/heads/master", "refs/heads/*", "refs/tags/*",
+            "refs/heads/stable-?", "*",
+            ])
+        self.assertEqual([0, 1, 4], matcher.match("refs/heads/master"))
+        self.assertEqual([1, 3, 4], matcher.match("refs/heads/stable-1"))
+        self.assertEqual([1, 4], matcher.match("refs/heads/stable-10"))
+        self.assertEqual([2, 4], matcher.match("refs/tags/1.0"))
+        self.assertEqual([4], matcher.match("refs/other"))
+
+    def test_matches_fnmatch(self):
+        # The matcher agrees with fnmatch, including for character classes
+        # and non-ASCII patterns.
+        patterns = [
+            "refs/heads/[ab]*", "refs/heads/\N{SNOWMAN}*", "refs/*/foo",
+            "refs/heads/a*",
+            ]
+        matcher = GitRefPatternMatcher(patterns)
+        self.assertEqual([0, 3], matcher.match("refs/heads/apple"))
+        self.assertEqual([0], matcher.match("refs/heads/banana"))
+        self.assertEqual([1], matcher.match("refs/heads/\N{SNOWMAN}man"))
+        self.assertEqual([2], matcher.match("refs/tags/foo"))
+        self.assertEqual([], matcher.match("refs/heads/cherry"))
+
+    def test_get_ref_pattern_matcher_caches(self):
+        # Matchers are cached by their ordered patterns.
+        matcher = get_ref_pattern_matcher(["refs/heads/*", "refs/tags/*"])
+        self.assertIs(
+            matcher, get_ref_pattern_matcher(["refs/heads/*", "refs/tags/*"]))
+        self.assertIsNot(
+            matcher, get_ref_pattern_matcher(["refs/tags/*", "refs/heads/*"]))
+
+
 class TestGitRule(TestCaseWithFactory):
 
     layer = DatabaseFunctionalLayer
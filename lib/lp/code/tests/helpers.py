@@ -43,6 +43,7 @@ from lp.code.interfaces.branchmergeproposal import (
 from lp.code.interfaces.githosting import IGitHostingClient
 from lp.code.interfaces.linkedbranch import ICanHasLinkedBranch
 from lp.code.interfaces.revision import IRevisionSet
+from lp.code.model.gitref import git_log_cache
 from lp.code.model.seriessourcepackagebranch import (
     SeriesSourcePackageBranchSet,
     )
@@ -337,6 +338,14 @@ class BranchHostingFixture(fixtures.Fixture):
             self.memcache_fixture = self.useFixture(MemcacheFixture())
 
 
+class GitLogMemcacheFixture(MemcacheFixture):
+    """A `MemcacheFixture` that also clears the in-process Git log cache."""
+
+    def clear(self):
+        super(GitLogMemcacheFixture, self).clear()
+        git_log_cache.clear()
+
+
 class GitHostingFixture(fixtures.Fixture):
     """A fixture that temporarily registers a fake Git hosting client."""
 
@@ -362,10 +371,12 @@ class GitHostingFixture(fixtures.Fixture):
 
     def _setUp(self):
         self.useFixture(ZopeUtilityFixture(self, IGitHostingClient))
+        git_log_cache.clear()
+        self.addCleanup(git_log_cache.clear)
         if self.disable_memcache:
             # Most tests that involve GitRef._getLog don't want to cache the
             # result: doing so requires more time-consuming test setup and
             # makes it awkward to repeat the same call with different log
             # responses.  For convenience, we make it easy to disable that
             # here.
-            self.memcache_fixture = self.useFixture(MemcacheFixture())
+            self.memcache_fixture = self.useFixture(GitLogMemcacheFixture())
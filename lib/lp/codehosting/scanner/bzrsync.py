@@ -16,6 +16,7 @@ __all__ = [
 
 import logging
 
+from bzrlib import errors
 from bzrlib.graph import DictParentsProvider
 from bzrlib.revision import NULL_REVISION
 import pytz
@@ -89,19 +90,37 @@ class BzrSync:
         """
         self.logger.info("Scanning branch: %s", self.db_branch.unique_name)
         self.logger.info("    from %s", bzr_branch.base)
-        # Get the history and ancestry from the branch first, to fail early
-        # if something is wrong with the branch.
-        self.logger.info("Retrieving history from bzrlib.")
-        bzr_history = branch_revision_history(bzr_branch)
-        # The BranchRevision, Revision and RevisionParent tables are only
-        # written to by the branch-scanner, so they are not subject to
-        # write-lock contention. Update them all in a single transaction to
-        # improve the performance and allow garbage collection in the future.
-        db_ancestry, db_history = self.retrieveDatabaseAncestry()
-
-        (new_ancestry, branchrevisions_to_delete,
-            revids_to_insert) = self.planDatabaseChanges(
-            bzr_branch, bzr_history, db_ancestry, db_history)
+        incremental_history = self.getIncrementalHistory(bzr_branch)
+        if incremental_history is not None:
+            # The branch's mainline simply extends what we scanned last
+            # time, so there's no need to compare the whole history.
+            last_revno, added_history = incremental_history
+            initial_scan = False
+            (new_ancestry, branchrevisions_to_delete,
+                revids_to_insert) = self.planIncrementalDatabaseChanges(
+                bzr_branch, added_history, last_revno)
+            if added_history:
+                last_revision_id = added_history[-1]
+            else:
+                last_revision_id = self.db_branch.last_scanned_id
+        else:
+            # Get the history and ancestry from the branch first, to fail
+            # early if something is wrong with the branch.
+            self.logger.info("Retrieving history from bzrlib.")
+            bzr_history = branch_revision_history(bzr_branch)
+            # The BranchRevision, Revision and RevisionParent tables are
+            # only written to by the branch-scanner, so they are not subject
+            # to write-lock contention. Update them all in a single
+            # transaction to improve the performance and allow garbage
+            # collection in the future.
+            db_ancestry, db_history = self.retrieveDatabaseAncestry()
+            initial_scan = (len(db_history) == 0)
+
+            (new_ancestry, branchrevisions_to_delete,
+                revids_to_insert) = self.planDatabaseChanges(
+                bzr_branch, bzr_history, db_ancestry, db_history)
+            last_revno = len(bzr_history)
+            last_revision_id = bzr_history[-1] if bzr_history else None
         new_db_revs = (
             new_ancestry - getUtility(IRevisionSet).onlyPresent(new_ancestry))
         self.logger.info("Adding %s new revisions.", len(new_db_revs))
@@ -119,7 +138,6 @@ class BzrSync:
         # Notify any listeners that the tip of the branch has changed, but
         # before we've actually updated the database branch.
         self.logger.info("Firing tip change event.")
-        initial_scan = (len(db_history) == 0)
         notify(events.TipChanged(self.db_branch, bzr_branch, initial_scan))
 
         # The Branch table is modified by other systems, including the web UI,
@@ -130,7 +148,7 @@ class BzrSync:
         # the pessimistic side (tell the user the data has not yet been
         # updated although it has), the race is acceptable.
         self.logger.info("Updating branch status.")
-        self.updateBranchStatus(bzr_history)
+        self.updateBranchStatus(last_revno, last_revision_id)
         self.logger.info("Firing scan completion event.")
         notify(
             events.ScanCompleted(
@@ -175,6 +193,45 @@ class BzrSync:
             added_ancestry.discard(NULL_REVISION)
         return added_ancestry, removed_ancestry
 
+    def getIncrementalHistory(self, bzr_branch):
+        """Find the mainline revisions added since the last scan, if possible.
+
+        The database branch's `last_scanned_id` and `revision_count` record
+        the tip and revno as of the last scan.  If the branch's new mainline
+        extends that tip, then walking back from the new tip to it finds the
+        added mainline revisions in time proportional to their number rather
+        than to the size of the branch's whole history.
+
+        :return: A tuple of (last_revno, added_history), where added_history
+            is in parent-to-child order; or None if the branch has not been
+            scanned before or its mainline no longer extends the previously
+            scanned tip.
+        """
+        db_last = self.db_branch.last_scanned_id
+        db_revno = self.db_branch.revision_count
+        if db_last is None or not db_revno:
+            return None
+        bzr_revno, bzr_last = bzr_branch.last_revision_info()
+        if bzr_revno < db_revno:
+            return None
+        self.logger.info("Retrieving new history from bzrlib.")
+        graph = bzr_branch.repository.get_graph()
+        added_history = []
+        try:
+            for revision_id in graph.iter_lefthand_ancestry(
+                    bzr_last, (NULL_REVISION,)):
+                if len(added_history) == bzr_revno - db_revno:
+                    if revision_id != db_last:
+                        return None
+                    break
+                added_history.append(revision_id)
+            else:
+                return None
+        except errors.RevisionNotPresent:
+            return None
+        added_history.reverse()
+        return bzr_revno, added_history
+
     def getHistoryDelta(self, bzr_history, db_history):
         self.logger.info("Calculating history delta.")
         common_len = min(len(bzr_history), len(db_history))
@@ -206,6 +263,24 @@ class BzrSync:
         # Find the length of the common history.
         added_history, removed_history = self.getHistoryDelta(
             bzr_history, db_history)
+        return self._planDatabaseChanges(
+            bzr_branch, added_history, removed_history, len(bzr_history))
+
+    def planIncrementalDatabaseChanges(self, bzr_branch, added_history,
+                                       last_revno):
+        """Plan database changes for a branch whose mainline was extended.
+
+        Use the data retrieved by `getIncrementalHistory` to plan the
+        changes to apply to the database.
+        """
+        self.logger.info(
+            "Planning incremental changes for %d new mainline revisions.",
+            len(added_history))
+        return self._planDatabaseChanges(
+            bzr_branch, added_history, [], last_revno)
+
+    def _planDatabaseChanges(self, bzr_branch, added_history,
+                             removed_history, last_revno):
         added_ancestry, removed_ancestry = self.getAncestryDelta(bzr_branch)
 
         notify(
@@ -221,7 +296,6 @@ class BzrSync:
 
         # We must insert BranchRevision rows for all revisions which were
         # added to the ancestry or whose sequence value has changed.
-        last_revno = len(bzr_history)
         revids_to_insert = dict(
             self.revisionsToInsert(
                 added_history, last_revno, added_ancestry))
@@ -302,13 +376,18 @@ class BzrSync:
         for revid_seq_pair_chunk in iter_chunks(revid_seq_pairs, 10000):
             self.db_branch.createBranchRevisionFromIDs(revid_seq_pair_chunk)
 
-    def updateBranchStatus(self, bzr_history):
-        """Update the branch-scanner status in the database Branch table."""
+    def updateBranchStatus(self, revision_count, last_revision_id):
+        """Update the branch-scanner status in the database Branch table.
+
+        :param revision_count: The number of revisions in the branch's
+            mainline.
+        :param last_revision_id: The revision ID of the branch's tip, or
+            None if the branch is empty.
+        """
         # Record that the branch has been updated.
-        revision_count = len(bzr_history)
         if revision_count > 0:
-            last_revision = bzr_history[-1]
-            revision = getUtility(IRevisionSet).getByRevisionId(last_revision)
+            revision = getUtility(IRevisionSet).getByRevisionId(
+                last_revision_id)
         else:
             revision = None
         self.logger.info(
@@ -344,6 +344,61 @@ class TestBzrSync(BzrSyncTestCase):
         [revno] = self.db_branch.revision_history
         self.assertEqual(revno.revision.log_body, 'second')
 
+    def test_getIncrementalHistory_unscanned(self):
+        # A branch that has never been scanned has no incremental history.
+        self.commitRevision()
+        self.useContext(read_locked(self.bzr_branch))
+        syncer = self.makeBzrSync(self.db_branch)
+        self.assertIsNone(syncer.getIncrementalHistory(self.bzr_branch))
+
+    def test_getIncrementalHistory_extended(self):
+        # If the mainline extends the last scanned tip, only the new
+        # mainline revisions are returned.
+        self.commitRevision()
+        self.syncAndCount(new_revisions=1, new_numbers=1, new_authors=1)
+        rev2_id = self.commitRevision()
+        rev3_id = self.commitRevision()
+        self.useContext(read_locked(self.bzr_branch))
+        syncer = self.makeBzrSync(self.db_branch)
+        self.assertEqual(
+            (3, [rev2_id, rev3_id]),
+            syncer.getIncrementalHistory(self.bzr_branch))
+
+    def test_getIncrementalHistory_uncommit(self):
+        # If the last scanned tip is no longer in the mainline, there is no
+        # incremental history.
+        self.commitRevision()
+        self.syncAndCount(new_revisions=1, new_numbers=1, new_authors=1)
+        self.uncommitRevision()
+        self.commitRevision()
+        self.useContext(read_locked(self.bzr_branch))
+        syncer = self.makeBzrSync(self.db_branch)
+        self.assertIsNone(syncer.getIncrementalHistory(self.bzr_branch))
+
+    def test_import_incremental(self):
+        # Rescanning a branch whose mainline was extended does not need to
+        # load the branch's whole history from the database.
+        self.commitRevision()
+        self.syncAndCount(new_revisions=1, new_numbers=1, new_authors=1)
+        rev2_id = self.commitRevision()
+        syncer = self.makeBzrSync(self.db_branch)
+
+        def fail():
+            self.fail("Full history was retrieved.")
+
+        syncer.retrieveDatabaseAncestry = fail
+        counts = self.getCounts()
+        syncer.syncBranchAndClose()
+        self.assertCounts(
+            counts, new_revisions=1, new_numbers=1, new_authors=1)
+        self.assertEqual(2, self.db_branch.revision_count)
+        self.assertEqual(rev2_id, self.db_branch.last_scanned_id)
+        self.assertEqual(
+            branch_revision_history(self.bzr_branch),
+            [branch_revision.revision.revision_id
+             for branch_revision in reversed(
+                 list(self.db_branch.revision_history))])
+
     def test_import_revision_with_url(self):
         # Importing a revision passing the url parameter works.
         self.commitRevision()
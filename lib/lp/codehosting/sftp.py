@@ -249,7 +249,8 @@ def avatar_to_sftp_server(avatar):
     branch_transport = _get_transport_for_dir(
         config.codehosting.mirrored_branches_root)
     server = LaunchpadServer(
-        avatar.codehosting_proxy, user_id, branch_transport)
+        avatar.codehosting_proxy, user_id, branch_transport,
+        translation_cache=avatar.translation_cache)
     server.start_server()
     transport = AsyncLaunchpadTransport(server, server.get_url())
     return TransportSFTPServer(transport)
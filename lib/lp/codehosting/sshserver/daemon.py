@@ -33,6 +33,7 @@ from zope.interface import implementer
 
 from lp.codehosting import sftp
 from lp.codehosting.sshserver.session import launch_smart_server
+from lp.codehosting.vfs import TranslationCache
 from lp.services.config import config
 
 # The names of the key files of the server itself. The directory itself is
@@ -49,11 +50,14 @@ class CodehostingAvatar(LaunchpadAvatar):
 
     :ivar codehosting_proxy: A Twisted XML-RPC client for the private XML-RPC
         server. The server must implement `ICodehostingAPI`.
+    :ivar translation_cache: A `TranslationCache` shared by all sessions in
+        this daemon, or None.
     """
 
-    def __init__(self, user_dict, codehosting_proxy):
+    def __init__(self, user_dict, codehosting_proxy, translation_cache=None):
         LaunchpadAvatar.__init__(self, user_dict)
         self.codehosting_proxy = codehosting_proxy
+        self.translation_cache = translation_cache
 
 
 components.registerAdapter(launch_smart_server, CodehostingAvatar, ISession)
@@ -65,9 +69,11 @@ components.registerAdapter(
 @implementer(IRealm)
 class Realm:
 
-    def __init__(self, authentication_proxy, codehosting_proxy):
+    def __init__(self, authentication_proxy, codehosting_proxy,
+                 translation_cache=None):
         self.authentication_proxy = authentication_proxy
         self.codehosting_proxy = codehosting_proxy
+        self.translation_cache = translation_cache
 
     def requestAvatar(self, avatar_id, mind, *interfaces):
         # Fetch the user's details from the authserver
@@ -76,15 +82,18 @@ class Realm:
 
         # Once all those details are retrieved, we can construct the avatar.
         def got_user_dict(user_dict):
-            avatar = CodehostingAvatar(user_dict, self.codehosting_proxy)
+            avatar = CodehostingAvatar(
+                user_dict, self.codehosting_proxy, self.translation_cache)
             return interfaces[0], avatar, avatar.logout
 
         return deferred.addCallback(got_user_dict)
 
 
-def get_portal(authentication_proxy, codehosting_proxy):
+def get_portal(authentication_proxy, codehosting_proxy,
+               translation_cache=None):
     """Get a portal for connecting to Launchpad codehosting."""
-    portal = Portal(Realm(authentication_proxy, codehosting_proxy))
+    portal = Portal(
+        Realm(authentication_proxy, codehosting_proxy, translation_cache))
     portal.registerChecker(
         PublicKeyFromLaunchpadChecker(authentication_proxy))
     return portal
@@ -99,9 +108,17 @@ def make_portal():
     """Create and return a `Portal` for the SSH service.
 
     This portal accepts SSH credentials and returns our customized SSH
-    avatars (see `CodehostingAvatar`).
+    avatars (see `CodehostingAvatar`).  Sessions share a cache of path
+    translations, so that each new connection doesn't have to start by
+    asking the codehosting endpoint to translate the same paths again.
     """
     authentication_proxy = Proxy(
         config.codehosting.authentication_endpoint)
     codehosting_proxy = Proxy(config.codehosting.codehosting_endpoint)
-    return get_portal(authentication_proxy, codehosting_proxy)
+    translation_cache = None
+    if config.codehosting.translate_path_cache_lifetime:
+        translation_cache = TranslationCache(
+            expiry_time=config.codehosting.translate_path_cache_lifetime,
+            max_entries=config.codehosting.translate_path_cache_size)
+    return get_portal(
+        authentication_proxy, codehosting_proxy, translation_cache)
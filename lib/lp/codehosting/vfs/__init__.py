@@ -11,6 +11,7 @@ __all__ = [
     'get_ro_server',
     'get_rw_server',
     'LaunchpadServer',
+    'TranslationCache',
     ]
 
 from lp.codehosting.vfs.branchfs import (
@@ -21,4 +22,7 @@ from lp.codehosting.vfs.branchfs import (
     get_rw_server,
     LaunchpadServer,
     )
-from lp.codehosting.vfs.branchfsclient import BranchFileSystemClient
+from lp.codehosting.vfs.branchfsclient import (
+    BranchFileSystemClient,
+    TranslationCache,
+    )
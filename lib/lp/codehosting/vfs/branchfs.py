@@ -358,7 +358,7 @@ class _BaseLaunchpadServer(AsyncVirtualServer):
     """
 
     def __init__(self, scheme, codehosting_api, user_id,
-                 seen_new_branch_hook=None):
+                 seen_new_branch_hook=None, translation_cache=None):
         """Construct a LaunchpadServer.
 
         :param scheme: The URL scheme to use.
@@ -367,11 +367,14 @@ class _BaseLaunchpadServer(AsyncVirtualServer):
             branches.
         :param seen_new_branch_hook: A callable that will be called once for
             each branch accessed via this server.
+        :param translation_cache: If supplied, a `TranslationCache` shared
+            with other servers in this process.
         """
         AsyncVirtualServer.__init__(self, scheme)
         self._branchfs_client = BranchFileSystemClient(
             codehosting_api, user_id,
-            seen_new_branch_hook=seen_new_branch_hook)
+            seen_new_branch_hook=seen_new_branch_hook,
+            translation_cache=translation_cache)
         self._is_start_server = False
 
     def translateVirtualPath(self, virtual_url_fragment):
@@ -558,7 +561,7 @@ class LaunchpadServer(_BaseLaunchpadServer):
     asyncTransportFactory = AsyncLaunchpadTransport
 
     def __init__(self, codehosting_api, user_id, branch_transport,
-                 seen_new_branch_hook=None):
+                 seen_new_branch_hook=None, translation_cache=None):
         """Construct a `LaunchpadServer`.
 
         See `_BaseLaunchpadServer` for more information.
@@ -573,10 +576,13 @@ class LaunchpadServer(_BaseLaunchpadServer):
             information.
         :param seen_new_branch_hook: A callable that will be called once for
             each branch accessed via this server.
+        :param translation_cache: If supplied, a `TranslationCache` shared
+            with other servers in this process.
         """
         scheme = 'lp-%d:///' % id(self)
         super(LaunchpadServer, self).__init__(
-            scheme, codehosting_api, user_id, seen_new_branch_hook)
+            scheme, codehosting_api, user_id, seen_new_branch_hook,
+            translation_cache=translation_cache)
         self._transport_dispatch = TransportDispatch(branch_transport)
 
     def createBranch(self, virtual_url_fragment):
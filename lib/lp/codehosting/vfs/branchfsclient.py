@@ -10,6 +10,7 @@ __metaclass__ = type
 __all__ = [
     'BranchFileSystemClient',
     'NotInCache',
+    'TranslationCache',
     ]
 
 import time
@@ -24,6 +25,94 @@ class NotInCache(Exception):
     """Raised when we try to get a path from the cache that's not present."""
 
 
+class TranslationCache:
+    """A cache of the results of translatePath.
+
+    A single instance may be shared between many `BranchFileSystemClient`s,
+    for instance by every session in a long-running SSH daemon, so that a
+    new session does not have to start with a cold cache.  The results of
+    translatePath depend on the user making the request (e.g. whether a
+    branch is writable), so entries are keyed by the database ID of the
+    user as well as by the path prefix that the endpoint matched.
+    """
+
+    def __init__(self, expiry_time=None, max_entries=None, _now=time.time):
+        """Construct a `TranslationCache`.
+
+        :param expiry_time: If supplied, only keep entries for this many
+            seconds.  If not supplied, keep entries for as long as this
+            instance exists.
+        :param max_entries: If supplied, discard expired entries (and then,
+            if necessary, the oldest entries) once the cache grows beyond
+            this many entries.
+        """
+        self.expiry_time = expiry_time
+        self.max_entries = max_entries
+        self._now = _now
+        self._entries = {}
+
+    def _isExpired(self, inserted_time):
+        return (
+            self.expiry_time is not None
+            and self._now() > inserted_time + self.expiry_time)
+
+    def _prune(self):
+        """Shrink the cache back down to `max_entries`."""
+        for key, (_, _, inserted_time) in list(self._entries.items()):
+            if self._isExpired(inserted_time):
+                del self._entries[key]
+        excess = len(self._entries) - self.max_entries
+        if excess > 0:
+            oldest = sorted(
+                self._entries, key=lambda key: self._entries[key][2])
+            for key in oldest[:excess]:
+                del self._entries[key]
+
+    def add(self, user_id, matched_part, transport_type, data):
+        """Cache a translation of 'matched_part' made on behalf of a user."""
+        key = (user_id, matched_part.strip('/'))
+        self._entries[key] = (transport_type, data, self._now())
+        if (self.max_entries is not None
+            and len(self._entries) > self.max_entries):
+            self._prune()
+
+    def get(self, user_id, path):
+        """Get the cached translation of 'path' for a user.
+
+        :raise NotInCache: if no prefix of 'path' has been cached for this
+            user, or if the matching entry has expired.
+        :return: A tuple of (transport_type, data, trailing_path,
+            matched_part).
+        """
+        split_path = path.strip('/').split('/')
+        # Look up each prefix of the path in turn, longest first.  This is a
+        # segment-by-segment comparison, so '/foo/bar-suffix' never matches
+        # an entry for '/foo/bar'.
+        for length in range(len(split_path), 0, -1):
+            matched_part = '/'.join(split_path[:length])
+            key = (user_id, matched_part)
+            value = self._entries.get(key)
+            if value is None:
+                continue
+            transport_type, data, inserted_time = value
+            if self._isExpired(inserted_time):
+                del self._entries[key]
+                break
+            trailing_path = '/'.join(split_path[length:])
+            return (transport_type, data, trailing_path, matched_part)
+        raise NotInCache(path)
+
+    def invalidateBranch(self, branch_id):
+        """Forget every user's translations that point at a branch."""
+        for key, (_, data, _) in list(self._entries.items()):
+            if isinstance(data, dict) and data.get('id') == branch_id:
+                del self._entries[key]
+
+    def clear(self):
+        """Forget all cached translations."""
+        self._entries.clear()
+
+
 class BranchFileSystemClient:
     """Wrapper for some methods of the codehosting endpoint.
 
@@ -34,11 +123,13 @@ class BranchFileSystemClient:
     avoid a large number of roundtrips. In the normal course of operation, our
     Bazaar transport translates virtual paths to real paths on disk using this
     client. It does this many, many times for a single Bazaar operation, so we
-    cache the results here.
+    cache the results here.  The cache may be shared with other clients; see
+    `TranslationCache`.
     """
 
     def __init__(self, codehosting_endpoint, user_id, expiry_time=None,
-                 seen_new_branch_hook=None, _now=time.time):
+                 seen_new_branch_hook=None, translation_cache=None,
+                 _now=time.time):
         """Construct a caching codehosting_endpoint.
 
         :param codehosting_endpoint: An XML-RPC proxy that implements
@@ -50,14 +141,34 @@ class BranchFileSystemClient:
             results of translatePath for as long as this instance exists.
         :param seen_new_branch_hook: A callable that will be called with the
             unique_name of each new branch that is accessed.
+        :param translation_cache: If supplied, a `TranslationCache` to use
+            instead of one private to this client.  Its own expiry time
+            applies, so 'expiry_time' may not also be supplied.
         """
+        if translation_cache is None:
+            translation_cache = TranslationCache(
+                expiry_time=expiry_time, _now=_now)
+        elif expiry_time is not None:
+            raise AssertionError(
+                "can't supply both expiry_time and translation_cache!")
         self._codehosting_endpoint = codehosting_endpoint
-        self._cache = {}
+        self._cache = translation_cache
+        self._seen_branches = set()
         self._user_id = user_id
-        self.expiry_time = expiry_time
-        self._now = _now
         self.seen_new_branch_hook = seen_new_branch_hook
 
+    @property
+    def expiry_time(self):
+        return self._cache.expiry_time
+
+    def _seeBranch(self, matched_part):
+        """Call `seen_new_branch_hook` if this client hasn't seen a branch."""
+        unique_name = matched_part.strip('/')
+        if unique_name not in self._seen_branches:
+            self._seen_branches.add(unique_name)
+            if self.seen_new_branch_hook:
+                self.seen_new_branch_hook(unique_name)
+
     def _getMatchedPart(self, path, transport_tuple):
         """Return the part of 'path' that the endpoint actually matched."""
         trailing_length = len(transport_tuple[2])
@@ -76,27 +187,17 @@ class BranchFileSystemClient:
         (transport_type, data, trailing_path) = transport_tuple
         matched_part = self._getMatchedPart(path, transport_tuple)
         if transport_type == BRANCH_TRANSPORT:
-            if self.seen_new_branch_hook:
-                self.seen_new_branch_hook(matched_part.strip('/'))
-            self._cache[matched_part] = (transport_type, data, self._now())
+            self._seeBranch(matched_part)
+            self._cache.add(self._user_id, matched_part, transport_type, data)
         return transport_tuple
 
     def _getFromCache(self, path):
         """Get the cached 'transport_tuple' for 'path'."""
-        split_path = path.strip('/').split('/')
-        for object_path, value in self._cache.iteritems():
-            transport_type, data, inserted_time = value
-            split_object_path = object_path.strip('/').split('/')
-            # Do a segment-by-segment comparison. Python sucks, lists should
-            # also have startswith.
-            if split_path[:len(split_object_path)] == split_object_path:
-                if (self.expiry_time is not None
-                    and self._now() > inserted_time + self.expiry_time):
-                    del self._cache[object_path]
-                    break
-                trailing_path = '/'.join(split_path[len(split_object_path):])
-                return (transport_type, data, trailing_path)
-        raise NotInCache(path)
+        transport_type, data, trailing_path, matched_part = self._cache.get(
+            self._user_id, path)
+        # The entry may have been added by another client sharing the cache.
+        self._seeBranch(matched_part)
+        return (transport_type, data, trailing_path)
 
     def createBranch(self, branch_path):
         """Create a Launchpad `IBranch` in the database.
@@ -117,6 +218,9 @@ class BranchFileSystemClient:
 
         :param branch_id: The database ID of the branch.
         """
+        # The branch's stacking or format may have changed, so don't trust
+        # anyone's cached translations of it any more.
+        self._cache.invalidateBranch(branch_id)
         return self._codehosting_endpoint.callRemote(
             'branchChanged', self._user_id, branch_id, stacked_on_url,
             last_revision_id, control_string, branch_string,
@@ -16,6 +16,7 @@ from lp.codehosting.inmemory import (
 from lp.codehosting.vfs.branchfsclient import (
     BranchFileSystemClient,
     NotInCache,
+    TranslationCache,
     )
 from lp.testing import (
     FakeTime,
@@ -41,14 +42,23 @@ class TestBranchFileSystemClient(TestCase):
         """
         self.fake_time.advance(amount)
 
-    def makeClient(self, expiry_time=None, seen_new_branch_hook=None):
+    def makeClient(self, expiry_time=None, seen_new_branch_hook=None,
+                   translation_cache=None, user=None):
         """Make a `BranchFileSystemClient`.
 
         The created client interacts with the InMemoryFrontend.
         """
+        if user is None:
+            user = self.user
         return BranchFileSystemClient(
-            self._xmlrpc_client, self.user.id, expiry_time=expiry_time,
+            self._xmlrpc_client, user.id, expiry_time=expiry_time,
             seen_new_branch_hook=seen_new_branch_hook,
+            translation_cache=translation_cache, _now=self.fake_time.now)
+
+    def makeTranslationCache(self, expiry_time=None, max_entries=None):
+        """Make a `TranslationCache` that uses our fake time."""
+        return TranslationCache(
+            expiry_time=expiry_time, max_entries=max_entries,
             _now=self.fake_time.now)
 
     def test_translatePath(self):
@@ -254,3 +264,98 @@ class TestBranchFileSystemClient(TestCase):
         client.translatePath('/' + branch1.unique_name + '/different')
         self.assertEqual(
             [branch1.unique_name, branch2.unique_name], seen_branches)
+
+    def test_shared_cache(self):
+        # Clients for the same user that share a TranslationCache see each
+        # other's translations.
+        branch = self.factory.makeAnyBranch()
+        cache = self.makeTranslationCache()
+        client1 = self.makeClient(translation_cache=cache)
+        client2 = self.makeClient(translation_cache=cache)
+        fake_data = self.factory.getUniqueString()
+        client1._addToCache(
+            (BRANCH_TRANSPORT, fake_data, ''), '/%s' % branch.unique_name)
+        self.assertEqual(
+            (BRANCH_TRANSPORT, fake_data, 'foo'),
+            client2._getFromCache('/%s/foo' % branch.unique_name))
+
+    def test_shared_cache_is_per_user(self):
+        # Translations depend on the user making the request, so a shared
+        # cache never hands one user's translations to another.
+        branch = self.factory.makeAnyBranch()
+        cache = self.makeTranslationCache()
+        client1 = self.makeClient(translation_cache=cache)
+        client2 = self.makeClient(
+            translation_cache=cache, user=self.factory.makePerson())
+        client1._addToCache(
+            (BRANCH_TRANSPORT, self.factory.getUniqueString(), ''),
+            '/%s' % branch.unique_name)
+        self.assertRaises(
+            NotInCache, client2._getFromCache, '/%s' % branch.unique_name)
+
+    def test_shared_cache_expiry_time(self):
+        # A shared cache applies its own expiry time.
+        branch = self.factory.makeAnyBranch()
+        cache = self.makeTranslationCache(expiry_time=2.0)
+        client = self.makeClient(translation_cache=cache)
+        client._addToCache(
+            (BRANCH_TRANSPORT, self.factory.getUniqueString(), ''),
+            '/%s' % branch.unique_name)
+        self.advanceTime(4.0)
+        self.assertRaises(
+            NotInCache, client._getFromCache, '/%s' % branch.unique_name)
+
+    def test_shared_cache_and_expiry_time(self):
+        # It makes no sense to pass both an expiry time and a shared cache.
+        self.assertRaises(
+            AssertionError, self.makeClient, expiry_time=2.0,
+            translation_cache=self.makeTranslationCache())
+
+    def test_shared_cache_max_entries(self):
+        # Once a cache grows beyond its maximum size, the oldest entries are
+        # discarded.
+        branch1 = self.factory.makeAnyBranch()
+        branch2 = self.factory.makeAnyBranch()
+        cache = self.makeTranslationCache(max_entries=1)
+        client = self.makeClient(translation_cache=cache)
+        client._addToCache(
+            (BRANCH_TRANSPORT, self.factory.getUniqueString(), ''),
+            '/%s' % branch1.unique_name)
+        self.advanceTime(1.0)
+        client._addToCache(
+            (BRANCH_TRANSPORT, self.factory.getUniqueString(), ''),
+            '/%s' % branch2.unique_name)
+        self.assertRaises(
+            NotInCache, client._getFromCache, '/%s' % branch1.unique_name)
+        client._getFromCache('/%s' % branch2.unique_name)
+
+    @defer.inlineCallbacks
+    def test_branchChanged_invalidates_cache(self):
+        # branchChanged discards all users' cached translations of the
+        # branch.
+        branch = self.factory.makeAnyBranch(owner=self.user)
+        cache = self.makeTranslationCache()
+        client = self.makeClient(translation_cache=cache)
+        other_client = self.makeClient(
+            translation_cache=cache, user=self.factory.makePerson())
+        yield client.translatePath('/' + branch.unique_name)
+        yield other_client.translatePath('/' + branch.unique_name)
+        yield client.branchChanged(branch.id, '', '', '', '', '')
+        self.assertRaises(
+            NotInCache, client._getFromCache, '/' + branch.unique_name)
+        self.assertRaises(
+            NotInCache, other_client._getFromCache, '/' + branch.unique_name)
+
+    def test_seen_new_branch_hook_called_for_shared_cache_hit(self):
+        # A client calls its seen_new_branch_hook for a branch even if
+        # another client added the branch's translation to a shared cache.
+        branch = self.factory.makeAnyBranch()
+        cache = self.makeTranslationCache()
+        self.makeClient(translation_cache=cache).translatePath(
+            '/' + branch.unique_name)
+        seen_branches = []
+        client = self.makeClient(
+            seen_new_branch_hook=seen_branches.append,
+            translation_cache=cache)
+        client.translatePath('/' + branch.unique_name + '/trailing')
+        self.assertEqual([branch.unique_name], seen_branches)
@@ -9,12 +9,18 @@ from datetime import datetime
 
 from lxml import html
 from pytz import utc
+from zope.component import getUtility
 
+from lp.registry.browser.product import ProductOverviewMenu
+from lp.registry.interfaces.announcement import IAnnouncementSet
 from lp.testing import (
     normalize_whitespace,
+    person_logged_in,
+    record_two_runs,
     TestCaseWithFactory,
     )
 from lp.testing.layers import LaunchpadFunctionalLayer
+from lp.testing.matchers import HasQueryCount
 from lp.testing.views import create_initialized_view
 
 
@@ -45,3 +51,41 @@ class TestAnnouncement(TestCaseWithFactory):
         self.assertEqual(
             "Written for Foo by Bar Baz on 2007-01-12",
             normalize_whitespace(reg_para.text_content()))
+
+    def test_announcement_listing_query_count(self):
+        # The targets of all listed announcements are loaded together.
+        announcer = self.factory.makePerson()
+        announced = datetime(2007, 1, 12, tzinfo=utc)
+
+        def make_announcement():
+            self.factory.makeProduct().announce(
+                announcer, "Hello World", publication_date=announced)
+
+        def render_listing():
+            view = create_initialized_view(
+                getUtility(IAnnouncementSet), "+announcements")
+            view()
+
+        recorder1, recorder2 = record_two_runs(
+            render_listing, make_announcement, 2)
+        self.assertThat(recorder2, HasQueryCount.byEquality(recorder1))
+
+    def test_overview_menu_announcements_link(self):
+        # The overview menu only links to announcements if there are any.
+        product = self.factory.makeProduct()
+        self.assertFalse(ProductOverviewMenu(product).announcements().enabled)
+        product.announce(
+            self.factory.makePerson(), "Hello World",
+            publication_date=datetime(2007, 1, 12, tzinfo=utc))
+        self.assertTrue(ProductOverviewMenu(product).announcements().enabled)
+
+    def test_retarget_updates_cached_target(self):
+        product = self.factory.makeProduct()
+        announcement = product.announce(
+            self.factory.makePerson(), "Hello World",
+            publication_date=datetime(2007, 1, 12, tzinfo=utc))
+        self.assertEqual(product, announcement.target)
+        other_product = self.factory.makeProduct()
+        with person_logged_in(product.owner):
+            announcement.retarget(other_product)
+        self.assertEqual(other_product, announcement.target)
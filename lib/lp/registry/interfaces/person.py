@@ -1273,7 +1273,7 @@ class IPersonViewRestricted(IHasBranches, IHasSpecifications,
         """
 
     def clearInTeamCache():
-        """Clears the person's inTeam cache.
+        """Clears the person's inTeam and team participation caches.
 
         To be used when membership changes are enacted. Only meant to be
         used between TeamMembership and Person objects.
@@ -27,12 +27,21 @@ from lp.registry.interfaces.distribution import IDistribution
 from lp.registry.interfaces.person import validate_public_person
 from lp.registry.interfaces.product import IProduct
 from lp.registry.interfaces.projectgroup import IProjectGroup
+from lp.services.database.bulk import (
+    enqueue_related,
+    get_batch_loader,
+    )
 from lp.services.database.constants import UTC_NOW
 from lp.services.database.datetimecol import UtcDateTimeCol
+from lp.services.database.decoratedresultset import DecoratedResultSet
 from lp.services.database.sqlbase import (
     SQLBase,
     sqlvalues,
     )
+from lp.services.propertycache import (
+    cachedproperty,
+    get_property_cache,
+    )
 from lp.services.utils import utc_now
 
 
@@ -72,14 +81,23 @@ class Announcement(SQLBase):
             self.url = url
             self.date_last_modified = UTC_NOW
 
-    @property
+    @cachedproperty
     def target(self):
-        if self.product is not None:
-            return self.product
-        elif self.projectgroup is not None:
-            return self.projectgroup
-        elif self.distribution is not None:
-            return self.distribution
+        # Avoid circular imports.
+        from lp.registry.model.distribution import Distribution
+        from lp.registry.model.product import Product
+        from lp.registry.model.projectgroup import ProjectGroup
+
+        # Listings show the target of every announcement, so fetch it
+        # through the batch loader to load all of them at once, and keep
+        # it in the property cache.
+        loader = get_batch_loader()
+        if self.productID is not None:
+            return loader.get(Product, self.productID)
+        elif self.projectgroupID is not None:
+            return loader.get(ProjectGroup, self.projectgroupID)
+        elif self.distributionID is not None:
+            return loader.get(Distribution, self.distributionID)
         else:
             raise AssertionError('Announcement has no obvious target')
 
@@ -105,6 +123,7 @@ class Announcement(SQLBase):
             self.product = None
         else:
             raise AssertionError('Unknown target')
+        del get_property_cache(self).target
         self.date_last_modified = UTC_NOW
 
     def retract(self):
@@ -133,6 +152,18 @@ class Announcement(SQLBase):
         return not self.future
 
 
+def _enqueue_announcement_targets(announcements):
+    """Enqueue the targets of announcements with the batch loader."""
+    # Avoid circular imports.
+    from lp.registry.model.distribution import Distribution
+    from lp.registry.model.product import Product
+    from lp.registry.model.projectgroup import ProjectGroup
+
+    enqueue_related(Product, announcements, ['productID'])
+    enqueue_related(ProjectGroup, announcements, ['projectgroupID'])
+    enqueue_related(Distribution, announcements, ['distributionID'])
+
+
 class HasAnnouncements:
     """A mixin class for pillars that can have announcements."""
 
@@ -182,7 +213,9 @@ class HasAnnouncements:
             pass
         else:
             raise AssertionError('Unsupported announcement target')
-        return Announcement.select(query, limit=limit)
+        return DecoratedResultSet(
+            Announcement.select(query, limit=limit),
+            pre_iter_hook=_enqueue_announcement_targets)
 
 
 class MakesAnnouncements(HasAnnouncements):
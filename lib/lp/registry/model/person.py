@@ -1417,6 +1417,7 @@ class Person(
     def clearInTeamCache(self):
         """See `IPerson`."""
         self._inTeam_cache = {}
+        del get_property_cache(self)._participated_team_ids
 
     def __storm_invalidated__(self):
         super(Person, self).__storm_invalidated__()
@@ -1710,7 +1711,7 @@ class Person(
         tm = Store.of(self).find(TeamMembership, constraints).one()
         if tm is not None:
             # Flush the cache used by the inTeam method.
-            self._inTeam_cache = {}
+            self.clearInTeamCache()
             new_status = active_and_transitioning[tm.status]
             tm.setStatus(new_status, user, comment=comment)
 
@@ -4,6 +4,7 @@
 __metaclass__ = type
 __all__ = [
     'find_team_participations',
+    'get_participated_team_ids',
     'TeamMembership',
     'TeamMembershipSet',
     'TeamParticipation',
@@ -62,6 +63,7 @@ from lp.services.database.sqlbase import (
     SQLBase,
     sqlvalues,
     )
+from lp.services.propertycache import get_property_cache
 
 
 @implementer(ITeamMembership)
@@ -501,6 +503,28 @@ def _fillTeamParticipation(member, accepting_team):
     store.execute(query)
 
 
+def get_participated_team_ids(person):
+    """Return the IDs of the teams `person` participates in, and its own.
+
+    The result is cached on the person until its team membership changes
+    (see `IPerson.clearInTeamCache`) or the transaction ends, so that
+    privacy filters can embed it as a constant instead of querying
+    TeamParticipation in every statement.
+
+    :return: A sorted tuple of Person IDs.
+    """
+    cache = get_property_cache(person)
+    try:
+        return cache._participated_team_ids
+    except AttributeError:
+        pass
+    team_ids = tuple(sorted(IStore(TeamParticipation).find(
+        TeamParticipation.teamID,
+        TeamParticipation.personID == person.id)))
+    cache._participated_team_ids = team_ids
+    return team_ids
+
+
 def find_team_participations(people, teams=None):
     """Find the teams the given people participate in.
 
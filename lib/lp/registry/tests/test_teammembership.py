@@ -43,6 +43,7 @@ from lp.registry.interfaces.teammembership import (
     )
 from lp.registry.model.teammembership import (
     find_team_participations,
+    get_participated_team_ids,
     TeamMembership,
     TeamParticipation,
     )
@@ -339,6 +340,21 @@ class TestTeamParticipationQuery(TeamParticipationTestCase):
         self.assertContentEqual([self.foo_bar], people_teams.keys())
         self.assertContentEqual([self.foo_bar], people_teams[self.foo_bar])
 
+    def test_get_participated_team_ids(self):
+        # The IDs are cached until the person's membership changes.
+        person = self.factory.makePerson()
+        self.team1.addMember(person, self.foo_bar)
+        self.assertEqual(
+            tuple(sorted([person.id, self.team1.id])),
+            get_participated_team_ids(person))
+        with StormStatementRecorder() as recorder:
+            get_participated_team_ids(person)
+        self.assertThat(recorder, HasQueryCount(Equals(0)))
+        self.team2.addMember(person, self.foo_bar)
+        self.assertEqual(
+            tuple(sorted([person.id, self.team1.id, self.team2.id])),
+            get_participated_team_ids(person))
+
 
 class TestTeamParticipationHierarchy(TeamParticipationTestCase):
     """Participation management tests using 5 nested teams.
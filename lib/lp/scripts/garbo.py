@@ -9,7 +9,9 @@ __all__ = [
     'FrequentDatabaseGarbageCollector',
     'HourlyDatabaseGarbageCollector',
     'load_garbo_job_state',
+    'load_garbo_task_statistics',
     'save_garbo_job_state',
+    'save_garbo_task_statistics',
     ]
 
 from datetime import (
@@ -172,6 +174,18 @@ def save_garbo_job_state(job_name, job_data):
         "VALUES (?, ?)", params=(unicode(job_name), unicode(json_data)))
 
 
+# The statistics from each garbo task's last run are kept alongside job
+# state, and used to schedule the task's next run.
+def load_garbo_task_statistics(loop_name):
+    # Load the statistics from the given task's last run.
+    return load_garbo_job_state('%s:statistics' % loop_name)
+
+
+def save_garbo_task_statistics(loop_name, statistics):
+    # Save the statistics from a run of the given task.
+    save_garbo_job_state('%s:statistics' % loop_name, statistics)
+
+
 class BulkPruner(TunableLoop):
     """A abstract ITunableLoop base class for simple pruners.
 
@@ -208,7 +222,10 @@ class BulkPruner(TunableLoop):
 
     # An SQL query returning a list of ids to remove from target_table.
     # The query must return a single column named 'id' and should not
-    # contain duplicates. Must be overridden.
+    # contain duplicates. Must be overridden.  If `partitions` is greater
+    # than 1, the query must limit the ids it returns to those with a
+    # remainder of %(partition)d when divided by %(partitions)d, so that
+    # each partition only reads its own share of the rows.
     ids_to_prune_query = None
 
     # See `TunableLoop`. May be overridden.
@@ -223,8 +240,11 @@ class BulkPruner(TunableLoop):
 
     _unique_counter = 0
 
-    def __init__(self, log, abort_time=None):
+    def __init__(self, log, abort_time=None, partition=None):
         super(BulkPruner, self).__init__(log, abort_time)
+        if self.partitions > 1 and partition is None:
+            # The partitions do all the work; see makePartition.
+            return
 
         self.store = self.getStore()
         self.target_table_name = self.target_table_class.__storm_table__
@@ -234,10 +254,27 @@ class BulkPruner(TunableLoop):
             'bulkprunerid_%s_%d'
             % (self.__class__.__name__, self._unique_counter)).lower()
 
+        ids_to_prune_query = self.ids_to_prune_query
+        if partition is not None:
+            assert self.target_table_key_type == 'id integer', (
+                "Only integer keys can be partitioned.")
+            ids_to_prune_query = ids_to_prune_query % {
+                'partition': partition, 'partitions': self.partitions}
+
         # Open the cursor.
         self.store.execute(
             "DECLARE %s NO SCROLL CURSOR WITH HOLD FOR %s"
-            % (self.cursor_name, self.ids_to_prune_query))
+            % (self.cursor_name, ids_to_prune_query))
+
+    def makePartition(self, partition):
+        """See `TunableLoop`.
+
+        Partitions are by key modulo `partitions`, rather than by key
+        range, since the oldest rows, which are usually the ones being
+        pruned, tend to be clustered at one end of the key range.
+        """
+        return self.__class__(
+            self.log, abort_time=self.abort_time, partition=partition)
 
     _num_removed = None
 
@@ -1166,10 +1203,12 @@ class BugNotificationPruner(BulkPruner):
     keep 30 days worth or records to help diagnose email delivery issues.
     """
     target_table_class = BugNotification
+    partitions = 4
     ids_to_prune_query = """
         SELECT BugNotification.id FROM BugNotification
         WHERE date_emailed < CURRENT_TIMESTAMP AT TIME ZONE 'UTC'
             - CAST('30 days' AS interval)
+            AND mod(BugNotification.id, %(partitions)d) = %(partition)d
         """
 
 
@@ -1328,10 +1367,18 @@ class BugHeatUpdater(TunableLoop):
         # Storm Bug #820290.
         outdated_bug_ids = [bug.id for bug in outdated_bugs]
         self.log.debug("Updating heat for %s bugs", len(outdated_bug_ids))
-        IMasterStore(Bug).find(
-            Bug, Bug.id.is_in(outdated_bug_ids)).set(
-                heat=SQL('calculate_bug_heat(Bug.id)'),
-                heat_last_updated=UTC_NOW)
+        if outdated_bug_ids:
+            # calculate_bug_heat(integer[]) gathers the counts for the
+            # whole chunk in grouped queries, rather than once per bug.
+            IMasterStore(Bug).execute(BulkUpdate(
+                {Bug._heat: SQL('bug_heat.heat'),
+                 Bug.heat_last_updated: UTC_NOW},
+                table=Bug,
+                values=SQL(
+                    'calculate_bug_heat(ARRAY[%s]::integer[]) AS bug_heat'
+                    % ', '.join(
+                        str(int(bug_id)) for bug_id in outdated_bug_ids)),
+                where=Bug.id == SQL('bug_heat.bug')))
         transaction.commit()
 
 
@@ -1621,6 +1668,10 @@ class BaseDatabaseGarbageCollector(LaunchpadCronScript):
     # Default run time of the script in seconds. Override.
     default_abort_script_time = None
 
+    # TunableLoops from a less frequent script that should also be run by
+    # this one if they did not finish on their last run. May be overridden.
+    backlog_tunable_loops = []
+
     # _maximum_chunk_size is used to override the defined
     # maximum_chunk_size to allow our tests to ensure multiple calls to
     # __call__ are required without creating huge amounts of test data.
@@ -1662,6 +1713,7 @@ class BaseDatabaseGarbageCollector(LaunchpadCronScript):
         tunable_loops = list(self.tunable_loops)
         if self.options.experimental:
             tunable_loops.extend(self.experimental_tunable_loops)
+        tunable_loops = self.schedule_tunable_loops(tunable_loops)
 
         threads = set()
         for count in range(0, self.options.threads):
@@ -1695,6 +1747,44 @@ class BaseDatabaseGarbageCollector(LaunchpadCronScript):
             self.logger.error("%d tasks failed.", self.failure_count)
             raise SilentLaunchpadScriptFailure(self.failure_count)
 
+    def schedule_tunable_loops(self, tunable_loops):
+        """Order tasks using the statistics from their previous runs.
+
+        Tasks that did not finish on their last run go first, followed by
+        those that took longest, so that the biggest backlogs get the most
+        time and long tasks are not started just before the script times
+        out.  Tasks from `backlog_tunable_loops` that did not finish on
+        their last run are run too.
+
+        :return: The list of tasks to run.
+        """
+        self.task_statistics = {}
+        for tunable_loop_class in (
+                set(tunable_loops) | set(self.backlog_tunable_loops)):
+            self.task_statistics[tunable_loop_class] = (
+                load_garbo_task_statistics(tunable_loop_class.__name__))
+        transaction.abort()
+
+        def has_backlog(tunable_loop_class):
+            statistics = self.task_statistics[tunable_loop_class]
+            return statistics is not None and not statistics['finished']
+
+        for tunable_loop_class in self.backlog_tunable_loops:
+            if (tunable_loop_class not in tunable_loops
+                    and has_backlog(tunable_loop_class)):
+                self.logger.info(
+                    "Also running %s, which did not finish on its last run.",
+                    tunable_loop_class.__name__)
+                tunable_loops.append(tunable_loop_class)
+
+        def backlog_key(tunable_loop_class):
+            statistics = self.task_statistics[tunable_loop_class]
+            if statistics is None:
+                return (True, 0)
+            return (statistics['finished'], -statistics['seconds'])
+
+        return sorted(tunable_loops, key=backlog_key)
+
     def get_remaining_script_time(self):
         return self.start_time + self.script_timeout - time.time()
 
@@ -1809,6 +1899,11 @@ class BaseDatabaseGarbageCollector(LaunchpadCronScript):
                 tunable_loop = tunable_loop_class(
                     abort_time=abort_time, log=loop_logger)
 
+                # Start from the chunk size that the last run converged on.
+                statistics = self.task_statistics.get(tunable_loop_class)
+                if statistics is not None:
+                    tunable_loop.initial_chunk_size = statistics['chunk_size']
+
                 # Allow the test suite to override the chunk size.
                 if self._maximum_chunk_size is not None:
                     tunable_loop.maximum_chunk_size = (
@@ -1818,6 +1913,17 @@ class BaseDatabaseGarbageCollector(LaunchpadCronScript):
                     tunable_loop.run()
                     loop_logger.debug(
                         "%s completed sucessfully.", loop_name)
+                    statistics = tunable_loop.statistics
+                    if statistics is not None:
+                        loop_logger.info(
+                            "Processed %d items in %d iterations and "
+                            "%.1f seconds; final chunk size %.1f; %s.",
+                            statistics['items'], statistics['iterations'],
+                            statistics['seconds'], statistics['chunk_size'],
+                            "finished" if statistics['finished']
+                            else "not finished")
+                        save_garbo_task_statistics(loop_name, statistics)
+                        transaction.commit()
                 except Exception:
                     loop_logger.exception("Unhandled exception")
                     self.failure_count += 1
@@ -1872,6 +1978,11 @@ class HourlyDatabaseGarbageCollector(BaseDatabaseGarbageCollector):
     # fully terminated before the next scheduled hourly run kicks in.
     default_abort_script_time = 60 * 55
 
+    # Daily tasks that can't keep up get extra runs here.
+    @property
+    def backlog_tunable_loops(self):
+        return DailyDatabaseGarbageCollector.tunable_loops
+
 
 class DailyDatabaseGarbageCollector(BaseDatabaseGarbageCollector):
     """Run every day.
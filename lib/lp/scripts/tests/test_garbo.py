@@ -80,15 +80,21 @@ from lp.registry.model.commercialsubscription import CommercialSubscription
 from lp.registry.model.teammembership import TeamMembership
 from lp.scripts.garbo import (
     AntiqueSessionPruner,
+    BugHeatUpdater,
+    BugNotificationPruner,
     BulkPruner,
     DailyDatabaseGarbageCollector,
+    DiffPruner,
     DuplicateSessionPruner,
     FrequentDatabaseGarbageCollector,
     HourlyDatabaseGarbageCollector,
     load_garbo_job_state,
+    load_garbo_task_statistics,
     LoginTokenPruner,
     OpenIDConsumerAssociationPruner,
+    RevisionCachePruner,
     save_garbo_job_state,
+    save_garbo_task_statistics,
     UnusedPOTMsgSetPruner,
     UnusedSessionPruner,
     )
@@ -185,6 +191,14 @@ class BulkFooPruner(BulkPruner):
     maximum_chunk_size = 2
 
 
+class PartitionedBulkFooPruner(BulkFooPruner):
+    ids_to_prune_query = """
+        SELECT id FROM BulkFoo
+        WHERE id < 5 AND mod(id, %(partitions)d) = %(partition)d
+        """
+    partitions = 2
+
+
 class TestBulkPruner(TestCase):
     layer = ZopelessDatabaseLayer
 
@@ -254,6 +268,20 @@ class TestBulkPruner(TestCase):
         while not pruner.isDone():
             pruner(chunk_size)
 
+    def test_bulkpruner_partition(self):
+        # Each partition of a partitioned pruner only removes its own
+        # share of the targetted rows.
+        ids_to_prune = [
+            foo.id for foo in self.store.find(BulkFoo, BulkFoo.id < 5)]
+        pruner = PartitionedBulkFooPruner(self.log).makePartition(1)
+        while not pruner.isDone():
+            pruner(1000000)
+        pruner.cleanUp()
+        transaction.abort()
+        self.assertContentEqual(
+            [id for id in ids_to_prune if id % 2 == 0],
+            [foo.id for foo in self.store.find(BulkFoo, BulkFoo.id < 5)])
+
 
 class TestSessionPruner(TestCase):
     layer = ZopelessDatabaseLayer
@@ -461,6 +489,58 @@ class TestGarbo(FakeAdapterMixin, TestCaseWithFactory):
         data = load_garbo_job_state('job')
         self.assertEqual({'data': 2}, data)
 
+    def test_task_statistics_saved(self):
+        # Each task's run statistics are saved for the next run.
+        self.runFrequently()
+        switch_dbuser('testadmin')
+        statistics = load_garbo_task_statistics('OpenIDConsumerNoncePruner')
+        self.assertTrue(statistics['finished'])
+        self.assertContentEqual(
+            ['items', 'iterations', 'seconds', 'chunk_size', 'finished'],
+            statistics)
+
+    def makeStatistics(self, finished=True, seconds=1.0, chunk_size=10.0):
+        return {
+            'items': 100, 'iterations': 10, 'seconds': seconds,
+            'chunk_size': chunk_size, 'finished': finished,
+            }
+
+    def test_schedule_tunable_loops(self):
+        # Tasks that didn't finish last time run first, then the ones that
+        # took longest.  Tasks without statistics keep their order.
+        save_garbo_task_statistics(
+            'DuplicateSessionPruner', self.makeStatistics(seconds=10.0))
+        save_garbo_task_statistics(
+            'RevisionCachePruner', self.makeStatistics(finished=False))
+        save_garbo_task_statistics(
+            'UnusedSessionPruner', self.makeStatistics(seconds=20.0))
+        switch_dbuser('garbo_hourly')
+        collector = HourlyDatabaseGarbageCollector(test_args=[])
+        collector.logger = self.log
+        self.assertEqual(
+            [RevisionCachePruner, UnusedSessionPruner,
+             DuplicateSessionPruner, BugHeatUpdater],
+            collector.schedule_tunable_loops([
+                BugHeatUpdater, DuplicateSessionPruner, RevisionCachePruner,
+                UnusedSessionPruner]))
+
+    def test_schedule_tunable_loops_backlog(self):
+        # The hourly garbo also runs daily tasks that didn't finish on
+        # their last run.
+        save_garbo_task_statistics(
+            'BugNotificationPruner', self.makeStatistics(finished=False))
+        save_garbo_task_statistics(
+            'DiffPruner', self.makeStatistics(finished=True))
+        switch_dbuser('garbo_hourly')
+        collector = HourlyDatabaseGarbageCollector(test_args=[])
+        collector.logger = self.log
+        tunable_loops = collector.schedule_tunable_loops(
+            list(collector.tunable_loops))
+        self.assertIn(BugNotificationPruner, tunable_loops)
+        self.assertNotIn(DiffPruner, tunable_loops)
+        self.assertEqual(
+            len(collector.tunable_loops) + 1, len(tunable_loops))
+
     def test_OpenIDConsumerNoncePruner(self):
         now = int(time.mktime(time.gmtime()))
         MINUTES = 60
@@ -1259,6 +1339,8 @@ class TestGarbo(FakeAdapterMixin, TestCaseWithFactory):
         # each worker.
         switch_dbuser('testadmin')
         bug = self.factory.makeBug()
+        # Apply the heat update for the new bug before backdating it.
+        transaction.commit()
         now = datetime.now(UTC)
         cutoff = now - timedelta(days=1)
         old_update = now - timedelta(days=2)
@@ -5,8 +5,11 @@
 
 __metaclass__ = type
 __all__ = [
+    'BatchLoader',
     'create',
     'dbify_value',
+    'enqueue_related',
+    'get_batch_loader',
     'load',
     'load_referencing',
     'load_related',
@@ -25,6 +28,7 @@ from operator import (
     itemgetter,
     )
 
+from lazr.restful.utils import get_current_browser_request
 from storm.databases.postgres import Returning
 from storm.expr import (
     And,
@@ -41,6 +45,7 @@ from storm.store import Store
 from zope.security.proxy import removeSecurityProxy
 
 from lp.services.database.interfaces import IStore
+from lp.services.timeline.requesttimeline import get_request_timeline
 
 
 def collate(things, key):
@@ -199,6 +204,107 @@ def load_related(object_type, owning_objects, foreign_keys):
     return load(object_type, keys)
 
 
+class BatchLoader:
+    """Coalesce primary key loads into one query per class.
+
+    Code that is likely to need some objects later calls `enqueue` with
+    their primary keys, which is free.  The first `get` of an object of a
+    given class then loads every enqueued object of that class with a
+    single query.
+    """
+
+    def __init__(self):
+        self._pending = defaultdict(set)
+        self._loaded = {}
+        self.queries = 0
+        self.coalesced = 0
+
+    def enqueue(self, object_type, primary_keys):
+        """Note that objects with these primary keys will be wanted."""
+        loaded = self._loaded
+        pending = self._pending[object_type]
+        for primary_key in primary_keys:
+            if (primary_key is not None and
+                    (object_type, primary_key) not in loaded):
+                pending.add(primary_key)
+
+    def flush(self, object_type):
+        """Load all enqueued objects of `object_type`."""
+        primary_keys = self._pending.pop(object_type, None)
+        if not primary_keys:
+            return
+        if len(primary_keys) == 1:
+            # Nothing to coalesce, so let Storm use its cache if it can.
+            [key] = primary_keys
+            self._loaded[(object_type, key)] = IStore(object_type).get(
+                object_type, key)
+            return
+        primary_key = _primary_key(object_type)
+        timeline = get_request_timeline(get_current_browser_request())
+        action = timeline.start(
+            "batch-load",
+            "%s: %d keys, %d coalesced" % (
+                object_type.__name__, len(primary_keys),
+                len(primary_keys) - 1))
+        try:
+            objects = load(object_type, primary_keys)
+        finally:
+            action.finish()
+        for obj in objects:
+            self._loaded[(object_type, primary_key.__get__(obj))] = obj
+        # Keys that matched no row are remembered too, so that looking
+        # them up again doesn't cost another query.
+        for key in primary_keys:
+            self._loaded.setdefault((object_type, key), None)
+        self.queries += 1
+        self.coalesced += len(primary_keys) - 1
+
+    def get(self, object_type, primary_key):
+        """Return an object, loading it with any others that are enqueued.
+
+        :return: The object, or None if there is no such object.
+        """
+        if primary_key is None:
+            return None
+        try:
+            return self._loaded[(object_type, primary_key)]
+        except KeyError:
+            pass
+        self._pending[object_type].add(primary_key)
+        self.flush(object_type)
+        return self._loaded[(object_type, primary_key)]
+
+
+def get_batch_loader():
+    """Return the `BatchLoader` for the current request.
+
+    Outside a request, a new loader is returned each time, so loads are
+    still correct but are only coalesced within a single loader.
+    """
+    request = get_current_browser_request()
+    if request is None:
+        return BatchLoader()
+    return request.annotations.setdefault(
+        'launchpad.batch_loader', BatchLoader())
+
+
+def enqueue_related(object_type, owning_objects, foreign_keys):
+    """Enqueue objects of object_type referred to by owning_objects.
+
+    This is a lazy form of `load_related`: nothing is loaded until one
+    of the objects is fetched from the request's `BatchLoader`.
+
+    :param object_type: The object type to enqueue - e.g. Person.
+    :param owning_objects: The objects holding the references. E.g. Bug.
+    :param foreign_keys: A list of attributes that should be inspected for
+        keys. e.g. ['ownerID']
+    """
+    keys = set()
+    for owning_object in owning_objects:
+        keys.update(map(partial(getattr, owning_object), foreign_keys))
+    get_batch_loader().enqueue(object_type, keys)
+
+
 def dbify_value(col, val):
     """Convert a value into a form that Storm can compile directly."""
     if isinstance(val, SQL):
@@ -6,7 +6,13 @@ __all__ = [
     'DecoratedResultSet',
     ]
 
+from itertools import (
+    count,
+    islice,
+    )
+
 from lazr.delegates import delegate_to
+from psycopg2.extensions import TRANSACTION_STATUS_INTRANS
 from storm import Undef
 from storm.zope.interfaces import IResultSet
 from zope.security.proxy import (
@@ -15,6 +21,52 @@ from zope.security.proxy import (
     removeSecurityProxy,
     )
 
+from lp.services.database.sqlbase import convert_storm_clause_to_string
+
+
+# Numbers server-side cursors so that streams in one transaction don't
+# collide.
+_cursor_numbers = count()
+
+
+def iter_result_set_chunks(result_set, chunk_size):
+    """Iterate over a Storm result set in lists of at most `chunk_size`.
+
+    The rows are read through a server-side cursor, so only one chunk
+    is held in memory at a time.  The cursor lives until the end of the
+    transaction, so the caller must not commit or abort until iteration
+    has finished.  It is closed when iteration finishes or the iterator
+    is discarded, if the transaction that declared it is still open.
+    """
+    naked_result_set = removeSecurityProxy(result_set)
+    store = naked_result_set._store
+    cursor_name = 'lp_stream_%d' % next(_cursor_numbers)
+    store.execute('DECLARE %s NO SCROLL CURSOR FOR %s' % (
+        cursor_name,
+        convert_storm_clause_to_string(naked_result_set._get_select())))
+    try:
+        while True:
+            result = store.execute(
+                'FETCH FORWARD %d FROM %s' % (chunk_size, cursor_name))
+            rows = [
+                naked_result_set._load_objects(result, values)
+                for values in result]
+            if not rows:
+                break
+            yield rows
+    finally:
+        # The cursor is gone if the transaction has ended, and can't be
+        # closed if it has failed.
+        raw_connection = store._connection._raw_connection
+        in_transaction = (
+            raw_connection is not None and
+            raw_connection.get_transaction_status() ==
+                TRANSACTION_STATUS_INTRANS)
+        if in_transaction and store.execute(
+                "SELECT 1 FROM pg_cursors WHERE name = '%s'" % cursor_name
+                ).get_one() is not None:
+            store.execute('CLOSE %s' % cursor_name)
+
 
 @delegate_to(IResultSet, context='result_set')
 class DecoratedResultSet(object):
@@ -148,11 +200,18 @@ class DecoratedResultSet(object):
         """
         # Execute/evaluate the result set query.
         results = list(self.result_set.__iter__(*args, **kwargs))
+        start = 0
         if self.slice_info:
-            # Calculate slice data
             start = self.result_set._offset
             if start is Undef:
                 start = 0
+        for value in self._decorate_results(results, start):
+            yield value
+
+    def _decorate_results(self, results, start):
+        """Decorate `results`, a list of rows starting at index `start`."""
+        if self.slice_info:
+            # Calculate slice data
             stop = start + len(results)
             result_slice = slice(start, stop)
         if self.bulk_decorator is not None:
@@ -178,6 +237,45 @@ class DecoratedResultSet(object):
                 for value in results:
                     yield self.decorate_single(value)
 
+    def _iter_chunks(self, chunk_size):
+        """Iterate over the undecorated results in bounded chunks."""
+        if zope_isinstance(self.result_set, DecoratedResultSet):
+            values = self.result_set.stream(chunk_size)
+            while True:
+                chunk = list(islice(values, chunk_size))
+                if not chunk:
+                    break
+                yield chunk
+        else:
+            for chunk in iter_result_set_chunks(self.result_set, chunk_size):
+                yield chunk
+
+    def stream(self, chunk_size=1000):
+        """Iterate over the decorated results with bounded memory.
+
+        Unlike normal iteration, the results are fetched `chunk_size` rows
+        at a time through a server-side cursor, and the pre-iteration hook
+        or bulk decorator is applied to each chunk in turn.  The
+        transaction must stay open until iteration has finished.
+        """
+        start = 0
+        if self.slice_info:
+            start = self.result_set._offset
+            if start is Undef:
+                start = 0
+        for chunk in self._iter_chunks(chunk_size):
+            for value in self._decorate_results(chunk, start):
+                yield value
+            start += len(chunk)
+
+    def __nonzero__(self):
+        """As true as the decorated result set.
+
+        SQLObject result sets are only true if they have any results, and
+        callers of methods that used to return them rely on that.
+        """
+        return bool(removeSecurityProxy(self.result_set))
+
     def __getitem__(self, *args, **kwargs):
         """See `IResultSet`.
 
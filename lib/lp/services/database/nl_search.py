@@ -7,7 +7,10 @@ full text index.
 
 __metaclass__ = type
 
-__all__ = ['nl_phrase_search']
+__all__ = [
+    'nl_phrase_search',
+    'nl_term_conjunction',
+    ]
 
 import re
 
@@ -21,6 +24,15 @@ from lp.services.database.sqlbase import (
 TS_QUERY_TERM_RE = re.compile(r"'([^']+)'")
 
 
+def _ftq(phrase):
+    """Return the text of the ts_query that ftq() builds from phrase."""
+    cur = cursor()
+    cur.execute("SELECT ftq(%(phrase)s)::text" % sqlvalues(phrase=phrase))
+    rs = cur.fetchall()
+    assert len(rs) == 1, "ftq() returned more than one row"
+    return rs[0][0]
+
+
 def nl_term_candidates(phrase):
     """Returns in an array the candidate search terms from phrase.
     Stop words are removed from the phrase and every term is normalized
@@ -28,17 +40,32 @@ def nl_term_candidates(phrase):
 
     :phrase: a search phrase
     """
-    cur = cursor()
-    cur.execute("SELECT ftq(%(phrase)s)::text" % sqlvalues(phrase=phrase))
-    rs = cur.fetchall()
-    assert len(rs) == 1, "ftq() returned more than one row"
-    terms = rs[0][0]
+    terms = _ftq(phrase)
     if not terms:
         # Only stop words
         return []
     return TS_QUERY_TERM_RE.findall(terms)
 
 
+def nl_term_conjunction(phrase):
+    """Return the terms that ftq() requires all of to match phrase.
+
+    Terms are normalized as for `nl_term_candidates`.  None is returned if
+    the query built from phrase uses anything other than & between its
+    terms (such as | or negation), since it can't then be answered from
+    the terms alone.
+
+    :phrase: a search phrase
+    """
+    query = _ftq(phrase)
+    if not query:
+        # Only stop words
+        return []
+    if TS_QUERY_TERM_RE.sub('', query).strip(' &'):
+        return None
+    return TS_QUERY_TERM_RE.findall(query)
+
+
 def nl_phrase_search(phrase, table, constraints='',
                      extra_constraints_tables=None,
                      fast_enabled=True):
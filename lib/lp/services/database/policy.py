@@ -17,6 +17,7 @@ from datetime import (
     datetime,
     timedelta,
     )
+import threading
 
 import psycopg2
 from storm.cache import (
@@ -65,6 +66,19 @@ def _now():
 # Can be tweaked by the test suite to simulate replication lag.
 _test_lag = None
 
+# The most recent replication lag sample as a (sampled_at, lag) tuple,
+# shared by every request thread in this process.
+_lag_sample = None
+_lag_sample_lock = threading.Lock()
+# Held by the one thread that is taking a new sample.
+_lag_refresh_lock = threading.Lock()
+
+
+def reset_replication_lag_cache():
+    """Forget the cached replication lag sample."""
+    global _lag_sample
+    _lag_sample = None
+
 
 def storm_cache_factory():
     """Return a Storm Cache of the type and size specified in dbconfig."""
@@ -347,12 +361,43 @@ class LaunchpadDatabasePolicy(BaseDatabasePolicy):
     def getReplicationLag(self):
         """Return the replication lag between the primary and our hot standby.
 
+        The lag is sampled at most once every
+        `config.database.replication_lag_cache_seconds` seconds per
+        process, rather than once per request.
+
         :returns: timedelta, or None if this isn't a replicated environment,
         """
+        global _lag_sample
+
         # Support the test suite hook.
         if _test_lag is not None:
             return _test_lag
 
+        max_age = timedelta(
+            seconds=config.database.replication_lag_cache_seconds)
+        sample = _lag_sample
+        if sample is not None and _now() - sample[0] < max_age:
+            return sample[1]
+        # Only one thread takes a new sample.  The others use the expired
+        # one meanwhile, or query for themselves if there is none yet.
+        if not _lag_refresh_lock.acquire(False):
+            if sample is not None:
+                return sample[1]
+            return self._queryReplicationLag()
+        try:
+            # Query without holding the lock that guards the sample, so
+            # that a slow standby doesn't hold up threads reading it.
+            sampled_at = _now()
+            lag = self._queryReplicationLag()
+            with _lag_sample_lock:
+                if _lag_sample is None or _lag_sample[0] <= sampled_at:
+                    _lag_sample = (sampled_at, lag)
+        finally:
+            _lag_refresh_lock.release()
+        return lag
+
+    def _queryReplicationLag(self):
+        """Query the hot standby for its current replication lag."""
         # Attempt to retrieve PostgreSQL streaming replication lag
         # from the slave.
         slave_store = self.getStore(MAIN_STORE, SLAVE_FLAVOR)
@@ -18,6 +18,10 @@ from zope.security import (
     checker,
     proxy,
     )
+from zope.security.management import (
+    endInteraction,
+    newInteraction,
+    )
 
 from lp.bugs.enums import BugNotificationLevel
 from lp.bugs.model.bug import BugAffectsPerson
@@ -44,6 +48,8 @@ from lp.services.features.model import (
     getFeatureStore,
     )
 from lp.services.job.model.job import Job
+from lp.services.timeline.requesttimeline import get_request_timeline
+from lp.services.webapp.servers import LaunchpadTestRequest
 from lp.soyuz.model.component import Component
 from lp.testing import (
     StormStatementRecorder,
@@ -267,6 +273,77 @@ class TestLoaders(TestCaseWithFactory):
                 ['branchID'])))
 
 
+class TestBatchLoader(TestCaseWithFactory):
+
+    layer = DatabaseFunctionalLayer
+
+    def test_get_loads_enqueued_objects_together(self):
+        people = [self.factory.makePerson() for i in range(3)]
+        loader = bulk.BatchLoader()
+        loader.enqueue(Person, [person.id for person in people])
+        with StormStatementRecorder() as recorder:
+            loaded = [loader.get(Person, person.id) for person in people]
+        self.assertEqual(people, loaded)
+        self.assertThat(recorder, HasQueryCount(Equals(1)))
+        self.assertEqual(1, loader.queries)
+        self.assertEqual(2, loader.coalesced)
+
+    def test_get_without_enqueue(self):
+        # A lone key has nothing to be coalesced with, so it is fetched
+        # through the store, which can use its cache.
+        person = self.factory.makePerson()
+        loader = bulk.BatchLoader()
+        with StormStatementRecorder() as recorder:
+            self.assertEqual(person, loader.get(Person, person.id))
+        self.assertThat(recorder, HasQueryCount(Equals(0)))
+        self.assertIs(None, loader.get(Person, None))
+        self.assertEqual(0, loader.queries)
+
+    def test_missing_object_is_remembered(self):
+        loader = bulk.BatchLoader()
+        self.assertIs(None, loader.get(Person, -1))
+        with StormStatementRecorder() as recorder:
+            self.assertIs(None, loader.get(Person, -1))
+        self.assertThat(recorder, HasQueryCount(Equals(0)))
+
+    def test_loads_are_recorded_on_timeline(self):
+        people = [self.factory.makePerson() for i in range(3)]
+        timeline = get_request_timeline(None)
+        loader = bulk.BatchLoader()
+        loader.enqueue(Person, [person.id for person in people])
+        loader.get(Person, people[0].id)
+        self.assertEqual(
+            ("batch-load", "Person: 3 keys, 2 coalesced"),
+            (timeline.actions[-1].category, timeline.actions[-1].detail))
+
+    def test_request_shares_loader(self):
+        request = LaunchpadTestRequest()
+        newInteraction(request)
+        self.addCleanup(endInteraction)
+        loader = bulk.get_batch_loader()
+        self.assertIs(loader, bulk.get_batch_loader())
+        self.assertIs(loader, request.annotations['launchpad.batch_loader'])
+
+    def test_no_request_gets_new_loader(self):
+        self.assertIsNot(bulk.get_batch_loader(), bulk.get_batch_loader())
+
+    def test_enqueue_related(self):
+        # Objects enqueued by enqueue_related are loaded together when
+        # the first of them is fetched from the request's loader.
+        newInteraction(LaunchpadTestRequest())
+        self.addCleanup(endInteraction)
+        bugs = [self.factory.makeBug() for i in range(3)]
+        owner_ids = [bug.ownerID for bug in bugs]
+        IStore(Person).invalidate()
+        bulk.enqueue_related(Person, bugs, ['ownerID'])
+        loader = bulk.get_batch_loader()
+        with StormStatementRecorder() as recorder:
+            self.assertEqual(
+                owner_ids,
+                [loader.get(Person, owner_id).id for owner_id in owner_ids])
+        self.assertThat(recorder, HasQueryCount(Equals(1)))
+
+
 class TestCreate(TestCaseWithFactory):
 
     layer = DatabaseFunctionalLayer
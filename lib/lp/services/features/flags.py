@@ -32,6 +32,8 @@ value_domain_info = sorted([
      "An integer."),
     ('space delimited',
      'Space-delimited strings.'),
+    ('string',
+     'A single string.'),
     ('datetime',
      'ISO 8601 datetime'),
     ])
@@ -82,6 +84,29 @@ flag_info = sorted([
      '',
      '',
      ''),
+    ('bugs.structural_subscription_filter_index.enabled',
+     'boolean',
+     ('Match structural subscription filters against bug changes in '
+      'memory, rather than with a query per change.'),
+     '',
+     '',
+     ''),
+    ('bugs.tag_counts.cache_seconds',
+     'int',
+     ('Cache the counts of open public bugs with each tag, as shown in '
+      'tag clouds, for this many seconds. If unset, they are not '
+      'cached.'),
+     '',
+     '',
+     ''),
+    ('bugs.text_search.backend',
+     'string',
+     ('Name of the backend used to match and rank bug search text (only '
+      '"inverted-index" is available). If unset, the database\'s '
+      'full-text index is used.'),
+     '',
+     'Bug text search backend',
+     ''),
     ('code.ajax_revision_diffs.enabled',
      'boolean',
      ("Offer expandable inline diffs for branch revisions."),
@@ -233,6 +258,14 @@ flag_info = sorted([
      'bing',
      'Site search engine',
      ''),
+    ('webapp.batching.keyset.enabled',
+     'boolean',
+     ('If true, batch navigators page suitably ordered Storm result sets '
+      'by keyset memos with estimated totals, rather than by OFFSET with '
+      'exact counts.'),
+     '',
+     'Keyset batching',
+     ''),
     ])
 
 # The set of all flag names that are documented.
@@ -19,6 +19,11 @@ from collections import (
     )
 import re
 
+from storm.expr import (
+    Count,
+    Max,
+    SQL,
+    )
 from storm.locals import Desc
 
 from lp.services.features.model import (
@@ -30,6 +35,11 @@ from lp.services.webapp import adapter
 # A convenient mapping for a feature flag rule in the database.
 Rule = namedtuple("Rule", "flag scope priority value")
 
+# The most recently parsed database rules as a (version, rules) tuple,
+# shared by every StormFeatureRuleSource in this process.  See
+# `StormFeatureRuleSource.getAllRulesAsDict`.
+_rules_snapshot = None
+
 
 class DuplicatePriorityError(Exception):
 
@@ -112,7 +122,7 @@ class StormFeatureRuleSource(FeatureRuleSource):
     """Access feature rules stored in the database via Storm.
     """
 
-    def getAllRulesAsTuples(self):
+    def _requestExpired(self):
         try:
             # This LBYL may look odd but it is needed. Rendering OOPSes and
             # timeouts also looks up flags, but doing such a lookup can
@@ -125,6 +135,40 @@ class StormFeatureRuleSource(FeatureRuleSource):
             # have no rules).
             adapter.get_request_remaining_seconds()
         except adapter.RequestExpired:
+            return True
+        return False
+
+    def getRulesVersion(self):
+        """Return a value that changes whenever any rule changes.
+
+        `setAllRules` replaces every row and stamps each of them with the
+        time it was called, so the latest stamp and the number of rows
+        are enough to tell the rules apart, without reading them.
+        """
+        return getFeatureStore().find(
+            (Max(FeatureFlag.date_modified), Count())).one()
+
+    def getAllRulesAsDict(self):
+        """See `FeatureRuleSource`.
+
+        Parsing the rules is shared by every request in this process.
+        Each call only asks the database for the version of the rules, and
+        reads them again when that changes.  The returned dict must not
+        be modified.
+        """
+        global _rules_snapshot
+        if self._requestExpired():
+            return {}
+        version = self.getRulesVersion()
+        snapshot = _rules_snapshot
+        if snapshot is not None and snapshot[0] == version:
+            return snapshot[1]
+        rules = super(StormFeatureRuleSource, self).getAllRulesAsDict()
+        _rules_snapshot = (version, rules)
+        return rules
+
+    def getAllRulesAsTuples(self):
+        if self._requestExpired():
             return
         store = getFeatureStore()
         rs = (store
@@ -144,12 +188,17 @@ class StormFeatureRuleSource(FeatureRuleSource):
         # we keep timestamps, and to avoid the direct sql etc -- mbp 20100924
         store = getFeatureStore()
         store.execute('DELETE FROM FeatureFlag')
+        # getRulesVersion relies on each call giving a new date_modified,
+        # even within a transaction.
+        date_modified = SQL("clock_timestamp() AT TIME ZONE 'UTC'")
         for (flag, scope, priority, value) in new_rules:
-            store.add(FeatureFlag(
+            rule = FeatureFlag(
                 scope=unicode(scope),
                 flag=unicode(flag),
                 value=value,
-                priority=priority))
+                priority=priority)
+            rule.date_modified = date_modified
+            store.add(rule)
         store.flush()
 
 
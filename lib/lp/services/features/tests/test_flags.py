@@ -8,6 +8,8 @@ __metaclass__ = type
 
 import os
 
+from testtools.matchers import Equals
+
 from lp.services.features import (
     getFeatureFlag,
     install_feature_controller,
@@ -19,8 +21,10 @@ from lp.services.features.rulesource import (
     )
 from lp.testing import (
     layers,
+    StormStatementRecorder,
     TestCase,
     )
+from lp.testing.matchers import HasQueryCount
 
 
 notification_name = 'notification.global.text'
@@ -260,6 +264,35 @@ class TestStormFeatureRuleSource(FeatureRuleSourceTestsMixin, TestCase):
     def makeSource(self):
         return StormFeatureRuleSource()
 
+    def test_getAllRulesAsDict_shares_parsed_rules(self):
+        # For unchanged rules only the version is read, and the rules are
+        # not read and parsed again, even by a different rule source.
+        self.makeSource().setAllRules(test_rules_list)
+        rules = self.makeSource().getAllRulesAsDict()
+        with StormStatementRecorder() as recorder:
+            self.assertIs(rules, self.makeSource().getAllRulesAsDict())
+        self.assertThat(recorder, HasQueryCount(Equals(1)))
+
+    def test_getAllRulesAsDict_notices_changes(self):
+        source = self.makeSource()
+        source.setAllRules(test_rules_list)
+        source.getAllRulesAsDict()
+        source.setAllRules([('ui.icing', 'default', 100, u'3.0')])
+        self.assertEqual(
+            {'ui.icing': [('default', 100, u'3.0')]},
+            self.makeSource().getAllRulesAsDict())
+
+    def test_getAllRulesAsDict_notices_changes_with_same_count(self):
+        # Replacing the rules with as many new ones in the same
+        # transaction still changes the version.
+        source = self.makeSource()
+        source.setAllRules([('ui.icing', 'default', 100, u'3.0')])
+        source.getAllRulesAsDict()
+        source.setAllRules([('ui.icing', 'default', 100, u'4.0')])
+        self.assertEqual(
+            {'ui.icing': [('default', 100, u'4.0')]},
+            self.makeSource().getAllRulesAsDict())
+
 
 class TestMemoryFeatureRuleSource(FeatureRuleSourceTestsMixin, TestCase):
 
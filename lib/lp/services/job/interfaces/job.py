@@ -136,6 +136,12 @@ class IJob(Interface):
     def acquireLease(duration=300):
         """Acquire the lease for this Job, or raise LeaseHeld."""
 
+    def renewLease(duration=300):
+        """Make the lease on this Job expire `duration` seconds from now.
+
+        The caller must already hold the lease.
+        """
+
     def getTimeout():
         """Determine how long this job can run before timing out."""
 
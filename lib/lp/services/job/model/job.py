@@ -36,8 +36,15 @@ from lp.services.database import bulk
 from lp.services.database.constants import UTC_NOW
 from lp.services.database.datetimecol import UtcDateTimeCol
 from lp.services.database.enumcol import EnumCol
-from lp.services.database.interfaces import IStore
-from lp.services.database.sqlbase import SQLBase
+from lp.services.database.interfaces import (
+    IMasterStore,
+    IStore,
+    )
+from lp.services.database.sqlbase import (
+    convert_storm_clause_to_string,
+    quote,
+    SQLBase,
+    )
 from lp.services.job.interfaces.job import (
     IJob,
     JobStatus,
@@ -158,6 +165,50 @@ class Job(SQLBase):
             UTC)
         self.lease_expires = expiry
 
+    @staticmethod
+    def acquireLeases(jobs, duration=300):
+        """Acquire the leases for as many of `jobs` as possible.
+
+        This takes all the leases in a single query.  Jobs that are no
+        longer waiting or whose leases are held are skipped, as are jobs
+        whose rows are locked by another transaction, so that several
+        runners can claim jobs from the same queue without waiting for
+        each other or running the same job twice.
+
+        :param jobs: A sequence of `Job`s.
+        :param duration: The duration of the leases, in seconds.
+        :return: A list of the `Job`s whose leases were acquired, in their
+            original order.
+        """
+        jobs = list(jobs)
+        if not jobs:
+            return []
+        store = IMasterStore(Job)
+        expiry = datetime.datetime.fromtimestamp(time.time() + duration,
+            UTC)
+        candidates = convert_storm_clause_to_string(And(
+            Job.id.is_in([job.id for job in jobs]),
+            Job._status == JobStatus.WAITING,
+            Or(Job.lease_expires == None, Job.lease_expires < UTC_NOW)))
+        leased_ids = set(row[0] for row in store.execute("""
+            UPDATE Job SET lease_expires = """ + quote(expiry) + """
+            WHERE id IN (
+                SELECT id FROM Job
+                WHERE """ + candidates + """
+                FOR UPDATE SKIP LOCKED)
+            RETURNING id
+            """))
+        leased_jobs = [job for job in jobs if job.id in leased_ids]
+        # The leases were set behind Storm's back.
+        for job in leased_jobs:
+            store.invalidate(job)
+        return leased_jobs
+
+    def renewLease(self, duration=300):
+        """See `IJob`."""
+        self.lease_expires = datetime.datetime.fromtimestamp(
+            time.time() + duration, UTC)
+
     def getTimeout(self):
         """Return the number of seconds until the job should time out.
 
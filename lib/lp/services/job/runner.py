@@ -10,6 +10,8 @@ __all__ = [
     'BaseRunnableJob',
     'BaseRunnableJobSource',
     'celery_enabled',
+    'interleave_jobs_by_class',
+    'job_counts_by_class',
     'JobRunner',
     'JobRunnerProcess',
     'TwistedJobRunner',
@@ -17,6 +19,11 @@ __all__ = [
 
 
 from calendar import timegm
+from collections import (
+    defaultdict,
+    deque,
+    OrderedDict,
+    )
 import contextlib
 from datetime import (
     datetime,
@@ -51,9 +58,13 @@ from storm.exceptions import LostObjectError
 import transaction
 from twisted.internet import reactor
 from twisted.internet.defer import (
+    DeferredList,
+    DeferredSemaphore,
     inlineCallbacks,
+    maybeDeferred,
     succeed,
     )
+from twisted.internet.task import LoopingCall
 from twisted.protocols import amp
 from twisted.python import (
     failure,
@@ -71,6 +82,7 @@ from lp.services.job.interfaces.job import (
     IJob,
     IRunnableJob,
     )
+from lp.services.job.model.job import Job
 from lp.services.mail.sendmail import (
     MailController,
     set_immediate_mail_delivery,
@@ -80,6 +92,7 @@ from lp.services.timeout import (
     set_default_timeout_function,
     )
 from lp.services.twistedsupport import run_reactor
+from lp.services.utils import iter_chunks
 from lp.services.webapp import errorlog
 from lp.services.webapp.adapter import (
     clear_request_started,
@@ -209,6 +222,11 @@ class BaseRunnableJob(BaseRunnableJobSource):
             duration = self.lease_duration.total_seconds()
         self.job.acquireLease(duration)
 
+    def renewLease(self, duration=None):
+        if duration is None:
+            duration = self.lease_duration.total_seconds()
+        self.job.renewLease(duration)
+
     def taskId(self):
         """Return a task ID that gives a clue what this job is about.
 
@@ -288,6 +306,10 @@ class BaseRunnableJob(BaseRunnableJobSource):
 class BaseJobRunner(LazrJobRunner):
     """Runner of Jobs."""
 
+    # The number of jobs whose leases are acquired at once by
+    # acquireLeases.
+    lease_batch_size = 20
+
     def __init__(self, logger=None, error_utility=None):
         self.oops_ids = []
         if error_utility is None:
@@ -297,6 +319,8 @@ class BaseJobRunner(LazrJobRunner):
         super(BaseJobRunner, self).__init__(
             logger, oops_config=self.error_utility._oops_config,
             oopsMessage=self.error_utility.oopsMessage)
+        # Job IDs mapped to when the leases taken by acquireLeases end.
+        self.lease_deadlines = {}
 
     def acquireLease(self, job):
         self.logger.debug(
@@ -311,6 +335,53 @@ class BaseJobRunner(LazrJobRunner):
             return False
         return True
 
+    def acquireLeases(self, jobs):
+        """Acquire the leases for as many of `jobs` as possible.
+
+        The leases are taken with one query for each distinct lease
+        duration, rather than one query and commit for each job.  Each job
+        is leased for its own `lease_duration`, so jobs late in the batch
+        may find their leases have run out by the time they are reached;
+        `leaseStillHeld` tells whether that has happened, and `renewLease`
+        should be called just before running each job.
+
+        :return: A list of the jobs whose leases were acquired.
+        """
+        for job in jobs:
+            self.logger.debug(
+                'Trying to acquire lease for job in state %s' % (
+                    job.status.title,))
+        jobs_by_duration = defaultdict(list)
+        for job in jobs:
+            naked_job = removeSecurityProxy(job)
+            jobs_by_duration[naked_job.lease_duration].append(naked_job.job)
+        leased_job_ids = set()
+        for lease_duration, db_jobs in jobs_by_duration.items():
+            # Work out the deadline before taking the leases, so that it
+            # is never later than the one in the database.
+            deadline = datetime.now(utc) + lease_duration
+            for db_job in Job.acquireLeases(
+                    db_jobs, lease_duration.total_seconds()):
+                leased_job_ids.add(db_job.id)
+                self.lease_deadlines[db_job.id] = deadline
+        leased_jobs = []
+        for job in jobs:
+            if job.job_id in leased_job_ids:
+                leased_jobs.append(job)
+            else:
+                self.logger.info(
+                    'Could not acquire lease for %s' % self.job_str(job))
+                self.incomplete_jobs.append(job)
+        return leased_jobs
+
+    def leaseStillHeld(self, job):
+        """Has the lease taken for `job` by `acquireLeases` not run out?
+
+        Once it has, another runner may have leased the job.
+        """
+        deadline = self.lease_deadlines.get(job.job_id)
+        return deadline is not None and datetime.now(utc) < deadline
+
     def runJob(self, job, fallback):
         original_timeout_function = get_default_timeout_function()
         if job.lease_expires is not None:
@@ -379,13 +450,22 @@ class JobRunner(BaseJobRunner):
 
     def runAll(self):
         """Run all the Jobs for this JobRunner."""
-        for job in self.jobs:
-            job = IRunnableJob(job)
-            if not self.acquireLease(job):
-                continue
-            # Commit transaction to clear the row lock.
+        for jobs in iter_chunks(self.jobs, self.lease_batch_size):
+            jobs = self.acquireLeases([IRunnableJob(job) for job in jobs])
+            # Commit transaction to clear the row locks.
             transaction.commit()
-            self.runJobHandleError(job)
+            for job in jobs:
+                if not self.leaseStillHeld(job):
+                    self.logger.info(
+                        'Lease for %s ran out before it could be run' %
+                        self.job_str(job))
+                    self.incomplete_jobs.append(job)
+                    continue
+                # Give the job its full lease from now, rather than from
+                # when the batch's leases were acquired.  This is committed
+                # when the job starts.
+                job.renewLease()
+                self.runJobHandleError(job)
 
 
 class RunJobCommand(amp.Command):
@@ -470,12 +550,68 @@ class JobRunnerProcess(child.AMPChild):
         return {'success': len(runner.completed_jobs), 'oops_id': oops_id}
 
 
+def job_counts_by_class(jobs):
+    """Return a sorted list of (job class name, count) tuples for `jobs`."""
+    counts = defaultdict(int)
+    for job in jobs:
+        counts[job.__class__.__name__] += 1
+    return sorted(counts.items())
+
+
+def interleave_jobs_by_class(jobs):
+    """Interleave `jobs` so that each job class gets a fair share of turns.
+
+    Jobs of each class are yielded in their original order, but classes
+    take turns, so that a long run of one type of job does not delay every
+    job of other types behind it.
+    """
+    queues = OrderedDict()
+    for job in jobs:
+        queues.setdefault(job.__class__, deque()).append(job)
+    while queues:
+        for job_class, queue in list(queues.items()):
+            yield queue.popleft()
+            if not queue:
+                del queues[job_class]
+
+
+class JobRunnerProcessPool(pool.ProcessPool):
+    """A `ProcessPool` that can stop the worker that ran a call.
+
+    Calls succeed with a (worker, response) tuple, where worker is None if
+    it can't be told which worker ran the call.
+    """
+
+    def _cb_doWork(self, command, **kwargs):
+        # ampoule gives the call to a worker that it takes from the ready
+        # set before it returns.
+        ready = set(self.ready)
+        deferred = super(JobRunnerProcessPool, self)._cb_doWork(
+            command, **kwargs)
+        workers = ready - self.ready
+        worker = workers.pop() if len(workers) == 1 else None
+        return deferred.addCallback(lambda response: (worker, response))
+
+    def retireWorker(self, worker):
+        """Stop `worker`, and take it out of the pool at once.
+
+        The worker gets no more work while it shuts down, and a new one is
+        started when more work needs it.
+
+        :return: a Deferred that fires when the worker has stopped.
+        """
+        stopped = self.stopAWorker(worker)
+        self._pruneProcess(worker)
+        return stopped
+
+
 class TwistedJobRunner(BaseJobRunner):
     """Run Jobs via twisted."""
 
     TIMEOUT_CODE = 42
 
-    def __init__(self, job_source, dbuser, logger=None, error_utility=None):
+    def __init__(self, job_source, dbuser, logger=None, error_utility=None,
+                 concurrency=1):
         env = {'PATH': os.environ['PATH']}
         if 'LPCONFIG' in os.environ:
             env['LPCONFIG'] = os.environ['LPCONFIG']
@@ -486,9 +622,11 @@ class TwistedJobRunner(BaseJobRunner):
         self.job_source = job_source
         self.import_name = '%s.%s' % (
             removeSecurityProxy(job_source).__module__, job_source.__name__)
-        self.pool = pool.ProcessPool(
+        self.concurrency = concurrency
+        self.queue_depths = []
+        self.pool = JobRunnerProcessPool(
             JobRunnerProcess, ampChildArgs=[self.import_name, str(dbuser)],
-            starter=starter, min=0, timeout_signal=SIGHUP)
+            starter=starter, min=0, max=concurrency, timeout_signal=SIGHUP)
 
     def runJobInSubprocess(self, job):
         """Run the job_class with the specified id in the process pool.
@@ -512,7 +650,8 @@ class TwistedJobRunner(BaseJobRunner):
         deferred = self.pool.doWork(
             RunJobCommand, job_id=job_id, _deadline=deadline)
 
-        def update(response):
+        def update(result):
+            worker, response = result
             if response is None:
                 self.incomplete_jobs.append(job)
                 self.logger.debug('No response for %s', self.job_str(job))
@@ -523,9 +662,9 @@ class TwistedJobRunner(BaseJobRunner):
             else:
                 self.incomplete_jobs.append(job)
                 self.logger.debug('Incomplete %s', self.job_str(job))
-                # Kill the worker that experienced a failure; this only
-                # works because there's a single worker.
-                self.pool.stopAWorker()
+                # Kill the worker that experienced a failure.
+                if worker is not None:
+                    self.pool.retireWorker(worker)
             if response['oops_id'] != '':
                 self._logOopsId(response['oops_id'])
 
@@ -556,17 +695,30 @@ class TwistedJobRunner(BaseJobRunner):
             oops = self._doOops(job, sys.exc_info())
             self._logOopsId(oops['id'])
 
+    def runJobs(self, jobs):
+        """Run `jobs` in the process pool.
+
+        Up to `concurrency` jobs run at once, with different job classes
+        taking turns.
+
+        :return: a Deferred that fires when all the jobs have completed.
+        """
+        semaphore = DeferredSemaphore(self.concurrency)
+        return DeferredList(
+            [semaphore.run(self.runJobInSubprocess, job)
+             for job in interleave_jobs_by_class(jobs)],
+            fireOnOneErrback=True, consumeErrors=True)
+
     @inlineCallbacks
     def runAll(self):
         """Run all ready jobs."""
         self.pool.start()
         try:
             try:
-                job = None
-                for job in self.job_source.iterReady():
-                    yield self.runJobInSubprocess(job)
-                if job is None:
+                jobs = list(self.job_source.iterReady())
+                if not jobs:
                     self.logger.info('No jobs to run.')
+                yield self.runJobs(jobs)
                 self.terminated()
             except:
                 self.failed(failure.Failure())
@@ -574,6 +726,59 @@ class TwistedJobRunner(BaseJobRunner):
             self.terminated()
             raise
 
+    def poll(self):
+        """Run the jobs that are ready now, and report on them.
+
+        Errors are logged rather than propagated, so that a long-running
+        runner survives transient failures such as a database restart.
+
+        :return: a Deferred that fires when all the jobs have completed.
+        """
+        def run_ready():
+            jobs = list(self.job_source.iterReady())
+            self.queue_depths = job_counts_by_class(jobs)
+            if jobs:
+                self.logger.info(
+                    'Queue depth: %d (%s).', len(jobs),
+                    ', '.join(
+                        '%s: %d' % item for item in self.queue_depths))
+            return self.runJobs(jobs)
+
+        def report(ignored):
+            for name, count in job_counts_by_class(self.completed_jobs):
+                self.logger.info('Ran %d %s jobs.', count, name)
+            for name, count in job_counts_by_class(self.incomplete_jobs):
+                self.logger.info('%d %s jobs did not complete.', count, name)
+            # Don't accumulate state or hold a transaction open between
+            # polls.
+            del self.completed_jobs[:]
+            del self.incomplete_jobs[:]
+            del self.oops_ids[:]
+            transaction.commit()
+
+        def poll_failed(failure):
+            self.logger.error(
+                'Failed to run ready jobs:\n%s', failure.getTraceback())
+            transaction.abort()
+
+        deferred = maybeDeferred(run_ready)
+        deferred.addCallback(report)
+        deferred.addErrback(poll_failed)
+        return deferred
+
+    def runPolling(self, poll_interval):
+        """Keep running jobs as they become ready, until the reactor stops.
+
+        The job source is polled every `poll_interval` seconds, or as soon
+        as the previous batch of jobs has completed if that takes longer.
+        At least one worker is kept running, so that jobs don't have to
+        wait for a new worker to start up.
+        """
+        self.pool.min = 1
+        self.pool.start()
+        self.polling_loop = LoopingCall(self.poll)
+        self.polling_loop.start(poll_interval).addErrback(self.failed)
+
     def terminated(self, ignored=None):
         """Callback to stop the processpool and reactor."""
         deferred = self.pool.stop()
@@ -585,12 +790,17 @@ class TwistedJobRunner(BaseJobRunner):
         self.terminated()
 
     @classmethod
-    def runFromSource(cls, job_source, dbuser, logger, _log_twisted=False):
+    def runFromSource(cls, job_source, dbuser, logger, _log_twisted=False,
+                      concurrency=1, poll_interval=None):
         """Run all ready jobs provided by the specified source.
 
         The dbuser parameter is not ignored.
         :param _log_twisted: For debugging: If True, emit verbose Twisted
             messages to stderr.
+        :param concurrency: The maximum number of jobs to run at once.
+        :param poll_interval: If not None, keep running and poll for newly
+            ready jobs every this many seconds, rather than returning once
+            the currently ready jobs have run.
         """
         logger.info("Running through Twisted.")
         if _log_twisted:
@@ -601,8 +811,11 @@ class TwistedJobRunner(BaseJobRunner):
             observer = log.PythonLoggingObserver(
                 loggerName='twistedjobrunner')
             log.startLoggingWithObserver(observer.emit)
-        runner = cls(job_source, dbuser, logger)
-        reactor.callWhenRunning(runner.runAll)
+        runner = cls(job_source, dbuser, logger, concurrency=concurrency)
+        if poll_interval is None:
+            reactor.callWhenRunning(runner.runAll)
+        else:
+            reactor.callWhenRunning(runner.runPolling, poll_interval)
         run_reactor()
         return runner
 
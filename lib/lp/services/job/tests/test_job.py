@@ -475,6 +475,41 @@ class TestReadiness(TestCase):
         job.acquireLease(-300)
         self.assertEqual(0, job.getTimeout())
 
+    def test_acquireLeases(self):
+        """Job.acquireLeases leases all the available jobs in one query."""
+        jobs = [Job(), Job(), Job()]
+        Store.of(jobs[0]).flush()
+        with StormStatementRecorder() as recorder:
+            leased_jobs = Job.acquireLeases(jobs, 300)
+        self.assertThat(recorder, HasQueryCount(Equals(1)))
+        self.assertEqual(jobs, leased_jobs)
+        for job in jobs:
+            self.assertTrue(0 < job.getTimeout() <= 300)
+
+    def test_acquireLeases_skips_unavailable(self):
+        """Job.acquireLeases skips held leases and jobs that aren't waiting.
+        """
+        held_job = Job()
+        held_job.acquireLease()
+        running_job = Job(_status=JobStatus.RUNNING)
+        stale_job = Job()
+        stale_job.acquireLease(-1)
+        job = Job()
+        self.assertEqual(
+            [stale_job, job],
+            Job.acquireLeases([held_job, running_job, stale_job, job]))
+        self.assertRaises(LeaseHeld, job.acquireLease)
+
+    def test_acquireLeases_empty(self):
+        self.assertEqual([], Job.acquireLeases([]))
+
+    def test_renewLease(self):
+        """Job.renewLease restarts the lease from now."""
+        job = Job()
+        job.acquireLease(3000)
+        job.renewLease(300)
+        self.assertTrue(0 < job.getTimeout() <= 300)
+
 
 class TestUniversalJobSource(TestCaseWithFactory):
 
@@ -27,6 +27,7 @@ from testtools.matchers import (
     )
 from testtools.testcase import ExpectedException
 import transaction
+from twisted.internet.defer import Deferred
 from zope.interface import implementer
 
 from lp.services.config import config
@@ -40,6 +41,8 @@ from lp.services.job.model.job import Job
 from lp.services.job.runner import (
     BaseRunnableJob,
     celery_enabled,
+    interleave_jobs_by_class,
+    job_counts_by_class,
     JobRunner,
     TwistedJobRunner,
     )
@@ -51,6 +54,7 @@ from lp.services.timeout import (
     )
 from lp.services.webapp import errorlog
 from lp.testing import (
+    TestCase,
     TestCaseWithFactory,
     ZopeTestInSubProcess,
     )
@@ -199,6 +203,65 @@ class TestJobRunner(TestCaseWithFactory):
         self.assertEqual([job_2], runner.incomplete_jobs)
         self.assertEqual([], self.oopses)
 
+    def test_runAll_acquires_leases_in_batches(self):
+        """runAll acquires leases for a batch of jobs at once."""
+        jobs = [NullJob("job %d" % i) for i in range(5)]
+        runner = JobRunner(jobs)
+        runner.lease_batch_size = 2
+        acquire_leases = FakeMethod()
+        real_acquire_leases = Job.acquireLeases
+
+        def fake_acquire_leases(db_jobs, duration):
+            acquire_leases(db_jobs, duration)
+            return real_acquire_leases(db_jobs, duration)
+
+        self.patch(Job, 'acquireLeases', staticmethod(fake_acquire_leases))
+        runner.runAll()
+        self.assertEqual(jobs, runner.completed_jobs)
+        self.assertEqual(
+            [[job.job for job in jobs[:2]], [job.job for job in jobs[2:4]],
+             [jobs[4].job]],
+            [args[0] for args in acquire_leases.extract_args()])
+        # Each job still gets its usual lease once it starts.
+        for job in jobs:
+            self.assertTrue(
+                job.lease_expires <= datetime.now(UTC) + job.lease_duration)
+
+    def test_acquireLeases_uses_each_job_lease_duration(self):
+        """Each job is leased for its own lease duration."""
+        short_job = NullJob("short")
+        short_job.lease_duration = timedelta(minutes=1)
+        long_job = NullJob("long")
+        long_job.lease_duration = timedelta(minutes=10)
+        runner = JobRunner([])
+        self.assertEqual(
+            [short_job, long_job],
+            runner.acquireLeases([short_job, long_job]))
+        now = datetime.now(UTC)
+        self.assertTrue(
+            short_job.lease_expires <= now + timedelta(minutes=1))
+        self.assertTrue(
+            now + timedelta(minutes=5) < long_job.lease_expires <=
+            now + timedelta(minutes=10))
+        self.assertTrue(runner.leaseStillHeld(short_job))
+
+    def test_runAll_skips_jobs_whose_leases_ran_out(self):
+        """Jobs whose batch leases ran out before they were reached are
+        left for another runner."""
+        job_1, job_2 = NullJob("job 1"), NullJob("job 2")
+        runner = JobRunner([job_1, job_2])
+        real_acquire_leases = runner.acquireLeases
+
+        def acquire_leases(jobs):
+            leased_jobs = real_acquire_leases(jobs)
+            runner.lease_deadlines[job_2.job_id] = datetime.now(UTC)
+            return leased_jobs
+
+        runner.acquireLeases = acquire_leases
+        runner.runAll()
+        self.assertEqual([job_1], runner.completed_jobs)
+        self.assertEqual([job_2], runner.incomplete_jobs)
+
     def test_runAll_reports_oopses(self):
         """When an error is encountered, report an oops and continue."""
         job_1, job_2 = self.makeTwoJobs()
@@ -602,6 +665,22 @@ class LeaseHeldJob(StaticJobSource):
         raise LeaseHeld()
 
 
+class PollingTwistedJobRunner(TwistedJobRunner):
+    """A TwistedJobRunner that stops after polling a few times."""
+
+    max_polls = 3
+
+    polls = 0
+
+    def poll(self):
+        self.polls += 1
+        if self.polls > self.max_polls:
+            self.polling_loop.stop()
+            self.terminated()
+            return
+        return super(PollingTwistedJobRunner, self).poll()
+
+
 class TestTwistedJobRunner(ZopeTestInSubProcess, TestCaseWithFactory):
 
     # Needs AMQP
@@ -729,6 +808,44 @@ class TestTwistedJobRunner(ZopeTestInSubProcess, TestCaseWithFactory):
         self.assertEqual(
             (0, 0), (len(runner.completed_jobs), len(runner.incomplete_jobs)))
 
+    def test_runJobs_concurrency(self):
+        """runJobs keeps up to `concurrency` jobs in flight at once."""
+        runner = TwistedJobRunner(NoJobs, 'branchscanner', concurrency=2)
+        started = []
+
+        def run_job(job):
+            deferred = Deferred()
+            started.append((job, deferred))
+            return deferred
+
+        runner.runJobInSubprocess = run_job
+        finished = runner.runJobs([1, 2, 3])
+        self.assertEqual([1, 2], [job for job, _ in started])
+        started[0][1].callback(None)
+        self.assertEqual([1, 2, 3], [job for job, _ in started])
+        self.assertFalse(finished.called)
+        for _, deferred in started[1:]:
+            deferred.callback(None)
+        self.assertTrue(finished.called)
+
+    def test_poll_interval(self):
+        """A polling runner keeps going, reporting on each batch of jobs."""
+        logger = BufferLogger()
+        logger.setLevel(logging.INFO)
+        self.addCleanup(self._attachLog, logger)
+        runner = PollingTwistedJobRunner.runFromSource(
+            ProcessSharingJob, 'branchscanner', logger, poll_interval=0.1)
+        self.assertEqual(4, runner.polls)
+        # The last poll found no ready jobs.
+        self.assertEqual([], runner.queue_depths)
+        self.assertIn(
+            'Queue depth: 2 (ProcessSharingJob: 2).', logger.getLogBuffer())
+        self.assertIn('Ran 2 ProcessSharingJob jobs.', logger.getLogBuffer())
+        self.assertNotIn('did not complete', logger.getLogBuffer())
+        # Completed jobs are not kept around between polls.
+        self.assertEqual(
+            (0, 0), (len(runner.completed_jobs), len(runner.incomplete_jobs)))
+
     def test_lease_held_handled(self):
         """Jobs that raise LeaseHeld are handled correctly."""
         logger = BufferLogger()
@@ -741,6 +858,42 @@ class TestTwistedJobRunner(ZopeTestInSubProcess, TestCaseWithFactory):
             (0, 1), (len(runner.completed_jobs), len(runner.incomplete_jobs)))
 
 
+class TestInterleaveJobsByClass(TestCase):
+
+    def test_interleave(self):
+        # Job classes take turns, keeping the order within each class.
+        class FirstJob(tuple):
+            pass
+
+        class SecondJob(tuple):
+            pass
+
+        jobs = [
+            FirstJob((1,)), FirstJob((2,)), FirstJob((3,)),
+            SecondJob((4,)), SecondJob((5,)),
+            ]
+        self.assertEqual(
+            [(1,), (4,), (2,), (5,), (3,)],
+            list(interleave_jobs_by_class(jobs)))
+
+    def test_empty(self):
+        self.assertEqual([], list(interleave_jobs_by_class([])))
+
+
+class TestJobCountsByClass(TestCase):
+
+    def test_job_counts_by_class(self):
+        class FirstJob:
+            pass
+
+        class SecondJob:
+            pass
+
+        jobs = [SecondJob(), FirstJob(), SecondJob()]
+        self.assertEqual(
+            [('FirstJob', 1), ('SecondJob', 2)], job_counts_by_class(jobs))
+
+
 class TestCeleryEnabled(TestCaseWithFactory):
 
     layer = LaunchpadZopelessLayer
@@ -7,12 +7,15 @@ __all__ = [
     'DBLoopTuner',
     'ITunableLoop',
     'LoopTuner',
+    'run_in_threads',
     'TunableLoop',
     ]
 
 
 from datetime import timedelta
+from functools import partial
 import sys
+import threading
 import time
 
 from six import reraise
@@ -92,7 +95,8 @@ class LoopTuner:
     def __init__(
         self, operation, goal_seconds,
         minimum_chunk_size=1, maximum_chunk_size=1000000000,
-        abort_time=None, cooldown_time=None, log=None):
+        abort_time=None, cooldown_time=None, log=None,
+        initial_chunk_size=None):
         """Initialize a loop, to be run to completion at most once.
 
         Parameters:
@@ -120,6 +124,10 @@ class LoopTuner:
 
         log: The log object to use. DEBUG level messages are logged
             giving iteration statistics.
+
+        initial_chunk_size: the chunk size to start with, such as the one
+            that a previous run converged on.  Defaults to
+            minimum_chunk_size.
         """
         assert(ITunableLoop.providedBy(operation))
         self.operation = operation
@@ -128,6 +136,7 @@ class LoopTuner:
         self.maximum_chunk_size = maximum_chunk_size
         self.cooldown_time = cooldown_time
         self.abort_time = abort_time
+        self.initial_chunk_size = initial_chunk_size
         if log is None:
             self.log = lp.services.scripts.log
         else:
@@ -136,6 +145,10 @@ class LoopTuner:
     # True if this task has timed out. Set by _isTimedOut().
     _has_timed_out = False
 
+    # A dict of statistics about the loop.  Set by run() if the loop
+    # finishes or is aborted without raising an exception.
+    statistics = None
+
     def _isTimedOut(self, extra_seconds=0):
         """Return True if the task will be timed out in extra_seconds.
 
@@ -157,8 +170,12 @@ class LoopTuner:
         cleanup = getattr(self.operation, 'cleanUp', lambda: None)
         try:
             chunk_size = self.minimum_chunk_size
+            if self.initial_chunk_size is not None:
+                chunk_size = max(self.initial_chunk_size, chunk_size)
+                chunk_size = min(chunk_size, self.maximum_chunk_size)
             iteration = 0
             total_size = 0
+            finished = True
             self.start_time = self._time()
             last_clock = self.start_time
             while not self.operation.isDone():
@@ -166,6 +183,7 @@ class LoopTuner:
                 if self._isTimedOut():
                     self.log.info(
                         "Task aborted after %d seconds.", self.abort_time)
+                    finished = False
                     break
 
                 self.operation(chunk_size)
@@ -206,6 +224,13 @@ class LoopTuner:
                 "average size %f (%s/s)",
                 total_size, iteration, total_time, average_size,
                 average_speed)
+            self.statistics = {
+                'items': total_size,
+                'iterations': iteration,
+                'seconds': total_time,
+                'chunk_size': chunk_size,
+                'finished': finished,
+                }
         except Exception:
             exc_info = sys.exc_info()
             try:
@@ -369,6 +394,21 @@ class TunableLoop:
     maximum_chunk_size = None  # Override.
     cooldown_time = 0
 
+    # The chunk size to start with, if not minimum_chunk_size.
+    initial_chunk_size = None
+
+    # Statistics about the run, as for `LoopTuner.statistics`.  Set by
+    # run().
+    statistics = None
+
+    # If greater than 1, run() splits the work into this many partitions
+    # and runs them concurrently, each in its own thread and hence with its
+    # own database connection.  Each partition has its own tuner, so it
+    # backs off on replication lag and long-running transactions
+    # independently.  Subclasses that set this must implement
+    # makePartition.
+    partitions = 1
+
     def __init__(self, log, abort_time=None):
         self.log = log
         self.abort_time = abort_time
@@ -377,13 +417,114 @@ class TunableLoop:
         """Return True when the TunableLoop is complete."""
         raise NotImplementedError(self.isDone)
 
-    def run(self):
-        assert self.maximum_chunk_size is not None, (
-            "Did not override maximum_chunk_size.")
-        self.tuner_class(
-            self, self.goal_seconds,
+    def makePartition(self, partition):
+        """Return an `ITunableLoop` doing one partition of this loop's work.
+
+        This is called in the thread that will run the partition.
+
+        :param partition: The index of the partition, from 0 up to but not
+            including `partitions`.
+        """
+        raise NotImplementedError(self.makePartition)
+
+    def _makeTuner(self, loop):
+        return self.tuner_class(
+            loop, self.goal_seconds,
             minimum_chunk_size=self.minimum_chunk_size,
             maximum_chunk_size=self.maximum_chunk_size,
             cooldown_time=self.cooldown_time,
             abort_time=self.abort_time,
-            log=self.log).run()
+            log=self.log,
+            initial_chunk_size=self.initial_chunk_size)
+
+    def _runPartitions(self):
+        """Run all the partitions of this loop concurrently."""
+        statistics = []
+
+        def run_partition(partition):
+            tuner = self._makeTuner(self.makePartition(partition))
+            tuner.run()
+            statistics.append(tuner.statistics)
+
+        failures = run_in_threads(
+            [("Partition %d of %d" % (partition, self.partitions),
+              partial(run_partition, partition))
+             for partition in range(self.partitions)],
+            self.log)
+        if failures:
+            exc_info = failures[0]
+            reraise(exc_info[0], exc_info[1], tb=exc_info[2])
+        # The partitions ran side by side, so the run took as long as the
+        # slowest partition.  Each partition tunes its own chunk size, but
+        # they all start from the same one next time.
+        self.statistics = {
+            'items': sum(stats['items'] for stats in statistics),
+            'iterations': sum(stats['iterations'] for stats in statistics),
+            'seconds': max(stats['seconds'] for stats in statistics),
+            'chunk_size': (
+                sum(stats['chunk_size'] for stats in statistics) /
+                len(statistics)),
+            'finished': all(stats['finished'] for stats in statistics),
+            }
+
+    def run(self):
+        assert self.maximum_chunk_size is not None, (
+            "Did not override maximum_chunk_size.")
+        if self.partitions > 1:
+            self._runPartitions()
+        else:
+            tuner = self._makeTuner(self)
+            tuner.run()
+            self.statistics = tuner.statistics
+
+
+def run_in_threads(functions, log):
+    """Call some functions concurrently, each in its own thread.
+
+    Each thread has its own database connections and transaction, which is
+    aborted when its function returns.  It runs as the calling thread's
+    principal, with a feature controller for the calling thread's scopes.
+
+    :param functions: A list of (name, function) pairs.  Each function is
+        called with no arguments in a thread with the given name.
+    :param log: A logger for any exceptions raised by the functions.
+    :return: A list of the `sys.exc_info()` of each function that raised
+        an exception.
+    """
+    # Avoid circular imports.
+    from lp.services.features import (
+        get_relevant_feature_controller,
+        install_feature_controller,
+        )
+    from lp.services.features.flags import FeatureController
+    from lp.services.webapp.interaction import (
+        get_current_principal,
+        setupInteraction,
+        )
+
+    controller = get_relevant_feature_controller()
+    principal = get_current_principal()
+    failures = []
+
+    def run(name, function):
+        if controller is not None:
+            install_feature_controller(
+                FeatureController(controller.isInScope))
+        if principal is not None:
+            setupInteraction(principal)
+        try:
+            function()
+        except Exception:
+            log.exception("%s failed.", name)
+            failures.append(sys.exc_info())
+        finally:
+            transaction.abort()
+
+    threads = [
+        threading.Thread(target=run, name=name, args=(name, function))
+        for name, function in functions]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return failures
@@ -28,12 +28,25 @@ def memcache_client_factory():
 
 
 class TimelineRecordingClient(memcache.Client):
+    """A memcache client that records calls on the request timeline.
+
+    Within a browser request, values fetched from memcache are remembered
+    in the request's annotations, so repeated gets of the same key only
+    go to the server once.
+    """
 
     def __get_timeline_action(self, suffix, key):
         request = get_current_browser_request()
         timeline = get_request_timeline(request)
         return timeline.start("memcache-%s" % suffix, key)
 
+    def __get_request_cache(self):
+        """Return the current request's cache of fetched values, if any."""
+        request = get_current_browser_request()
+        if request is None:
+            return None
+        return request.annotations.setdefault('launchpad.memcache', {})
+
     @property
     def _enabled(self):
         configured_value = features.getFeatureFlag('memcache')
@@ -45,15 +58,57 @@ class TimelineRecordingClient(memcache.Client):
     def get(self, key):
         if not self._enabled:
             return None
+        cache = self.__get_request_cache()
+        if cache is not None and key in cache:
+            return cache[key]
         action = self.__get_timeline_action("get", key)
         try:
-            return memcache.Client.get(self, key)
+            value = memcache.Client.get(self, key)
+        finally:
+            action.finish()
+        if cache is not None:
+            cache[key] = value
+        return value
+
+    def get_multi(self, keys, key_prefix=''):
+        """Get several keys in a single round trip.
+
+        :return: A dict mapping each key that was found, without
+            `key_prefix`, to its value.
+        """
+        if not self._enabled:
+            return {}
+        cache = self.__get_request_cache()
+        found = {}
+        missing = []
+        for key in keys:
+            if cache is not None and key_prefix + key in cache:
+                value = cache[key_prefix + key]
+                if value is not None:
+                    found[key] = value
+            else:
+                missing.append(key)
+        if not missing:
+            return found
+        action = self.__get_timeline_action(
+            "get_multi", " ".join(key_prefix + key for key in missing))
+        try:
+            fetched = memcache.Client.get_multi(
+                self, missing, key_prefix=key_prefix)
         finally:
             action.finish()
+        found.update(fetched)
+        if cache is not None:
+            for key in missing:
+                cache[key_prefix + key] = fetched.get(key)
+        return found
 
     def set(self, key, value, time=0, min_compress_len=0):
         if not self._enabled:
             return None
+        cache = self.__get_request_cache()
+        if cache is not None:
+            cache.pop(key, None)
         action = self.__get_timeline_action("set", key)
         try:
             success = memcache.Client.set(self, key, value, time=time,
@@ -65,3 +120,37 @@ class TimelineRecordingClient(memcache.Client):
             return success
         finally:
             action.finish()
+
+    def set_multi(self, mapping, time=0, key_prefix='', min_compress_len=0):
+        """Set several keys in a single round trip.
+
+        :return: A list of the keys that could not be set.
+        """
+        if not self._enabled:
+            return list(mapping)
+        cache = self.__get_request_cache()
+        if cache is not None:
+            for key in mapping:
+                cache.pop(key_prefix + key, None)
+        action = self.__get_timeline_action(
+            "set_multi", " ".join(key_prefix + key for key in mapping))
+        try:
+            failed = memcache.Client.set_multi(
+                self, mapping, time=time, key_prefix=key_prefix,
+                min_compress_len=min_compress_len)
+            if failed:
+                logging.warn(
+                    "Memcache set failed for %s",
+                    ", ".join(key_prefix + key for key in failed))
+            else:
+                logging.debug(
+                    "Memcache set succeeded for %d keys", len(mapping))
+            return failed
+        finally:
+            action.finish()
+
+    def delete(self, key, *args, **kwargs):
+        cache = self.__get_request_cache()
+        if cache is not None:
+            cache.pop(key, None)
+        return memcache.Client.delete(self, key, *args, **kwargs)
@@ -24,10 +24,20 @@ class MemcacheFixture(fixtures.Fixture):
     def get(self, key):
         return self._cache.get(key)
 
+    def get_multi(self, keys, key_prefix=''):
+        return dict(
+            (key, self._cache[key_prefix + key]) for key in keys
+            if key_prefix + key in self._cache)
+
     def set(self, key, val):
         self._cache[key] = val
         return 1
 
+    def set_multi(self, mapping, time=0, key_prefix=''):
+        for key, val in mapping.items():
+            self._cache[key_prefix + key] = val
+        return []
+
     def delete(self, key):
         self._cache.pop(key, None)
         return 1
@@ -7,9 +7,14 @@ __metaclass__ = type
 
 from lazr.restful.utils import get_current_browser_request
 from zope.component import getUtility
+from zope.security.management import (
+    endInteraction,
+    newInteraction,
+    )
 
 from lp.services.memcache.interfaces import IMemcacheClient
 from lp.services.timeline.requesttimeline import get_request_timeline
+from lp.services.webapp.servers import LaunchpadTestRequest
 from lp.testing import TestCase
 from lp.testing.layers import LaunchpadZopelessLayer
 
@@ -53,3 +58,44 @@ class MemcacheClientTestCase(TestCase):
         action = timeline.actions[-1]
         self.assertEqual('memcache-get', action.category)
         self.assertEqual('foo', action.detail)
+
+    def test_multi(self):
+        self.assertEqual(
+            [], self.client.set_multi({'a': '1', 'b': '2'}, key_prefix='p:'))
+        self.assertEqual(
+            {'a': '1', 'b': '2'},
+            self.client.get_multi(['a', 'b', 'c'], key_prefix='p:'))
+        self.assertEqual('1', self.client.get('p:a'))
+
+    def test_get_multi_recorded_to_timeline(self):
+        request = get_current_browser_request()
+        timeline = get_request_timeline(request)
+        self.client.get_multi(['foo', 'bar'])
+        action = timeline.actions[-1]
+        self.assertEqual('memcache-get_multi', action.category)
+        self.assertEqual('foo bar', action.detail)
+
+    def test_request_deduplicates_gets(self):
+        # Within a request, each key is only fetched from memcache once,
+        # until it is set again.
+        newInteraction(LaunchpadTestRequest())
+        self.addCleanup(endInteraction)
+        timeline = get_request_timeline(get_current_browser_request())
+        start = len(timeline.actions)
+        self.client.set('foo', 'bar')
+        self.client.set('baz', 'quux')
+        self.assertEqual('bar', self.client.get('foo'))
+        self.assertEqual(
+            {'foo': 'bar', 'baz': 'quux'},
+            self.client.get_multi(['foo', 'baz', 'missing']))
+        self.assertEqual({}, self.client.get_multi(['missing']))
+        actions = [
+            action for action in timeline.actions[start:]
+            if action.category.startswith('memcache-')]
+        self.assertEqual(
+            ['memcache-set', 'memcache-set', 'memcache-get',
+             'memcache-get_multi'],
+            [action.category for action in actions])
+        self.assertEqual('baz missing', actions[-1].detail)
+        self.client.set('foo', 'new')
+        self.assertEqual('new', self.client.get('foo'))
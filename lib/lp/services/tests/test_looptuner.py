@@ -9,13 +9,22 @@ These are the edge test cases that don't belong in the doctest.
 __metaclass__ = type
 
 from cStringIO import StringIO
+import threading
 
 from zope.interface import implementer
 
+from lp.services.features import (
+    get_relevant_feature_controller,
+    install_feature_controller,
+    uninstall_feature_controller,
+    )
+from lp.services.features.flags import FeatureController
 from lp.services.log.logger import FakeLogger
 from lp.services.looptuner import (
     ITunableLoop,
     LoopTuner,
+    run_in_threads,
+    TunableLoop,
     )
 from lp.testing import TestCase
 from lp.testing.layers import BaseLayer
@@ -56,6 +65,53 @@ class FailingLoop:
             raise CleanupException()
 
 
+@implementer(ITunableLoop)
+class RecordingLoop:
+    """A loop that records the chunk sizes it is asked to process."""
+
+    def __init__(self, iterations):
+        self.iterations = iterations
+        self.chunk_sizes = []
+
+    def isDone(self):
+        return len(self.chunk_sizes) >= self.iterations
+
+    def __call__(self, chunk_size):
+        self.chunk_sizes.append(chunk_size)
+
+
+class PartitionLoop:
+    """One partition of a `PartitionedLoop`."""
+
+    def __init__(self, partitioned_loop, partition):
+        self.partitioned_loop = partitioned_loop
+        self.partition = partition
+
+    def isDone(self):
+        return self.partition in self.partitioned_loop.done
+
+    def __call__(self, chunk_size):
+        if self.partition == self.partitioned_loop.fail_partition:
+            raise MainException()
+        self.partitioned_loop.done[self.partition] = (
+            threading.currentThread().name)
+
+
+class PartitionedLoop(TunableLoop):
+
+    tuner_class = LoopTuner
+    maximum_chunk_size = 10
+    partitions = 3
+
+    def __init__(self, log, fail_partition=None):
+        super(PartitionedLoop, self).__init__(log)
+        self.fail_partition = fail_partition
+        self.done = {}
+
+    def makePartition(self, partition):
+        return PartitionLoop(self, partition)
+
+
 class TestSomething(TestCase):
     layer = BaseLayer
 
@@ -83,3 +139,82 @@ class TestSomething(TestCase):
         self.assertEqual(
             log_file.getvalue().strip(),
             "ERROR Unhandled exception in cleanUp")
+
+    def test_partitions(self):
+        """Each partition of a partitioned loop runs in its own thread."""
+        loop = PartitionedLoop(FakeLogger(StringIO()))
+        loop.run()
+        self.assertEqual([0, 1, 2], sorted(loop.done))
+        self.assertEqual(3, len(set(loop.done.values())))
+        self.assertNotIn(
+            threading.currentThread().name, loop.done.values())
+
+    def test_partition_failure(self):
+        """A failing partition is logged and its exception is raised.
+
+        The other partitions still run to completion.
+        """
+        log_file = StringIO()
+        loop = PartitionedLoop(FakeLogger(log_file), fail_partition=1)
+        self.assertRaises(MainException, loop.run)
+        self.assertEqual([0, 2], sorted(loop.done))
+        self.assertIn("ERROR Partition 1 of 3 failed.", log_file.getvalue())
+
+    def test_run_in_threads(self):
+        """Each function runs in its own thread with the caller's scopes.
+
+        Failures are logged and returned.
+        """
+        install_feature_controller(
+            FeatureController(lambda scope: scope == 'default'))
+        self.addCleanup(uninstall_feature_controller)
+        log_file = StringIO()
+        ran = {}
+
+        def record(name):
+            in_scope = get_relevant_feature_controller().isInScope('default')
+            ran[name] = (threading.currentThread().name, in_scope)
+
+        def fail():
+            raise MainException()
+
+        failures = run_in_threads(
+            [('first', lambda: record('first')),
+             ('second', lambda: record('second')),
+             ('third', fail)],
+            FakeLogger(log_file))
+        self.assertEqual(
+            {'first': ('first', True), 'second': ('second', True)}, ran)
+        self.assertEqual([MainException], [exc[0] for exc in failures])
+        self.assertIn("ERROR third failed.", log_file.getvalue())
+
+    def test_initial_chunk_size(self):
+        """The first chunk has the initial chunk size, within limits."""
+        loop = RecordingLoop(1)
+        LoopTuner(
+            loop, 5, initial_chunk_size=50, log=FakeLogger(StringIO())).run()
+        self.assertEqual([50], loop.chunk_sizes)
+        loop = RecordingLoop(1)
+        LoopTuner(
+            loop, 5, maximum_chunk_size=20, initial_chunk_size=50,
+            log=FakeLogger(StringIO())).run()
+        self.assertEqual([20], loop.chunk_sizes)
+
+    def test_statistics(self):
+        """The tuner records statistics about its run."""
+        loop = RecordingLoop(3)
+        tuner = LoopTuner(loop, 5, log=FakeLogger(StringIO()))
+        tuner.run()
+        self.assertEqual(sum(loop.chunk_sizes), tuner.statistics['items'])
+        self.assertEqual(3, tuner.statistics['iterations'])
+        self.assertTrue(tuner.statistics['finished'])
+        self.assertTrue(
+            tuner.statistics['chunk_size'] >= loop.chunk_sizes[-1])
+
+    def test_statistics_aborted(self):
+        """An aborted run is recorded as not finished."""
+        loop = RecordingLoop(3)
+        tuner = LoopTuner(loop, 5, abort_time=0, log=FakeLogger(StringIO()))
+        tuner.run()
+        self.assertEqual([], loop.chunk_sizes)
+        self.assertFalse(tuner.statistics['finished'])
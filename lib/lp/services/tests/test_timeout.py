@@ -34,6 +34,7 @@ from lp.services.osutils import write_file
 from lp.services.timeout import (
     default_timeout,
     get_default_timeout_function,
+    make_url_fetcher_session,
     override_timeout,
     reduced_timeout,
     set_default_timeout_function,
@@ -367,6 +368,14 @@ class TestTimeout(TestCase):
             MatchesStructure.byEquality(status_code=200, content='Success.'))
         t.join()
 
+    def test_urlfetch_uses_given_session(self):
+        """urlfetch can reuse a session made by make_url_fetcher_session."""
+        session = make_url_fetcher_session()
+        session.request = FakeMethod(result=Response())
+        urlfetch('http://example.com/', session=session)
+        urlfetch('http://example.com/', session=session)
+        self.assertEqual(2, session.request.call_count)
+
     def test_urlfetch_no_proxy_by_default(self):
         """urlfetch does not use a proxy by default."""
         self.pushConfig('launchpad', http_proxy='http://proxy.example:3128/')
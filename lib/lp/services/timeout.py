@@ -7,6 +7,7 @@ __metaclass__ = type
 __all__ = [
     "default_timeout",
     "get_default_timeout_function",
+    "make_url_fetcher_session",
     "override_timeout",
     "reduced_timeout",
     "SafeTransportWithTimeout",
@@ -328,6 +329,24 @@ class CleanableHTTPAdapter(HTTPAdapter):
             **pool_kwargs)
 
 
+def make_url_fetcher_session():
+    """Make a `Session` suitable for passing to `urlfetch`.
+
+    Callers that make many requests to the same host can keep such a
+    session and pass it to each `urlfetch` call in order to reuse
+    connections.  A session must not be used by more than one thread at
+    once, and is closed if a request using it times out.
+    """
+    session = Session()
+    # Always ignore proxy/authentication settings in the environment; we
+    # configure that sort of thing explicitly.
+    session.trust_env = False
+    # Mount our custom adapters.
+    session.mount("https://", CleanableHTTPAdapter())
+    session.mount("http://", CleanableHTTPAdapter())
+    return session
+
+
 class URLFetcher:
     """Object fetching remote URLs with a time out."""
 
@@ -336,7 +355,7 @@ class URLFetcher:
 
     @with_timeout(cleanup='cleanup')
     def fetch(self, url, use_proxy=False, allow_ftp=False, allow_file=False,
-              output_file=None, **request_kwargs):
+              output_file=None, session=None, **request_kwargs):
         """Fetch the URL using a custom HTTP handler supporting timeout.
 
         :param url: The URL to fetch.
@@ -346,16 +365,14 @@ class URLFetcher:
             pass this if the URL is trusted.)
         :param output_file: If not None, download the response content to
             this file object or path.
+        :param session: If not None, a session made by
+            `make_url_fetcher_session` to use instead of a new one.
         :param request_kwargs: Additional keyword arguments passed on to
             `Session.request`.
         """
-        self.session = Session()
-        # Always ignore proxy/authentication settings in the environment; we
-        # configure that sort of thing explicitly.
-        self.session.trust_env = False
-        # Mount our custom adapters.
-        self.session.mount("https://", CleanableHTTPAdapter())
-        self.session.mount("http://", CleanableHTTPAdapter())
+        if session is None:
+            session = make_url_fetcher_session()
+        self.session = session
         # We can do FTP, but currently only via an HTTP proxy.
         if allow_ftp and use_proxy:
             self.session.mount("ftp://", CleanableHTTPAdapter())
@@ -22,8 +22,12 @@ from storm.expr import (
     Or,
     SQL,
     )
+from storm.info import get_cls_info
 from storm.properties import PropertyColumn
-from storm.store import EmptyResultSet
+from storm.store import (
+    EmptyResultSet,
+    ResultSet,
+    )
 from storm.zope.interfaces import IResultSet
 from zope.component import adapter
 from zope.interface import implementer
@@ -42,6 +46,7 @@ from lp.services.database.sqlbase import (
     convert_storm_clause_to_string,
     sqlvalues,
     )
+from lp.services.features import getFeatureFlag
 from lp.services.propertycache import cachedproperty
 from lp.services.webapp.interfaces import (
     ITableBatchNavigator,
@@ -131,6 +136,9 @@ class BatchNavigator(lazr.batchnavigator.BatchNavigator):
     def __init__(self, results, request, start=0, size=None, callback=None,
                  transient_parameters=None, force_start=False,
                  range_factory=None, hide_counts=False):
+        if (range_factory is None and
+                getFeatureFlag('webapp.batching.keyset.enabled')):
+            range_factory = keyset_range_factory(results)
         super(BatchNavigator, self).__init__(results, request,
             start=start, size=size, callback=callback,
             transient_parameters=transient_parameters,
@@ -270,6 +278,61 @@ def plain_expression(expression):
         return expression
 
 
+def column_allows_null(column):
+    """Does the property behind `column` allow NULL?
+
+    Storm properties are declared with allow_none=False, or notNull=True
+    for SQLObject columns, if they must have a value.
+    """
+    return column.variable_factory.keywords.get('allow_none', True)
+
+
+def keyset_range_factory(results):
+    """Return a `StormRangeFactory` for `results` if it can page them.
+
+    Keyset paging needs a plain or decorated Storm result set that is not
+    a set operation such as UNION.  Its ORDER BY columns must belong to
+    classes returned in each row, and none of them may allow NULL, since
+    memos can't compare NULLs.  Its last ORDER BY column must be a primary
+    key so that the order is total.
+
+    Like any `StormRangeFactory`, the returned factory estimates the total
+    from the query plan rather than counting the results.
+
+    :return: A `StormRangeFactory`, or None if `results` is not suitable.
+    """
+    naked_results = removeSecurityProxy(results)
+    if isinstance(naked_results, DecoratedResultSet):
+        naked_results = removeSecurityProxy(
+            naked_results.get_plain_result_set())
+    if not isinstance(naked_results, ResultSet):
+        return None
+    if naked_results._select is not Undef:
+        # Set operations such as UNION can't be narrowed with find().
+        return None
+    order_by = naked_results._order_by
+    if order_by is Undef or not order_by:
+        return None
+    columns = [plain_expression(expression) for expression in order_by]
+    if not all(isinstance(column, PropertyColumn) for column in columns):
+        return None
+    find_spec = naked_results._find_spec
+    if find_spec.is_tuple:
+        classes = find_spec.cls_spec
+    else:
+        classes = (find_spec.cls_spec,)
+    if not all(column.cls in classes for column in columns):
+        return None
+    # The primary key checked below is never NULL, whatever its column
+    # says.
+    if any(column_allows_null(column) for column in columns[:-1]):
+        return None
+    last_column = columns[-1]
+    if get_cls_info(last_column.cls).primary_key != (last_column,):
+        return None
+    return StormRangeFactory(results)
+
+
 @implementer(IRangeFactory)
 class StormRangeFactory:
     """A range factory for Storm result sets.
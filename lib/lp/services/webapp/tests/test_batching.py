@@ -22,10 +22,13 @@ from zope.security.proxy import isinstance as zope_isinstance
 from lp.bugs.model.bugtask import BugTaskSet
 from lp.registry.model.person import Person
 from lp.services.database.decoratedresultset import DecoratedResultSet
+from lp.services.database.interfaces import IStore
+from lp.services.features.testing import FeatureFixture
 from lp.services.librarian.model import LibraryFileAlias
 from lp.services.webapp.batching import (
     BatchNavigator,
     DateTimeJSONEncoder,
+    keyset_range_factory,
     ShadowedList,
     StormRangeFactory,
     )
@@ -33,6 +36,7 @@ from lp.services.webapp.interfaces import StormRangeFactoryError
 from lp.services.webapp.servers import LaunchpadTestRequest
 from lp.testing import (
     person_logged_in,
+    StormStatementRecorder,
     TestCaseWithFactory,
     verifyObject,
     )
@@ -823,3 +827,60 @@ class TestStormRangeFactory(TestCaseWithFactory):
         # is not always precise.
         self.assertThat(range_factory.rough_length, LessThan(10))
         self.assertEmptyResultSetsWorking(range_factory)
+
+
+class TestKeysetRangeFactory(TestCaseWithFactory):
+    """Tests for keyset_range_factory."""
+
+    layer = LaunchpadFunctionalLayer
+
+    def test_totally_ordered_result_set(self):
+        results = IStore(Person).find(Person).order_by(
+            Desc(Person.name), Person.id)
+        range_factory = keyset_range_factory(results)
+        self.assertIsInstance(range_factory, StormRangeFactory)
+        self.assertIs(results, range_factory.resultset)
+
+    def test_estimated_length(self):
+        # The length is estimated from the query plan, not counted.
+        results = IStore(Person).find(Person).order_by(Person.id)
+        range_factory = keyset_range_factory(results)
+        with StormStatementRecorder() as recorder:
+            range_factory.rough_length
+        self.assertEqual(1, recorder.count)
+        self.assertTrue(recorder.statements[0].startswith('EXPLAIN '))
+
+    def test_decorated_result_set(self):
+        results = DecoratedResultSet(
+            IStore(Person).find(Person).order_by(Person.id))
+        self.assertIsInstance(
+            keyset_range_factory(results), StormRangeFactory)
+
+    def test_unsuitable_results(self):
+        # Only result sets with a total order over non-NULL columns of
+        # returned classes are suitable.
+        store = IStore(Person)
+        for results in (
+                [1, 2, 3],
+                store.find(Person),
+                store.find(Person).order_by(Person.name),
+                store.find(Person).order_by(
+                    Person.homepage_content, Person.id),
+                store.find(Person).order_by('Person.id'),
+                store.find(Person.id).order_by(Person.id),
+                store.find(Person).order_by(Person.id).union(
+                    store.find(Person).order_by(Person.id)),
+                ):
+            self.assertIs(None, keyset_range_factory(results))
+
+    def test_BatchNavigator_uses_keyset_when_enabled(self):
+        results = IStore(Person).find(Person).order_by(Person.id)
+        request = LaunchpadTestRequest()
+        batchnav = BatchNavigator(results, request)
+        self.assertNotIsInstance(
+            batchnav.batch.range_factory, StormRangeFactory)
+        self.useFixture(
+            FeatureFixture({'webapp.batching.keyset.enabled': 'on'}))
+        batchnav = BatchNavigator(results, request)
+        self.assertIsInstance(
+            batchnav.batch.range_factory, StormRangeFactory)
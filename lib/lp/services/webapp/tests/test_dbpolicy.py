@@ -6,6 +6,10 @@
 __metaclass__ = type
 __all__ = []
 
+from datetime import (
+    datetime,
+    timedelta,
+    )
 from textwrap import dedent
 
 from lazr.restful.interfaces import IWebServiceConfiguration
@@ -31,6 +35,7 @@ from lp.layers import (
     )
 from lp.registry.model.person import Person
 from lp.services.config import config
+from lp.services.database import policy as dbpolicy
 from lp.services.database.interfaces import (
     ALL_STORES,
     DEFAULT_FLAVOR,
@@ -47,11 +52,13 @@ from lp.services.database.policy import (
     BaseDatabasePolicy,
     LaunchpadDatabasePolicy,
     MasterDatabasePolicy,
+    reset_replication_lag_cache,
     SlaveDatabasePolicy,
     SlaveOnlyDatabasePolicy,
     )
 from lp.services.webapp.servers import LaunchpadTestRequest
 from lp.testing import TestCase
+from lp.testing.fakemethod import FakeMethod
 from lp.testing.fixture import PGBouncerFixture
 from lp.testing.layers import (
     DatabaseFunctionalLayer,
@@ -174,6 +181,83 @@ class LaunchpadDatabasePolicyTestCase(SlaveDatabasePolicyTestCase):
         super(LaunchpadDatabasePolicyTestCase, self).setUp()
 
 
+class ReplicationLagCacheTestCase(TestCase):
+    """The replication lag is sampled once per interval per process."""
+
+    def setUp(self):
+        super(ReplicationLagCacheTestCase, self).setUp()
+        reset_replication_lag_cache()
+        self.addCleanup(reset_replication_lag_cache)
+        self.pushConfig('database', replication_lag_cache_seconds=5)
+        self.now = datetime(2013, 1, 1)
+        self.patch(dbpolicy, '_now', lambda: self.now)
+        self.query = FakeMethod(result=timedelta(seconds=3))
+        self.patch(
+            LaunchpadDatabasePolicy, '_queryReplicationLag', self.query)
+
+    def makePolicy(self):
+        return LaunchpadDatabasePolicy(
+            LaunchpadTestRequest(SERVER_URL='http://launchpad.dev'))
+
+    def test_sample_shared_between_policies(self):
+        # Requests within the interval reuse the first sample.
+        self.assertEqual(
+            timedelta(seconds=3), self.makePolicy().getReplicationLag())
+        self.now += timedelta(seconds=4)
+        self.assertEqual(
+            timedelta(seconds=3), self.makePolicy().getReplicationLag())
+        self.assertEqual(1, self.query.call_count)
+
+    def test_stale_sample_is_refreshed(self):
+        self.makePolicy().getReplicationLag()
+        self.now += timedelta(seconds=5)
+        self.query.result = timedelta(seconds=10)
+        self.assertEqual(
+            timedelta(seconds=10), self.makePolicy().getReplicationLag())
+        self.assertEqual(2, self.query.call_count)
+
+    def test_unreplicated_sample_is_cached(self):
+        # None means there is no hot standby, which is worth caching too.
+        self.query.result = None
+        self.assertIs(None, self.makePolicy().getReplicationLag())
+        self.assertIs(None, self.makePolicy().getReplicationLag())
+        self.assertEqual(1, self.query.call_count)
+
+    def test_caching_disabled(self):
+        self.pushConfig('database', replication_lag_cache_seconds=0)
+        self.makePolicy().getReplicationLag()
+        self.makePolicy().getReplicationLag()
+        self.assertEqual(2, self.query.call_count)
+
+    def test_query_runs_without_lock(self):
+        # Other threads aren't held up while the standby is queried.
+        def query(policy):
+            self.assertFalse(dbpolicy._lag_sample_lock.locked())
+            return timedelta(seconds=3)
+        self.patch(LaunchpadDatabasePolicy, '_queryReplicationLag', query)
+        self.assertEqual(
+            timedelta(seconds=3), self.makePolicy().getReplicationLag())
+
+    def test_stale_sample_used_while_refreshing(self):
+        # While one thread takes a new sample, others use the old one.
+        self.makePolicy().getReplicationLag()
+        self.now += timedelta(seconds=5)
+        self.query.result = timedelta(seconds=10)
+        with dbpolicy._lag_refresh_lock:
+            self.assertEqual(
+                timedelta(seconds=3), self.makePolicy().getReplicationLag())
+        self.assertEqual(1, self.query.call_count)
+        self.assertEqual(
+            timedelta(seconds=10), self.makePolicy().getReplicationLag())
+
+    def test_first_sample_not_held_up_by_refresh(self):
+        # With no sample to fall back on, threads query for themselves.
+        with dbpolicy._lag_refresh_lock:
+            self.assertEqual(
+                timedelta(seconds=3), self.makePolicy().getReplicationLag())
+        self.assertEqual(1, self.query.call_count)
+
+
 class LayerDatabasePolicyTestCase(TestCase):
     layer = FunctionalLayer
 
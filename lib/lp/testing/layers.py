@@ -655,8 +655,13 @@ class MemcachedLayer(BaseLayer):
     @classmethod
     @profiled
     def testSetUp(cls):
+        # Avoid circular imports.
+        from lp.code.model.gitref import git_log_cache
+
         MemcachedLayer.client.forget_dead_hosts()
         MemcachedLayer.client.flush_all()
+        # This sits in front of memcached, so must be flushed with it.
+        git_log_cache.clear()
 
     @classmethod
     @profiled
@@ -670,7 +675,11 @@ class MemcachedLayer(BaseLayer):
     @classmethod
     def purge(cls):
         "Purge everything from our memcached."
+        # Avoid circular imports.
+        from lp.code.model.gitref import git_log_cache
+
         MemcachedLayer.client.flush_all()  # Only do this in tests!
+        git_log_cache.clear()
 
 
 class RabbitMQLayer(BaseLayer):
@@ -5,8 +5,22 @@
 
 import _pythonpath
 
-from lp.bugs.scripts.bugsummaryrebuild import BugSummaryRebuildTunableLoop
-from lp.services.scripts.base import LaunchpadScript
+from functools import partial
+
+import transaction
+
+from lp.bugs.scripts.bugsummaryrebuild import (
+    BugSummaryRebuildTunableLoop,
+    get_bugsummary_targets,
+    get_bugtask_targets,
+    get_dirty_bugsummary_targets,
+    partition_targets,
+    )
+from lp.services.looptuner import run_in_threads
+from lp.services.scripts.base import (
+    LaunchpadScript,
+    LaunchpadScriptFailure,
+    )
 
 
 class BugSummaryRebuild(LaunchpadScript):
@@ -16,12 +30,36 @@ class BugSummaryRebuild(LaunchpadScript):
             "-n", "--dry-run", action="store_true",
             dest="dry_run", default=False,
             help="Don't commit changes to the DB.")
+        self.parser.add_option(
+            "--dirty-only", action="store_true",
+            dest="dirty_only", default=False,
+            help="Only rebuild targets with changes still in the journal.")
+        self.parser.add_option(
+            "--threads", type="int", dest="threads", default=1,
+            metavar="NUM", help="Rebuild NUM sets of targets in parallel.")
 
     def main(self):
+        if self.options.dirty_only:
+            targets = get_dirty_bugsummary_targets()
+        else:
+            targets = get_bugsummary_targets().union(get_bugtask_targets())
+        # Each worker uses its own transaction.
+        transaction.abort()
+        failures = run_in_threads(
+            [('Worker-%d' % (count + 1), partial(self.rebuild, partition))
+             for count, partition in enumerate(
+                partition_targets(targets, max(self.options.threads, 1)))],
+            self.logger)
+        if failures:
+            raise LaunchpadScriptFailure(
+                "%d workers failed." % len(failures))
+
+    def rebuild(self, targets):
         updater = BugSummaryRebuildTunableLoop(
-            self.logger, self.options.dry_run)
+            self.logger, self.options.dry_run, targets=targets)
         updater.run()
 
+
 if __name__ == '__main__':
     script = BugSummaryRebuild(
         'bugsummary-rebuild', dbuser='bugsummaryrebuild')